@@ -1,10 +1,12 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django import forms
 from .models import (
     ProductCategory, Product, ProductSpec,
     ProductImage, ProductDocument, ProductFAQ, ProductPricingTier,
     CompanyDetails, ProductArticle,
 )
+from .chemistry import is_valid_cas
+from .fuzzy import fuzzy_products
 
 
 class ProductArticleAdminForm(forms.ModelForm):
@@ -56,11 +58,34 @@ class ProductPricingTierInline(admin.TabularInline):
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ("name", "category", "sku", "cas_number", "order")
-    list_filter = ("category",)
+    list_filter = (
+        "category", "pictograms", "hazard_codes__hazard_class",
+        "chemistry__cas_valid", "chemistry__weight_matches",
+    )
     list_editable = ("order",)
     search_fields = ("name", "description", "sku", "cas_number", "brand_name")
     prepopulated_fields = {"slug": ("name",)}
 
+    def get_search_results(self, request, queryset, search_term):
+        """Add trigram matches so misspelt names still find their product."""
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if search_term:
+            pks = [match.pk for match in fuzzy_products(search_term, limit=50)]
+            if pks:
+                results = results | queryset.filter(pk__in=pks)
+        return results, may_have_duplicates
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Legacy CAS numbers are kept (and flagged in the chemistry index), not rejected.
+        if obj.cas_number.strip() and not is_valid_cas(obj.cas_number):
+            self.message_user(
+                request,
+                f"“{obj.cas_number}” is not a valid CAS number (format NNNNNNN-NN-N with a correct check "
+                f"digit). The product was saved; it is listed under “CAS valid: No”.",
+                messages.WARNING,
+            )
+
     fieldsets = [
         ("Basic Information", {
             "fields": (
@@ -0,0 +1,211 @@
+"""
+Read-only JSON catalogue API, version 1 (``/api/v1/…``).
+
+    GET /api/v1/categories/
+    GET /api/v1/products/?fields=slug,name,specs&category=acids&limit=100
+    GET /api/v1/products/<slug>/?fields=name,documents
+
+``fields`` picks the columns and relations returned (sparse fieldsets): the
+product query is narrowed with ``only()`` and each requested relation –
+``specs``, ``images``, ``documents``, ``faqs``, ``pricing_tiers`` – is one
+extra prefetch query, so a page costs ``1 + len(relations)`` queries
+whatever its size.  Lists are keyset-paginated like the product grid (see
+``app.pagination``); ``next`` is the URL of the following page or null.
+
+ETags are strong and derived from the ``content`` generation, which every
+catalogue write bumps, so a revalidation is answered with 304 before any
+query runs.  Bodies are encoded one object at a time into a streaming
+response rather than built as one string.
+"""
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+from django.db.models.fields.files import FieldFile
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_safe
+
+from .cache import get_generation
+from .conditional import conditional_page, make_etag
+from .pagination import product_page
+
+API_VERSION = 1
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+CACHE_CONTROL = "public, max-age=60"
+
+DEFAULT_PRODUCT_FIELDS = ("slug", "name", "category", "description", "cas_number", "molecular_formula")
+# Relation → the columns of its rows that are returned.
+PRODUCT_RELATIONS = {
+    "specs": ("label", "value"),
+    "images": ("image", "alt_text", "is_primary"),
+    "documents": ("title", "doc_type", "file"),
+    "faqs": ("question", "answer"),
+    "pricing_tiers": ("min_quantity", "max_quantity", "price_info"),
+}
+# Never exposed: the primary key and the internal display order.
+HIDDEN_PRODUCT_FIELDS = {"id", "order"}
+CATEGORY_FIELDS = ("slug", "label", "icon_class", "overview_title", "overview_description")
+
+_encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+class FieldsError(ValueError):
+    pass
+
+
+def product_fields():
+    """Scalar product fields a client may request (``category`` is its slug)."""
+    from .models import Product
+
+    return tuple(
+        field.name for field in Product._meta.concrete_fields
+        if field.name not in HIDDEN_PRODUCT_FIELDS
+    )
+
+
+def requested_fields(request, allowed, default):
+    """The ``fields`` query parameter validated against ``allowed``, in request order."""
+    raw = request.GET.get("fields", "").strip()
+    if not raw:
+        return default
+    fields = list(dict.fromkeys(name.strip() for name in raw.split(",") if name.strip()))
+    unknown = [name for name in fields if name not in allowed]
+    if unknown:
+        raise FieldsError(f"Unknown field(s): {', '.join(unknown)}")
+    return tuple(fields)
+
+
+def _value(value):
+    if isinstance(value, FieldFile):
+        return value.url if value else None
+    return value
+
+
+def _row(obj, fields):
+    return {name: _value(getattr(obj, name)) for name in fields}
+
+
+def _product_row(product, fields):
+    row = {}
+    for name in fields:
+        if name == "category":
+            row[name] = product.category.slug
+        elif name in PRODUCT_RELATIONS:
+            row[name] = [_row(related, PRODUCT_RELATIONS[name]) for related in getattr(product, name).all()]
+        else:
+            row[name] = _value(getattr(product, name))
+    return row
+
+
+def product_queryset(fields):
+    """Products with only the columns and relations in ``fields`` loaded."""
+    from .models import Product
+
+    # The sort key is always loaded: the pagination cursor is built from it.
+    columns = ["pk", "order", "name", "slug"]
+    columns += [name for name in fields if name not in PRODUCT_RELATIONS and name != "category"]
+    queryset = Product.objects.all()
+    if "category" in fields:
+        queryset = queryset.select_related("category")
+        columns.append("category__slug")
+    queryset = queryset.only(*columns)
+    for name in fields:
+        if name in PRODUCT_RELATIONS:
+            related = Product._meta.get_field(name).related_model
+            rows = related.objects.only("pk", "product_id", *PRODUCT_RELATIONS[name])
+            queryset = queryset.prefetch_related(Prefetch(name, queryset=rows))
+    return queryset
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Responses
+# ─────────────────────────────────────────────────────────────────────
+
+def api_validators(request, *args, **kwargs):
+    """A strong ETag per URL and catalogue generation (bodies are deterministic)."""
+    query = sorted(request.GET.lists())
+    tag = make_etag("api", API_VERSION, get_generation("content"), request.path, query, weak=False)
+    return tag, None
+
+
+def _error(message, status):
+    return JsonResponse({"error": message}, status=status)
+
+
+def _stream_list(rows, next_url):
+    """Yield a ``{"data": [...], "next": ...}`` document piece by piece."""
+    yield '{"data":['
+    for i, row in enumerate(rows):
+        yield ("," if i else "") + _encoder.encode(row)
+    yield '],"next":' + _encoder.encode(next_url) + "}"
+
+
+def _json_stream(chunks):
+    response = StreamingHttpResponse((chunk.encode() for chunk in chunks), content_type="application/json")
+    response["Cache-Control"] = CACHE_CONTROL
+    return response
+
+
+def _limit(request):
+    try:
+        limit = int(request.GET.get("limit", DEFAULT_LIMIT))
+    except ValueError:
+        return DEFAULT_LIMIT
+    return max(1, min(limit, MAX_LIMIT))
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Views
+# ─────────────────────────────────────────────────────────────────────
+
+@require_safe
+@conditional_page(api_validators)
+def category_list(request):
+    from .models import ProductCategory
+
+    try:
+        fields = requested_fields(request, CATEGORY_FIELDS, CATEGORY_FIELDS)
+    except FieldsError as exc:
+        return _error(str(exc), 400)
+    categories = list(ProductCategory.objects.only("pk", "order", *fields).order_by("order", "pk"))
+    return _json_stream(_stream_list((_row(category, fields) for category in categories), None))
+
+
+@require_safe
+@conditional_page(api_validators)
+def product_list(request):
+    allowed = (*product_fields(), *PRODUCT_RELATIONS)
+    try:
+        fields = requested_fields(request, allowed, DEFAULT_PRODUCT_FIELDS)
+    except FieldsError as exc:
+        return _error(str(exc), 400)
+    queryset = product_queryset(fields)
+    if request.GET.get("category"):
+        queryset = queryset.filter(category__slug=request.GET["category"])
+    page = product_page(queryset, request.GET.get("after"), size=_limit(request))
+
+    next_url = None
+    if page.next_cursor:
+        query = request.GET.copy()
+        query["after"] = page.next_cursor
+        # Relative, so the body (and its strong ETag) is the same on every host.
+        next_url = f"{request.path}?{query.urlencode()}"
+    rows = (_product_row(product, fields) for product in page.items)
+    return _json_stream(_stream_list(rows, next_url))
+
+
+@require_safe
+@conditional_page(api_validators)
+def product_detail(request, slug):
+    allowed = (*product_fields(), *PRODUCT_RELATIONS)
+    try:
+        fields = requested_fields(request, allowed, (*DEFAULT_PRODUCT_FIELDS, *PRODUCT_RELATIONS))
+    except FieldsError as exc:
+        return _error(str(exc), 400)
+    product = product_queryset(fields).filter(slug=slug).first()
+    if product is None:
+        return _error("Product not found", 404)
+    response = JsonResponse({"data": _product_row(product, fields)}, encoder=DjangoJSONEncoder,
+                            json_dumps_params={"ensure_ascii": False, "separators": (",", ":")})
+    response["Cache-Control"] = CACHE_CONTROL
+    return response
@@ -0,0 +1,167 @@
+"""
+Typeahead over product names, trade names, CAS numbers, SKUs and HS codes.
+
+Each worker holds an immutable ``AutocompleteIndex``.  Keys are normalised
+(CAS 4719-04-4 → ``4719044``) and kept sorted in two tiers – whole codes and
+leading words first, inner words second – each stored compactly as one
+joined string plus ``array`` offsets and product slots.  A lookup is a
+``bisect`` per tier and a forward scan that stops once enough products are
+found, so keystroke queries never reach the database.
+
+The index is rebuilt from scratch whenever the ``autocomplete`` generation
+moves and swapped in with a single assignment; requests keep using the old
+snapshot while another thread rebuilds.
+"""
+
+import re
+import threading
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+
+from django.urls import reverse
+
+from .cache import bump_generation, get_generation
+from .search import normalize
+
+MAX_SCAN = 200
+MIN_QUERY_LENGTH = 2
+# Long names only need their first few word starts, and keys only need to be
+# as long as anything a visitor would type before picking a suggestion.
+MAX_WORD_STARTS = 6
+MAX_KEY_LENGTH = 32
+
+Suggestion = namedtuple("Suggestion", "name url cas_number sku")
+# Products are stored as one "name␟slug␟cas␟sku" string each.
+FIELD_SEPARATOR = "\x1f"
+
+_NON_ALNUM = re.compile(r"[\W_]+")
+
+
+def normalize_key(text):
+    """Lower-case alphanumerics only: "MEA-Triazine 78" → "meatriazine78"."""
+    return _NON_ALNUM.sub("", normalize(text))
+
+
+def _word_starts(text):
+    """Keys for the word starts of ``text``; yields ``(key, is_first_word)``."""
+    words = normalize(text).split()
+    for i in range(min(len(words), MAX_WORD_STARTS)):
+        key = normalize_key("".join(words[i:]))[:MAX_KEY_LENGTH]
+        if key:
+            yield key, i == 0
+
+
+class _Tier:
+    """Sorted keys joined into one string, with offsets and product slots."""
+
+    __slots__ = ("blob", "offsets", "slots")
+
+    def __init__(self, entries):
+        entries.sort()
+        self.blob = "".join(key for key, _ in entries)
+        self.offsets = array("I", [0])
+        position = 0
+        for key, _ in entries:
+            position += len(key)
+            self.offsets.append(position)
+        self.slots = array("I", (slot for _, slot in entries))
+
+    def __len__(self):
+        return len(self.slots)
+
+    def key(self, i):
+        return self.blob[self.offsets[i]:self.offsets[i + 1]]
+
+    def scan(self, prefix):
+        """Yield product slots whose key starts with ``prefix``, in key order."""
+        blob, offsets, slots = self.blob, self.offsets, self.slots
+        i = bisect_left(range(len(slots)), prefix, key=self.key)
+        for i in range(i, min(i + MAX_SCAN, len(slots))):
+            if not blob.startswith(prefix, offsets[i], offsets[i + 1]):
+                return
+            yield slots[i]
+
+
+class AutocompleteIndex:
+    __slots__ = ("tiers", "items", "url_template")
+
+    def __init__(self, rows):
+        leading, inner, items = [], [], []
+        for name, slug, brand, common_names, cas, sku, hs_code in rows:
+            slot = len(items)
+            items.append(FIELD_SEPARATOR.join((name, slug, cas, sku)))
+            for text in (name, brand, *common_names.splitlines()):
+                for key, first in _word_starts(text):
+                    (leading if first else inner).append((key, slot))
+            for code in (cas, sku, hs_code):
+                key = normalize_key(code)[:MAX_KEY_LENGTH]
+                if key:
+                    leading.append((key, slot))
+        self.tiers = (_Tier(leading), _Tier(inner))
+        self.items = tuple(items)
+        # reverse() is far slower than a lookup; resolve the pattern once.
+        self.url_template = reverse("product_detail", kwargs={"slug": "__slug__"})
+
+    def __len__(self):
+        return len(self.items)
+
+    def lookup(self, query, limit=8):
+        prefix = normalize_key(query)[:MAX_KEY_LENGTH]
+        if not prefix:
+            return []
+        seen, results = set(), []
+        for tier in self.tiers:
+            for slot in tier.scan(prefix):
+                if slot not in seen:
+                    seen.add(slot)
+                    name, slug, cas_number, sku = self.items[slot].split(FIELD_SEPARATOR)
+                    url = self.url_template.replace("__slug__", slug)
+                    results.append(Suggestion(name, url, cas_number, sku))
+                    if len(results) == limit:
+                        return results
+        return results
+
+
+def _load():
+    from .models import Product
+
+    rows = Product.objects.order_by().values_list(
+        "name", "slug", "brand_name", "common_names", "cas_number", "sku", "hs_code",
+    )
+    return AutocompleteIndex(rows.iterator(chunk_size=5000))
+
+
+_index = (None, None)  # (generation, AutocompleteIndex)
+_rebuild_lock = threading.Lock()
+
+
+def get_index():
+    """Return this worker's index, rebuilding it if products have changed."""
+    global _index
+    generation = get_generation("autocomplete")
+    current_generation, index = _index
+    if index is not None and current_generation == generation:
+        return index
+    # Only one thread rebuilds; the others keep answering from the old copy.
+    if not _rebuild_lock.acquire(blocking=index is None):
+        return index
+    try:
+        current_generation, index = _index
+        if index is None or current_generation != generation:
+            index = _load()
+            _index = (generation, index)
+        return index
+    finally:
+        _rebuild_lock.release()
+
+
+def suggest(query, limit=8):
+    query = (query or "")[:100]
+    if len(normalize_key(query)) < MIN_QUERY_LENGTH:
+        return []
+    return get_index().lookup(query, limit)
+
+
+def invalidate_autocomplete():
+    bump_generation("autocomplete")
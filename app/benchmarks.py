@@ -0,0 +1,551 @@
+"""
+Micro-benchmarks, run with ``manage.py benchmark <name> [--size N]``.
+
+Each benchmark seeds its own rows inside a transaction that is rolled back
+afterwards, and runs against a private in-memory cache, so it can be pointed
+at any database without leaving anything behind.
+"""
+
+import gc
+import time
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.test.utils import override_settings
+
+BENCHMARKS = {}
+
+PRIVATE_CACHE = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "benchmark",
+    },
+}
+
+
+def benchmark(name, default_size):
+    """Register ``func(size, report)`` as benchmark ``name``.
+
+    ``report(label, seconds, extra="")`` prints one line; ``seconds`` may be
+    None for rows that only carry ``extra`` (sizes, counts).
+    """
+    def decorator(func):
+        BENCHMARKS[name] = (func, default_size)
+        return func
+    return decorator
+
+
+def timed(func, repeat=5):
+    """Run ``func`` ``repeat`` times; return (best seconds, last result)."""
+    best, result = None, None
+    gc.collect()
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def format_seconds(seconds):
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:9.1f} µs"
+    if seconds < 1:
+        return f"{seconds * 1e3:9.2f} ms"
+    return f"{seconds:9.2f} s "
+
+
+@contextmanager
+def isolated():
+    """Roll back every write and use a throwaway cache."""
+    with override_settings(CACHES=PRIVATE_CACHE), transaction.atomic():
+        try:
+            yield
+        finally:
+            transaction.set_rollback(True)
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Fixtures
+# ─────────────────────────────────────────────────────────────────────
+
+WORDS = (
+    "triazine", "sulfonic", "acetate", "chloride", "hydroxide", "phosphate",
+    "amine", "glycol", "benzoate", "nitrate", "carbonate", "peroxide",
+)
+
+# (formula, stated molecular weight) pairs cycled through the seeded products.
+FORMULAS = (
+    ("C3H3N3", "81.08 g/mol"), ("C7H8O3S", "172.20"), ("C2H3NaO2", "82.03 g/mol"),
+    ("NaCl", "58.44"), ("Ca(OH)2", "74.09 g/mol"), ("Na3PO4", "163.94"),
+    ("C2H7NO", "61.08"), ("C2H6O2", "62.07 g/mol"), ("C7H5NaO2", "144.10"),
+    ("KNO3", "101.10"), ("Na2CO3", "105.99"), ("H2O2", "34.01 g/mol"),
+    ("CuSO4·5H2O", "249.69"), ("C6H15NO3", "149.19"), ("C6H12N6O3", "216.20"),
+)
+
+# (flash point, density, pH) strings as they appear on supplier data sheets.
+PROPERTY_TEXTS = (
+    ("> 60 °C (closed cup)", "1.12 g/cm³ at 20 °C", "10.5 – 11.5"),
+    ("93 °C", "1,05 g/ml", "7"),
+    ("Not applicable", "SG 1.32", "2 - 3 (1% aq.)"),
+    ("140 °F", "1120 kg/m3", "approx. 9"),
+    ("< 23 °C", "0.79", "N/A"),
+    ("61-65°C", "8.9 lb/gal", "12.5"),
+)
+
+
+def seed_products(count, categories=8, batch_size=5000):
+    """Bulk-create ``count`` synthetic products spread over ``categories``."""
+    from django.utils import timezone
+
+    from .models import Product, ProductCategory
+
+    cats = ProductCategory.objects.bulk_create([
+        ProductCategory(slug=f"bench-category-{i}", label=f"Bench Category {i}", order=i)
+        for i in range(categories)
+    ])
+    now = timezone.now()
+    batch = []
+    for i in range(count):
+        word = WORDS[i % len(WORDS)]
+        batch.append(Product(
+            category=cats[i % categories],
+            slug=f"bench-{word}-{i}",
+            name=f"Bench {word.title()} {i}",
+            description=f"Synthetic {word} product number {i}.",
+            sku=f"BN-{i:06d}",
+            cas_number=f"{100 + i % 9000}-{i % 100:02d}-{i % 10}",
+            molecular_formula=FORMULAS[i % len(FORMULAS)][0],
+            molecular_weight=FORMULAS[i % len(FORMULAS)][1],
+            flash_point=PROPERTY_TEXTS[i % len(PROPERTY_TEXTS)][0],
+            density=PROPERTY_TEXTS[i % len(PROPERTY_TEXTS)][1],
+            ph_value=PROPERTY_TEXTS[i % len(PROPERTY_TEXTS)][2],
+            is_technical_grade=i % 2 == 0,
+            is_industrial_grade=i % 3 == 0,
+            is_analytical_grade=i % 5 == 0,
+            is_pharma_grade=i % 7 == 0,
+            signal_word=("", "Danger", "Warning")[i % 3],
+            dangerous_goods=(None, True, False)[i % 3],
+            order=i % 50,
+            updated_at=now,
+        ))
+        if len(batch) >= batch_size:
+            Product.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        Product.objects.bulk_create(batch)
+    return cats
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Benchmarks
+# ─────────────────────────────────────────────────────────────────────
+
+@benchmark("sitemap", default_size=100_000)
+def sitemap_benchmark(size, report):
+    from django.test import RequestFactory
+
+    from . import seo
+
+    seed_products(size)
+    factory = RequestFactory()
+
+    def body(response):
+        return b"".join(response.streaming_content) if response.streaming else response.content
+
+    def render_index():
+        seo.invalidate_shard("products", 1)
+        return body(seo.sitemap_xml(factory.get("/sitemap.xml")))
+
+    def render_shard():
+        seo.invalidate_shard("products", 1)
+        return body(seo.sitemap_shard(factory.get("/"), "products", 1))
+
+    seconds, xml = timed(render_index, repeat=3)
+    report("index (cold)", seconds, f"{len(xml):,} B")
+    seconds, xml = timed(render_shard, repeat=3)
+    report(f"shard of {seo.SITEMAP_PAGE_SIZE:,} URLs (cold)", seconds, f"{len(xml):,} B")
+
+    request = factory.get("/", HTTP_ACCEPT_ENCODING="gzip")
+    body(seo.sitemap_shard(request, "products", 1))
+    seconds, xml = timed(lambda: body(seo.sitemap_shard(request, "products", 1)), repeat=20)
+    report("shard (cached, gzip)", seconds, f"{len(xml):,} B")
+    seconds, _ = timed(lambda: body(seo.sitemap_xml(request)), repeat=20)
+    report("index (cached, gzip)", seconds)
+
+
+@benchmark("search", default_size=100_000)
+def search_benchmark(size, report):
+    from . import search
+
+    seed_products(size)
+    queries = ("triazine", "bench hydrox", "sulfonic acetate", "bn 004217", "zzzz")
+
+    backends = [search.MemoryBackend()]
+    if search.fts5_table_exists():
+        backends.insert(0, search.Fts5Backend())
+    for backend in backends:
+        seconds, _ = timed(backend.rebuild if backend.name == "fts5" else lambda: backend.search("x"), repeat=1)
+        report(f"{backend.name}: build index", seconds)
+        for query in queries:
+            seconds, results = timed(lambda: backend.search(query, 20), repeat=20)
+            report(f"{backend.name}: {query!r}", seconds, f"{len(results)} results")
+
+    search.site_search("triazine")
+    seconds, _ = timed(lambda: search.site_search("triazine"), repeat=20)
+    report("site_search 'triazine' (cached results)", seconds)
+
+
+@benchmark("autocomplete", default_size=100_000)
+def autocomplete_benchmark(size, report):
+    import tracemalloc
+
+    from . import autocomplete
+
+    seed_products(size)
+    seconds, index = timed(autocomplete._load, repeat=1)
+    keys = sum(len(tier) for tier in index.tiers)
+    report("build index", seconds, f"{keys:,} keys")
+    del index
+    tracemalloc.start()
+    index = autocomplete._load()
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    report("index footprint", None, f"{memory / 2**20:.1f} MiB")
+
+    for query in ("tr", "triaz", "bench hydrox", "bn-0042", "100-4", "zzzz"):
+        seconds, results = timed(lambda: index.lookup(query), repeat=200)
+        report(f"lookup {query!r}", seconds, f"{len(results)} results")
+
+
+@benchmark("fuzzy", default_size=50_000)
+def fuzzy_benchmark(size, report):
+    import tracemalloc
+
+    from . import fuzzy
+
+    seed_products(size)
+    seconds, index = timed(fuzzy._load, repeat=1)
+    report("build index", seconds, f"{len(index.trigram_ids):,} trigrams, {len(index.entry_slots):,} entries")
+    del index
+    tracemalloc.start()
+    index = fuzzy._load()
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    report("index footprint", None, f"{memory / 2**20:.1f} MiB")
+
+    for query in ("toluenesulphonic", "triazene", "hydroxyde", "bench sulfonik 4217", "zzzz"):
+        seconds, results = timed(lambda: index.match(query), repeat=50)
+        top = f", top {results[0].name!r} {results[0].similarity}" if results else ""
+        report(f"match {query!r}", seconds, f"{len(results)} results{top}")
+
+
+@benchmark("chemistry", default_size=50_000)
+def chemistry_benchmark(size, report):
+    from .chemistry import FormulaError, containing, parse_formula, reindex_all
+    from .models import Product
+
+    seed_products(size)
+    seconds, _ = timed(lambda: list(reindex_all(batch_size=2000)), repeat=1)
+    report("reindex catalogue", seconds, f"{size / seconds:,.0f} products/s")
+
+    def python_loop():
+        found = []
+        for pk, formula in Product.objects.values_list("pk", "molecular_formula").iterator(chunk_size=5000):
+            try:
+                if "S" in parse_formula(formula):
+                    found.append(pk)
+            except FormulaError:
+                pass
+        return found
+
+    seconds, found = timed(python_loop, repeat=1)
+    report("contains S (Python loop)", seconds, f"{len(found):,} products")
+
+    products = Product.objects.all()
+    queries = {
+        "contains S": lambda: containing(products, "S"),
+        "contains Na and O": lambda: containing(products, "Na", "O"),
+        "MW 100–200": lambda: products.filter(chemistry__molecular_weight__range=(100, 200)),
+        "contains N, MW 100–200": lambda: containing(products, "N").filter(
+            chemistry__molecular_weight__range=(100, 200),
+        ),
+    }
+    for label, query in queries.items():
+        seconds, count = timed(lambda: query().count())
+        report(f"{label} (SQL count)", seconds, f"{count:,} products")
+        seconds, page = timed(lambda: list(query().order_by("pk").values_list("pk", flat=True)[:24]))
+        report(f"{label} (first page)", seconds)
+
+
+@benchmark("properties", default_size=50_000)
+def properties_benchmark(size, report):
+    from .models import Product
+    from .properties import backfill, order_by_property, parse_property, property_filter
+
+    seed_products(size)
+    seconds, _ = timed(lambda: list(backfill(batch_size=2000)), repeat=1)
+    report("backfill catalogue", seconds, f"{size / seconds:,.0f} products/s")
+
+    def python_loop():
+        found = []
+        for pk, text in Product.objects.values_list("pk", "flash_point").iterator(chunk_size=5000):
+            parsed = parse_property("flash_point", text)
+            if parsed is not None and parsed.minimum is not None and parsed.minimum >= 333.15:
+                found.append(pk)
+        return found
+
+    seconds, found = timed(python_loop, repeat=1)
+    report("flash point ≥ 60 °C (Python loop)", seconds, f"{len(found):,} products")
+
+    products = Product.objects.all()
+    queries = {
+        "flash point ≥ 60 °C": lambda: property_filter(products, "flash_point", at_least=60),
+        "density 1.0–1.2 g/cm³": lambda: property_filter(products, "density", at_least=1.0, at_most=1.2),
+        "pH ≤ 7": lambda: property_filter(products, "ph_value", at_most=7),
+    }
+    for label, query in queries.items():
+        seconds, count = timed(lambda: query().count())
+        report(f"{label} (SQL count)", seconds, f"{count:,} products")
+        seconds, _ = timed(lambda: list(query().order_by("pk").values_list("pk", flat=True)[:24]))
+        report(f"{label} (first page)", seconds)
+    seconds, _ = timed(lambda: list(order_by_property(products, "density").values_list("pk", flat=True)[:24]))
+    report("sorted by density (first page)", seconds)
+
+
+def seed_specs(labels=(("Form", ("Liquid", "Powder", "Flakes")), ("Purity", ("98%", "99%", "99.5%")))):
+    """Give every seeded product one spec row per label, cycling through the values."""
+    from .models import Product, ProductSpec
+
+    rows = []
+    for i, pk in enumerate(Product.objects.order_by("pk").values_list("pk", flat=True).iterator()):
+        for order, (label, values) in enumerate(labels):
+            rows.append(ProductSpec(product_id=pk, label=label, value=values[(i // (order + 1)) % len(values)], order=order))
+    ProductSpec.objects.bulk_create(rows, batch_size=5000)
+
+
+def seed_hazards(codes=("H225", "H302", "H314", "H319", "H400")):
+    """Give every other seeded product one to two of ``codes`` as hazard statements."""
+    from . import ghs
+    from .models import HazardCode, Product, ProductHazardStatement
+
+    rows = []
+    for code in codes:
+        group, hazard_class = ghs.classify(code)
+        rows.append(HazardCode(code=code, group=group, hazard_class=hazard_class, statement=code))
+    HazardCode.objects.bulk_create(rows, ignore_conflicts=True)
+    hazard_codes = list(HazardCode.objects.filter(code__in=codes).order_by("code"))
+    statements = []
+    for i, pk in enumerate(Product.objects.order_by("pk").values_list("pk", flat=True).iterator()):
+        if i % 2:
+            continue
+        for position in range(1 + i % 3 // 2):
+            code = hazard_codes[(i // 2 + position) % len(hazard_codes)]
+            statements.append(ProductHazardStatement(
+                product_id=pk, kind="H", code=code, text=code.code, position=position,
+            ))
+    ProductHazardStatement.objects.bulk_create(statements, batch_size=5000)
+
+
+@benchmark("facets", default_size=100_000)
+def facets_benchmark(size, report):
+    import tracemalloc
+    from datetime import timedelta
+
+    from django.http import QueryDict
+    from django.utils import timezone
+
+    from .facet_index import FacetIndex, _spec_labels
+    from .facets import _compute, filter_products, get_facets, selection_from
+    from .models import Product
+
+    seed_products(size)
+    seed_specs()
+    seed_hazards()
+    facets = get_facets()
+    report("facet values", None, f"{sum(len(f.choices) for f in facets)} across {len(facets)} facets")
+
+    # Seeded rows all look freshly edited; age them so a patch sees only real edits.
+    Product.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+    seconds, index = timed(lambda: FacetIndex.build(_spec_labels(facets)), repeat=1)
+    tracemalloc.start()
+    FacetIndex.build(_spec_labels(facets))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    report("bitset index build", seconds, f"{len(index):,} products, {len(index.bitsets)} bitsets")
+    report("bitset index size", None, f"{index.nbytes() / 1024:,.0f} KiB bitsets, {peak / 2**20:,.1f} MiB peak while building")
+
+    selections = {
+        "no selection": "",
+        "one category": "category=bench-category-3",
+        "category + grade": "category=bench-category-3&grade=pharma",
+        "grade + signal + spec": "grade=technical&signal_word=danger&spec=Form:Powder",
+        "hazard class + two codes": "hazard_class=Acute toxicity&hazard=H314&hazard=H400",
+    }
+    for label, query_string in selections.items():
+        selection = selection_from(QueryDict(query_string), facets)
+        seconds, counts = timed(lambda: _compute(facets, selection), repeat=3)
+        report(f"{label} (aggregate query)", seconds, f"{counts['total']:,} products")
+        seconds, bit_counts = timed(lambda: index.counts(facets, selection), repeat=20)
+        same = "same counts" if bit_counts == counts else "COUNTS DIFFER"
+        report(f"{label} (bitset counts)", seconds, same)
+        seconds, _ = timed(lambda: index.product_pks(index.match(facets, selection), limit=24), repeat=20)
+        report(f"{label} (bitset first 24 pks)", seconds)
+        seconds, _ = timed(lambda: list(filter_products(Product.objects.all(), selection, facets)[:24]))
+        report(f"{label} (first 24 products)", seconds)
+
+    changed = Product.objects.order_by("pk").values_list("pk", flat=True)[: size // 200]
+    Product.objects.filter(pk__in=list(changed)).update(is_analytical_grade=True, updated_at=timezone.now())
+    seconds, patched = timed(index.patched, repeat=1)
+    report(f"patch after {len(changed):,} edits", seconds, "rebuilt instead" if patched is None else "")
+
+
+@benchmark("product_grid", default_size=100_000)
+def product_grid_benchmark(size, report):
+    from django.test import RequestFactory
+
+    from . import views
+    from .models import Product
+    from .pagination import PAGE_SIZE, encode_cursor, product_page
+
+    seed_products(size)
+    products = Product.objects.all()
+    ordered = products.order_by("order", "name", "pk")
+    for fraction in (0, 0.5, 0.99):
+        offset = int(size * fraction)
+        seconds, _ = timed(lambda: list(ordered[offset:offset + PAGE_SIZE]))
+        report(f"page at {fraction:.0%} (OFFSET)", seconds)
+        last = ordered[max(offset - 1, 0)]
+        cursor = encode_cursor(last) if offset else None
+        seconds, _ = timed(lambda: product_page(products, cursor))
+        report(f"page at {fraction:.0%} (keyset)", seconds)
+
+    # Past the page cache, which would answer repeats from memory.
+    factory = RequestFactory()
+    render_page = views.products.__wrapped__
+    seconds, response = timed(lambda: render_page(factory.get("/products/")), repeat=3)
+    report("/products/ (first page, uncached)", seconds, f"{len(response.content) / 1024:,.0f} KiB")
+    seconds, response = timed(lambda: views.product_cards(factory.get("/products/cards/", {"after": cursor})), repeat=3)
+    report("/products/cards/ (deep page)", seconds, f"{len(response.content) / 1024:,.0f} KiB")
+
+
+@benchmark("api", default_size=20_000)
+def api_benchmark(size, report):
+    from django.db import connection
+    from django.test import RequestFactory
+    from django.test.utils import CaptureQueriesContext
+
+    from . import api
+
+    seed_products(size)
+    seed_specs()
+    factory = RequestFactory()
+
+    def fetch(**params):
+        response = api.product_list.__wrapped__.__wrapped__(factory.get("/api/v1/products/", params))
+        return b"".join(response.streaming_content)
+
+    for fields in ("slug,name", "slug,name,category,description,specs", ",".join(api.product_fields())):
+        for limit in (20, 200):
+            with CaptureQueriesContext(connection) as queries:
+                seconds, body = timed(lambda: fetch(fields=fields, limit=limit))
+            label = fields if len(fields) < 40 else "every field"
+            report(f"{label}, {limit} products", seconds, f"{len(body) / 1024:,.1f} KiB, {len(queries) // 5} queries")
+
+
+@benchmark("catalog", default_size=50_000)
+def catalog_benchmark(size, report):
+    import tracemalloc
+
+    from django.db.models import prefetch_related_objects
+    from django.http import QueryDict
+
+    from .catalog import Catalog
+    from .facet_index import get_index
+    from .facets import filter_products, get_facets, selection_from
+    from .images import primary_image_prefetch
+    from .models import Product
+    from .pagination import encode_cursor, product_page
+
+    seed_products(size)
+    seed_specs()
+    facets = get_facets()
+
+    tracemalloc.start()
+    seconds, catalog = timed(Catalog.build, repeat=1)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    report("snapshot build", seconds, f"{len(catalog):,} products")
+    report("snapshot size", None, f"{retained / 2**20:,.1f} MiB retained, {peak / 2**20:,.1f} MiB peak while building")
+
+    def orm_page(selection, cursor):
+        # What the grid ran per request before the snapshot.
+        page = product_page(filter_products(Product.objects.select_related("category"), selection, facets), cursor)
+        prefetch_related_objects(page.items, "specs", primary_image_prefetch())
+        return page
+
+    def snapshot_page(selection, cursor):
+        matches = None
+        if selection:
+            index = get_index(facets)
+            matches = index.membership(index.match(facets, selection))
+        return catalog.page(cursor, matches=matches)
+
+    deep = encode_cursor(catalog.products[int(size * 0.9)])
+    cases = {
+        "first page": ("", None),
+        "page at 90%": ("", deep),
+        "one category": ("category=bench-category-3", None),
+        "category + spec": ("category=bench-category-3&spec=Form:Powder", None),
+    }
+    get_index(facets)  # built once per worker either way
+    for label, (query_string, cursor) in cases.items():
+        selection = selection_from(QueryDict(query_string), facets)
+        seconds, page = timed(lambda: orm_page(selection, cursor))
+        report(f"{label} (ORM)", seconds, f"{len(page.items)} products")
+        seconds, page = timed(lambda: snapshot_page(selection, cursor), repeat=20)
+        report(f"{label} (snapshot)", seconds, f"{len(page.items)} products")
+
+    product = catalog.products[size // 2]
+    seconds, _ = timed(lambda: list(
+        Product.objects.filter(category_id=product.category.pk).exclude(pk=product.pk).select_related("category")[:3]
+    ))
+    report("related products (ORM)", seconds)
+    seconds, _ = timed(lambda: catalog.related(product.pk, product.category.pk), repeat=20)
+    report("related products (snapshot)", seconds)
+
+
+@benchmark("recommend", default_size=20_000)
+def recommend_benchmark(size, report):
+    from django.db.models import Value
+    from django.db.models.functions import Concat
+
+    from . import recommend
+    from .catalog import Catalog
+    from .models import Product, ProductNeighbor
+
+    if recommend.np is None:
+        report("skipped", None, "NumPy is not installed")
+        return
+    seed_products(size)
+    seed_specs()
+    Product.objects.update(industry_usage=Concat(Value("Supplied for "), "name", Value(" applications.")))
+
+    seconds, vectors = timed(recommend.vectorize, repeat=1)
+    report("vectorize", seconds, f"{vectors.features:,} features, {vectors.nbytes / 2**20:,.1f} MiB")
+    seconds, _ = timed(lambda: recommend.nearest(vectors, list(range(recommend.BATCH_SIZE))), repeat=1)
+    report(f"top-{recommend.TOP_K} for {recommend.BATCH_SIZE} products", seconds)
+    seconds, _ = timed(lambda: list(recommend.rebuild_all()), repeat=1)
+    report("full rebuild", seconds, f"{ProductNeighbor.objects.count():,} rows")
+
+    product = Product.objects.order_by("pk")[size // 2]
+    seconds, updated = timed(lambda: recommend.refresh(changed=[product.pk]), repeat=1)
+    report("refresh after one edit", seconds, f"{len(updated):,} neighbour lists changed")
+
+    catalog = Catalog.build()
+    seconds, _ = timed(lambda: list(
+        Product.objects.filter(category_id=product.category_id).exclude(pk=product.pk).select_related("category")[:3]
+    ))
+    report("related products (same-category query)", seconds)
+    seconds, _ = timed(lambda: recommend.recommended_products(product, catalog))
+    report("related products (stored neighbours)", seconds)
@@ -0,0 +1,99 @@
+"""
+Process-wide caching helpers – generation counters and cached singletons.
+
+A *generation* is a number kept in the shared Django cache.  Anything derived
+from database content (the company record, rendered pages, …) is stored
+under a key that includes the current generation, and signal handlers bump
+the generation whenever the underlying rows change.  Every worker compares
+its in-process copy against the shared stamp, so one admin edit invalidates
+all of them without any cross-process messaging.
+
+That only holds with a cache every process can see (``CACHES`` in the
+settings: Redis, or a file cache on a single host).  The per-process
+default ``LocMemCache`` would keep each bump inside the process that made
+it; ``manage.py check --deploy`` reports one as error app.E001.
+"""
+
+import secrets
+import time
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+
+GENERATION_KEY = "vcp:gen:{}"
+COMPANY_KEY = "vcp:company:{}"
+COMPANY_TIMEOUT = 60 * 60 * 24
+
+
+def get_generation(name):
+    """Return the current generation stamp for ``name``."""
+    key = GENERATION_KEY.format(name)
+    value = cache.get(key)
+    if value is None:
+        # Seed with a timestamp rather than 1 so that a flushed cache can
+        # never hand out a stamp that a worker still holds a stale copy for.
+        cache.add(key, time.time_ns(), None)
+        value = cache.get(key)
+    return value
+
+
+def bump_generation(name):
+    """Invalidate everything cached under the current ``name`` generation.
+
+    A fresh random stamp is written rather than incremented: ``incr`` is a
+    separate read and write on the file cache, so two concurrent bumps
+    could collapse into one and a worker that reloaded in between would
+    keep its copy.  Stamps are only ever compared for equality.
+    """
+    value = time.time_ns() * 1000 + secrets.randbelow(1000)
+    cache.set(GENERATION_KEY.format(name), value, None)
+    return value
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    backend = settings.CACHES.get("default", {}).get("BACKEND", "")
+    if backend.endswith(("LocMemCache", "DummyCache")):
+        return [checks.Error(
+            "The default cache is private to each process, so generation bumps never reach other workers.",
+            hint="Configure a shared CACHES backend (Redis or FileBasedCache).",
+            id="app.E001",
+        )]
+    return []
+
+
+# ─────────────────────────────────────────────────────────────────────
+# CompanyDetails singleton
+# ─────────────────────────────────────────────────────────────────────
+
+# (generation, instance) – replaced as a whole so readers never see a mix.
+_company_local = (None, None)
+
+
+def get_company_details():
+    """Return the CompanyDetails singleton without touching the database.
+
+    Lookup order: in-process copy → shared cache → ``CompanyDetails.load()``.
+    """
+    global _company_local
+    generation = get_generation("company")
+    local_generation, obj = _company_local
+    if obj is not None and local_generation == generation:
+        return obj
+
+    key = COMPANY_KEY.format(generation)
+    obj = cache.get(key)
+    if obj is None:
+        from .models import CompanyDetails
+        obj = CompanyDetails.load()
+        cache.set(key, obj, COMPANY_TIMEOUT)
+    _company_local = (generation, obj)
+    return obj
+
+
+def invalidate_company_details():
+    """Drop every worker's copy of the company record."""
+    global _company_local
+    _company_local = (None, None)
+    bump_generation("company")
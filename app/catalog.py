@@ -0,0 +1,192 @@
+"""
+Immutable in-process catalogue snapshot for the list-style views.
+
+The product grid (and its "Load more" fragment), related products and an
+article's promoted products all show the same small card of a product:
+name, icon, description, category, specs and primary image.  Rather than
+re-query those rows per request, each worker holds one ``Catalog`` of
+tuple-backed records with their URLs precomputed, and renders the lists
+from it with no queries at all.
+
+Products are read through ``Product.objects.card_rows()``, so building it
+moves only the card columns, never the wide description, safety and SEO
+text.  The snapshot is keyed by its own ``catalog`` generation, bumped only
+by writes to what it copies – the ``CARD_FIELDS`` and category columns,
+specs, images and promotions, see ``app.signals`` – so SEO copy, safety
+data or image derivative builds leave it alone.  It is replaced as a
+whole, so readers never see a mix: one thread rebuilds while the others
+keep serving the previous copy.
+
+``preload`` builds it (and the facet index) before the application server
+forks, so with ``gunicorn --preload`` all workers share those pages
+copy-on-write until the first change.
+"""
+
+import gc
+import logging
+import threading
+from bisect import bisect_right
+from collections import defaultdict, namedtuple
+from operator import attrgetter
+
+from django.core.files.storage import default_storage
+from django.db import DatabaseError, connections
+from django.urls import reverse
+
+from .cache import bump_generation, get_generation
+from .pagination import PAGE_SIZE, Page, decode_cursor, encode_cursor
+
+logger = logging.getLogger(__name__)
+
+CategoryRecord = namedtuple(
+    "CategoryRecord", "pk slug label icon_class overview_title overview_description show_in_overview order",
+)
+SpecRecord = namedtuple("SpecRecord", "label value")
+StoredFile = namedtuple("StoredFile", "name url")  # what {% picture %} reads off a FieldFile
+ImageRecord = namedtuple("ImageRecord", "image alt_text")
+ProductRecord = namedtuple(
+    "ProductRecord", "pk slug name icon description order category specs primary_image url",
+)
+sort_key = attrgetter("order", "name", "pk")  # the grid's ordering, see app.pagination
+
+CATALOG_GENERATION = "catalog"
+CATEGORY_FIELDS = CategoryRecord._fields[1:]
+
+
+class Catalog:
+    __slots__ = ("categories", "products", "by_pk", "by_category", "promotions")
+
+    def __init__(self, categories, products, promotions):
+        self.categories = categories          # (CategoryRecord, …) in display order
+        self.products = products              # (ProductRecord, …) sorted by (order, name, pk)
+        self.by_pk = {p.pk: p for p in products}
+        by_category = defaultdict(list)
+        for product in products:
+            by_category[product.category.pk].append(product)
+        self.by_category = {pk: tuple(rows) for pk, rows in by_category.items()}
+        self.promotions = promotions          # article pk → (ProductRecord, …)
+
+    @classmethod
+    def build(cls):
+        from .models import Product, ProductArticle, ProductCategory, ProductSpec
+        from .images import primary_image_prefetch
+
+        categories = {
+            row[0]: CategoryRecord(*row)
+            for row in ProductCategory.objects.order_by("order", "pk").values_list(*CategoryRecord._fields)
+        }
+        specs, shared = defaultdict(list), {}
+        rows = ProductSpec.objects.order_by("product_id", "order", "pk").values_list("product_id", "label", "value")
+        for product_id, label, value in rows.iterator(chunk_size=5000):
+            # Spec rows repeat across products ("Form: Powder"); keep one record of each.
+            record = shared.setdefault((label, value), SpecRecord(label, value))
+            specs[product_id].append(record)
+        images = {}
+        primary = primary_image_prefetch().queryset
+        for product_id, name, alt_text in primary.values_list("product_id", "image", "alt_text").iterator():
+            images[product_id] = ImageRecord(StoredFile(name, default_storage.url(name)), alt_text)
+
+        url_template = reverse("product_detail", kwargs={"slug": "__slug__"})
+        products = []
+        for pk, slug, name, icon, description, order, category_id in (
+            Product.objects.order_by().card_rows().iterator(chunk_size=5000)
+        ):
+            products.append(ProductRecord(
+                pk, slug, name, icon, description, order, categories[category_id],
+                tuple(specs.get(pk, ())), images.get(pk), url_template.replace("__slug__", slug),
+            ))
+        products.sort(key=sort_key)
+
+        by_pk = {p.pk: p for p in products}
+        promotions = defaultdict(list)
+        through = ProductArticle.promoted_products.through.objects.values_list("productarticle_id", "product_id")
+        for article_id, product_id in through.iterator():
+            if product_id in by_pk:
+                promotions[article_id].append(by_pk[product_id])
+        promotions = {
+            article_id: tuple(sorted(rows, key=sort_key))
+            for article_id, rows in promotions.items()
+        }
+        return cls(tuple(categories.values()), tuple(products), promotions)
+
+    def __len__(self):
+        return len(self.products)
+
+    # ── Lists ─────────────────────────────────────────────────────────
+
+    def page(self, cursor=None, size=PAGE_SIZE, matches=None):
+        """Like ``app.pagination.product_page``: the ``size`` products after
+        ``cursor`` for which ``matches(pk)`` holds (every product by default)."""
+        key = decode_cursor(cursor)
+        start = bisect_right(self.products, key, key=sort_key) if key is not None else 0
+        items = []
+        products = self.products
+        for i in range(start, len(products)):
+            if matches is None or matches(products[i].pk):
+                items.append(products[i])
+                if len(items) > size:
+                    return Page(items[:size], encode_cursor(items[size - 1]))
+        return Page(items, None)
+
+    def related(self, product_pk, category_pk, limit=3):
+        """The first ``limit`` other products of the category."""
+        rows = (p for p in self.by_category.get(category_pk, ()) if p.pk != product_pk)
+        return [p for _, p in zip(range(limit), rows)]
+
+    def promoted(self, article_pk, limit=8):
+        return list(self.promotions.get(article_pk, ())[:limit])
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Per-worker snapshot
+# ─────────────────────────────────────────────────────────────────────
+
+_catalog = (None, None)  # (generation, Catalog)
+_rebuild_lock = threading.Lock()
+
+
+def invalidate_catalog():
+    """Expire every worker's snapshot (called from signal handlers)."""
+    bump_generation(CATALOG_GENERATION)
+
+
+def get_catalog():
+    """This worker's snapshot for the current ``catalog`` generation."""
+    global _catalog
+    generation = get_generation(CATALOG_GENERATION)
+    current_generation, catalog = _catalog
+    if catalog is not None and current_generation == generation:
+        return catalog
+    # Only one thread rebuilds; the others keep answering from the old copy.
+    if not _rebuild_lock.acquire(blocking=catalog is None):
+        return catalog
+    try:
+        current_generation, catalog = _catalog
+        if catalog is None or current_generation != generation:
+            catalog = Catalog.build()
+            _catalog = (generation, catalog)
+        return catalog
+    finally:
+        _rebuild_lock.release()
+
+
+def preload():
+    """Build the catalogue snapshot and facet index in the server's master
+    process (``gunicorn --preload`` imports ``devapp.wsgi`` before forking).
+
+    Failures are logged, not raised: workers then build lazily.  Database
+    connections are closed so no worker inherits the master's socket, and
+    the loaded objects are moved out of the collector's reach (``gc.freeze``)
+    so collections in the workers do not dirty the shared pages.
+    """
+    from .facet_index import get_index
+    from .facets import get_facets
+
+    try:
+        get_catalog()
+        get_index(get_facets())
+    except DatabaseError:
+        logger.warning("Catalogue preload skipped", exc_info=True)
+    finally:
+        connections.close_all()
+    gc.freeze()
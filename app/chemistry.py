@@ -0,0 +1,255 @@
+"""
+Structured chemistry data parsed from a product's free-text fields.
+
+``Product.molecular_formula``, ``molecular_weight`` and ``cas_number`` are
+what editors type.  On every save ``index_product`` parses them into the
+``ProductChemistry`` row (Hill formula, computed / stated molecular weight,
+canonical CAS number and its check-digit status) and one ``ProductElement``
+row per element, so element and weight-range lookups are indexed SQL::
+
+    containing(Product.objects.all(), "S", "N")
+    Product.objects.filter(chemistry__molecular_weight__range=(100, 200))
+
+``manage.py reindex_chemistry`` re-parses the whole catalogue in batches.
+"""
+
+import re
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+
+from django.db import transaction
+
+# Standard atomic weights (IUPAC abridged, conventional values); mass number
+# of the longest-lived isotope for elements without one.
+ATOMIC_WEIGHTS = {
+    "H": 1.008, "He": 4.0026, "Li": 6.94, "Be": 9.0122, "B": 10.81, "C": 12.011,
+    "N": 14.007, "O": 15.999, "F": 18.998, "Ne": 20.180, "Na": 22.990, "Mg": 24.305,
+    "Al": 26.982, "Si": 28.085, "P": 30.974, "S": 32.06, "Cl": 35.45, "Ar": 39.95,
+    "K": 39.098, "Ca": 40.078, "Sc": 44.956, "Ti": 47.867, "V": 50.942, "Cr": 51.996,
+    "Mn": 54.938, "Fe": 55.845, "Co": 58.933, "Ni": 58.693, "Cu": 63.546, "Zn": 65.38,
+    "Ga": 69.723, "Ge": 72.630, "As": 74.922, "Se": 78.971, "Br": 79.904, "Kr": 83.798,
+    "Rb": 85.468, "Sr": 87.62, "Y": 88.906, "Zr": 91.224, "Nb": 92.906, "Mo": 95.95,
+    "Tc": 97, "Ru": 101.07, "Rh": 102.91, "Pd": 106.42, "Ag": 107.87, "Cd": 112.41,
+    "In": 114.82, "Sn": 118.71, "Sb": 121.76, "Te": 127.60, "I": 126.90, "Xe": 131.29,
+    "Cs": 132.91, "Ba": 137.33, "La": 138.91, "Ce": 140.12, "Pr": 140.91, "Nd": 144.24,
+    "Pm": 145, "Sm": 150.36, "Eu": 151.96, "Gd": 157.25, "Tb": 158.93, "Dy": 162.50,
+    "Ho": 164.93, "Er": 167.26, "Tm": 168.93, "Yb": 173.05, "Lu": 174.97, "Hf": 178.49,
+    "Ta": 180.95, "W": 183.84, "Re": 186.21, "Os": 190.23, "Ir": 192.22, "Pt": 195.08,
+    "Au": 196.97, "Hg": 200.59, "Tl": 204.38, "Pb": 207.2, "Bi": 208.98, "Po": 209,
+    "At": 210, "Rn": 222, "Fr": 223, "Ra": 226, "Ac": 227, "Th": 232.04,
+    "Pa": 231.04, "U": 238.03, "Np": 237, "Pu": 244, "Am": 243, "Cm": 247,
+    "Bk": 247, "Cf": 251, "Es": 252, "Fm": 257, "Md": 258, "No": 259, "Lr": 266,
+    "D": 2.014,
+}
+
+# A stated weight within this much of the computed one counts as verified.
+WEIGHT_TOLERANCE = 0.005  # relative
+
+_SUBSCRIPTS = str.maketrans("₀₁₂₃₄₅₆₇₈₉", "0123456789")
+_TOKEN_RE = re.compile(r"([A-Z][a-z]?)|(\d+)|([(\[{])|([)\]}])")
+# Hydrate / adduct separators: CuSO4·5H2O, CuSO4.5H2O, CuSO4*5H2O.
+_PART_RE = re.compile(r"\s*[·•∙.*]\s*")
+_WEIGHT_RE = re.compile(r"\d+(?:[.,]\d+)?")
+_CAS_RE = re.compile(r"^(\d{2,7})-?(\d{2})-?(\d)$")
+
+
+class FormulaError(ValueError):
+    pass
+
+
+def _parse_part(text):
+    stack = [Counter()]
+    position = 0
+    pending = None  # the group or element the next number multiplies
+    while position < len(text):
+        match = _TOKEN_RE.match(text, position)
+        if match is None:
+            raise FormulaError(f"Unexpected {text[position]!r} in {text!r}")
+        symbol, number, opening, closing = match.groups()
+        position = match.end()
+        if symbol:
+            if symbol not in ATOMIC_WEIGHTS:
+                raise FormulaError(f"Unknown element {symbol!r}")
+            stack[-1][symbol] += 1
+            pending = Counter({symbol: 1})
+        elif number:
+            if pending is None:
+                raise FormulaError(f"Misplaced count {number!r} in {text!r}")
+            for element, count in pending.items():
+                stack[-1][element] += count * (int(number) - 1)
+            pending = None
+        elif opening:
+            stack.append(Counter())
+            pending = None
+        else:
+            if len(stack) == 1:
+                raise FormulaError(f"Unbalanced brackets in {text!r}")
+            group = stack.pop()
+            stack[-1].update(group)
+            pending = group
+    if len(stack) != 1:
+        raise FormulaError(f"Unbalanced brackets in {text!r}")
+    return stack[0]
+
+
+def parse_formula(text):
+    """Element counts of ``text``, e.g. "CuSO4·5H2O" → {Cu: 1, S: 1, O: 9, H: 10}.
+
+    Raises ``FormulaError`` for anything that is not a plain formula.
+    """
+    text = unicodedata.normalize("NFKC", (text or "").translate(_SUBSCRIPTS)).strip()
+    if not text:
+        raise FormulaError("Empty formula")
+    counts = Counter()
+    for part in _PART_RE.split(text):
+        multiplier = re.match(r"\d+", part)
+        if multiplier:
+            part = part[multiplier.end():]
+        part = part.replace(" ", "")
+        if not part:
+            raise FormulaError(f"Empty component in {text!r}")
+        for element, count in _parse_part(part).items():
+            counts[element] += count * (int(multiplier.group()) if multiplier else 1)
+    return counts
+
+
+def hill_formula(counts):
+    """Hill-system notation: C, then H, then the rest alphabetically."""
+    def term(element):
+        return element + (str(counts[element]) if counts[element] > 1 else "")
+
+    elements = sorted(counts)
+    if "C" in counts:
+        first = ["C"] + (["H"] if "H" in counts else [])
+        elements = first + [e for e in elements if e not in first]
+    return "".join(term(e) for e in elements)
+
+
+def formula_weight(counts):
+    return round(sum(ATOMIC_WEIGHTS[element] * count for element, count in counts.items()), 3)
+
+
+def parse_weight(text):
+    """The first number in ``text`` ("172.20 g/mol" → 172.2), or None."""
+    match = _WEIGHT_RE.search(text or "")
+    return float(match.group().replace(",", ".")) if match else None
+
+
+def normalize_cas(text):
+    """Canonical "NNNNNNN-NN-N" form of ``text`` if it looks like a CAS number, else ""."""
+    match = _CAS_RE.match(re.sub(r"\s+", "", text or ""))
+    return "-".join(match.groups()) if match else ""
+
+
+def cas_check_digit(digits):
+    """Check digit for the leading ``digits`` of a CAS number."""
+    return sum(i * int(d) for i, d in enumerate(reversed(digits), start=1)) % 10
+
+
+def is_valid_cas(text):
+    canonical = normalize_cas(text)
+    if not canonical:
+        return False
+    body = canonical[:-2].replace("-", "")
+    return cas_check_digit(body) == int(canonical[-1])
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Indexing
+# ─────────────────────────────────────────────────────────────────────
+
+@lru_cache(maxsize=4096)
+def _analyse_formula(text):
+    """(Hill formula, weight, sorted element counts, error) – grades and pack
+    sizes of one chemical share a formula, so bulk re-indexing parses each once."""
+    try:
+        counts = parse_formula(text)
+    except FormulaError as exc:
+        return "", None, (), str(exc)[:200]
+    return hill_formula(counts), formula_weight(counts), tuple(sorted(counts.items())), ""
+
+
+def analyse(product):
+    """Return unsaved ``(ProductChemistry, [ProductElement, …])`` for ``product``."""
+    from .models import ProductChemistry, ProductElement
+
+    row = ProductChemistry(product_id=product.pk)
+    counts = ()
+    if product.molecular_formula.strip():
+        row.formula, row.computed_weight, counts, row.formula_error = _analyse_formula(product.molecular_formula)
+
+    row.stated_weight = parse_weight(product.molecular_weight)
+    if row.computed_weight is not None and row.stated_weight is not None:
+        difference = abs(row.computed_weight - row.stated_weight)
+        row.weight_matches = difference <= WEIGHT_TOLERANCE * row.computed_weight
+    row.molecular_weight = row.computed_weight if row.computed_weight is not None else row.stated_weight
+
+    if product.cas_number.strip():
+        row.cas_number = normalize_cas(product.cas_number)
+        row.cas_valid = is_valid_cas(product.cas_number)
+
+    elements = [
+        ProductElement(product_id=product.pk, symbol=element, count=count)
+        for element, count in counts
+    ]
+    return row, elements
+
+
+CHEMISTRY_FIELDS = (
+    "formula", "formula_error", "computed_weight", "stated_weight", "weight_matches",
+    "molecular_weight", "cas_number", "cas_valid",
+)
+
+
+def index_products(products):
+    """Write the chemistry rows of ``products`` (saved ``Product`` instances)."""
+    from .models import ProductChemistry, ProductElement
+
+    rows, elements = [], []
+    for product in products:
+        row, product_elements = analyse(product)
+        rows.append(row)
+        elements.extend(product_elements)
+    if not rows:
+        return 0
+    with transaction.atomic():
+        ProductChemistry.objects.bulk_create(
+            rows, update_conflicts=True, unique_fields=["product"], update_fields=CHEMISTRY_FIELDS,
+        )
+        ProductElement.objects.filter(product_id__in=[row.product_id for row in rows]).delete()
+        ProductElement.objects.bulk_create(elements)
+    return len(rows)
+
+
+def index_product(product):
+    index_products([product])
+
+
+def reindex_all(batch_size=1000):
+    """Re-parse every product in primary-key batches; yields the running total."""
+    from .models import Product
+
+    products = Product.objects.order_by("pk").only("pk", "molecular_formula", "molecular_weight", "cas_number")
+    done, last_pk = 0, 0
+    while True:
+        batch = list(products.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return
+        done += index_products(batch)
+        last_pk = batch[-1].pk
+        yield done
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Queries
+# ─────────────────────────────────────────────────────────────────────
+
+def containing(queryset, *symbols, min_count=1):
+    """Products of ``queryset`` whose formula contains every element in ``symbols``."""
+    from .models import ProductElement
+
+    for symbol in symbols:
+        matching = ProductElement.objects.filter(symbol=symbol, count__gte=min_count)
+        queryset = queryset.filter(pk__in=matching.values("product_id"))
+    return queryset
@@ -0,0 +1,165 @@
+"""
+Conditional GET support – ETag / Last-Modified validators for detail pages.
+
+Validators are computed from ``updated_at`` timestamps (a single query per
+page, or none for static insights) *before* any rendering, so an unchanged
+page is answered with 304 without touching the template engine.  Every tag
+also folds in a digest of the templates shipped with this build, so a deploy
+that changes markup invalidates clients' copies.
+"""
+
+import hashlib
+import json
+from functools import wraps
+from pathlib import Path
+
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .cache import get_company_details, get_generation
+from .insights_data import INSIGHTS
+
+
+def _template_digest():
+    digest = hashlib.sha1()
+    for path in sorted((Path(__file__).resolve().parent / "templates").rglob("*.html")):
+        digest.update(path.name.encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+TEMPLATE_DIGEST = _template_digest()
+
+# Insights are static data – their tags are fixed for the life of the build.
+INSIGHT_DIGESTS = {
+    item["slug"]: hashlib.sha1(json.dumps(item, sort_keys=True).encode()).hexdigest()
+    for item in INSIGHTS
+}
+INSIGHTS_DIGEST = hashlib.sha1("".join(sorted(INSIGHT_DIGESTS.values())).encode()).hexdigest()
+
+
+def make_etag(*parts, weak=True):
+    """Build an ETag from ``parts`` – weak by default, as bodies may be re-encoded.
+
+    The image-derivative generation is folded in because newly built
+    derivatives change the ``<picture>`` markup of otherwise unchanged pages.
+    """
+    raw = "|".join(str(p) for p in (TEMPLATE_DIGEST, get_generation("images"), *parts))
+    return ('W/"%s"' if weak else '"%s"') % hashlib.sha1(raw.encode()).hexdigest()
+
+
+def conditional_page(validators):
+    """Answer conditional GETs for a view from ``validators(request, **kwargs)``.
+
+    ``validators`` returns ``(etag, last_modified)`` – either may be None – or
+    None when the object does not exist (the view then runs and 404s).
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view_func(request, *args, **kwargs)
+            result = validators(request, *args, **kwargs)
+            if result is None:
+                return view_func(request, *args, **kwargs)
+            etag, last_modified = result
+            timestamp = int(last_modified.timestamp()) if last_modified else None
+
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = view_func(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                if etag and not response.has_header("ETag"):
+                    response["ETag"] = etag
+                if timestamp and not response.has_header("Last-Modified"):
+                    response["Last-Modified"] = http_date(timestamp)
+            return response
+        return wrapper
+    return decorator
+
+
+def _latest(*stamps):
+    stamps = [s for s in stamps if s is not None]
+    return max(stamps) if stamps else None
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Validators
+# ─────────────────────────────────────────────────────────────────────
+
+def product_validators(request, slug):
+    """Product row, its category, related products (stored neighbours, else
+    siblings) and company."""
+    from .models import Product, ProductNeighbor
+
+    siblings = (
+        Product.objects.filter(category_id=OuterRef("category_id"))
+        .order_by().values("category_id")
+    )
+    neighbors = (
+        ProductNeighbor.objects.filter(product_id=OuterRef("pk"))
+        .order_by().values("product_id").annotate(v=Max("neighbor__updated_at")).values("v")
+    )
+    row = (
+        Product.objects.filter(slug=slug)
+        .values("pk", "updated_at", "category__updated_at")
+        .annotate(
+            siblings_updated=Subquery(siblings.annotate(v=Max("updated_at")).values("v")),
+            # Catches deletions, which leave the latest timestamp unchanged.
+            siblings_count=Subquery(siblings.annotate(v=Count("pk")).values("v")),
+            neighbors_updated=Subquery(neighbors),
+        )
+        .first()
+    )
+    if row is None:
+        return None
+    company = get_company_details().updated_at
+    last_modified = _latest(row["updated_at"], row["category__updated_at"], row["siblings_updated"],
+                            row["neighbors_updated"], company)
+    # The generation moves whenever the stored neighbour lists are rewritten.
+    etag = make_etag("product", row["pk"], row["updated_at"], row["category__updated_at"],
+                     row["siblings_updated"], row["siblings_count"], row["neighbors_updated"],
+                     get_generation("recommendations"), company)
+    return etag, last_modified
+
+
+def article_validators(request, slug):
+    """Article row, promoted products, other published articles and company."""
+    from .models import Product, ProductArticle
+
+    promoted = (
+        Product.objects.filter(article_promotions=OuterRef("pk"))
+        .order_by().values("article_promotions").annotate(latest=Max("updated_at")).values("latest")
+    )
+    others = ProductArticle.objects.filter(is_published=True).order_by().values("is_published")
+    row = (
+        ProductArticle.objects.filter(slug=slug, is_published=True)
+        .values("pk", "updated_at")
+        .annotate(
+            promoted_updated=Subquery(promoted),
+            articles_updated=Subquery(others.annotate(v=Max("updated_at")).values("v")),
+            articles_count=Subquery(others.annotate(v=Count("pk")).values("v")),
+        )
+        .first()
+    )
+    if row is None:
+        return None
+    company = get_company_details().updated_at
+    last_modified = _latest(row["updated_at"], row["promoted_updated"], row["articles_updated"], company)
+    etag = make_etag("article", row["pk"], row["updated_at"], row["promoted_updated"],
+                     row["articles_updated"], row["articles_count"], company)
+    return etag, last_modified
+
+
+def insight_validators(request, slug):
+    digest = INSIGHT_DIGESTS.get(slug)
+    if digest is None:
+        return None
+    company = get_company_details().updated_at
+    return make_etag("insight", digest, company), company
+
+
+def insights_list_validators(request):
+    company = get_company_details().updated_at
+    return make_etag("insights", INSIGHTS_DIGEST, company), company
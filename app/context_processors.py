@@ -1,6 +1,6 @@
-from .models import CompanyDetails
+from .cache import get_company_details
 
 
 def company_details(request):
     """Make company details available in every template as {{ company }}."""
-    return {"company": CompanyDetails.load()}
+    return {"company": get_company_details()}
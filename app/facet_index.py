@@ -0,0 +1,226 @@
+"""
+In-process bitset index over the product facets.
+
+Every product gets a *slot*; every facet value (``Choice.key`` in
+``app.facets``) gets one Python ``int`` whose bit ``slot`` is set when the
+product has that value.  A selection is then AND-ed / OR-ed ints and each
+count an ``int.bit_count()`` – no SQL at all, typically well under a
+millisecond even for hundreds of thousands of products.
+
+Like the autocomplete and fuzzy indexes, each worker holds an immutable
+``FacetIndex`` and swaps in a new one when the ``content`` generation
+moves.  A new snapshot is normally a *patch*: products whose
+``updated_at`` (touched by inline edits too, see ``app.signals``) is newer
+than the snapshot are re-read, deleted ones are cleared, and only if many
+rows changed or the set of facet values moved is the index rebuilt.
+"""
+
+import threading
+from collections import defaultdict
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .cache import get_generation
+
+# Clock skew between workers and the database: re-read a little more.
+PATCH_MARGIN = timedelta(minutes=5)
+# Beyond this many changed products a rebuild is cheaper than patching.
+MAX_PATCH_PRODUCTS = 1000
+
+_GRADE_FIELDS = (
+    ("technical", "is_technical_grade"),
+    ("industrial", "is_industrial_grade"),
+    ("analytical", "is_analytical_grade"),
+    ("pharma", "is_pharma_grade"),
+)
+
+
+def _facet_keys(pks=None, spec_labels=()):
+    """Yield ``(pk, facet key)`` for every facet value of ``pks`` (default: every product)."""
+    from .facets import HAZARD_GROUPS
+    from .models import Product, ProductHazardStatement, ProductSpec
+
+    products = Product.objects.order_by()
+    specs = ProductSpec.objects.filter(label__in=spec_labels).order_by()
+    hazards = ProductHazardStatement.objects.filter(code__group__in=HAZARD_GROUPS).order_by()
+    if pks is not None:
+        products = products.filter(pk__in=pks)
+        specs = specs.filter(product_id__in=pks)
+        hazards = hazards.filter(product_id__in=pks)
+
+    fields = ("pk", "category_id", "signal_word", "dangerous_goods", *(f for _, f in _GRADE_FIELDS))
+    for pk, category_id, signal_word, dangerous_goods, *grades in products.values_list(*fields).iterator(chunk_size=5000):
+        yield pk, ("category", category_id)
+        for (grade, _), flag in zip(_GRADE_FIELDS, grades):
+            if flag:
+                yield pk, ("grade", grade)
+        if signal_word:
+            yield pk, ("signal_word", signal_word)
+        if dangerous_goods is not None:
+            yield pk, ("dangerous_goods", dangerous_goods)
+    for pk, label, value in specs.values_list("product_id", "label", "value").iterator(chunk_size=5000):
+        yield pk, ("spec", label, value)
+    rows = hazards.values_list("product_id", "code__code", "code__hazard_class")
+    for pk, code, hazard_class in rows.iterator(chunk_size=5000):
+        yield pk, ("hazard_code", code)
+        if hazard_class:
+            yield pk, ("hazard_class", hazard_class)
+
+
+def _bitsets(pairs, slots):
+    """``{key: int}`` from ``(pk, key)`` pairs; pks without a slot are skipped."""
+    size = max(slots.values(), default=0) // 8 + 1
+    buffers = {}
+    for pk, key in pairs:
+        slot = slots.get(pk)
+        if slot is None:  # created after the pk list was read; the next patch adds it
+            continue
+        buffer = buffers.get(key)
+        if buffer is None:
+            buffer = buffers[key] = bytearray(size)
+        buffer[slot >> 3] |= 1 << (slot & 7)
+    return {key: int.from_bytes(buffer, "little") for key, buffer in buffers.items()}
+
+
+class FacetIndex:
+    __slots__ = ("slots", "pks", "bitsets", "live", "spec_labels", "built_at")
+
+    def __init__(self, slots, pks, bitsets, live, spec_labels, built_at):
+        self.slots = slots            # pk → slot
+        self.pks = pks                # slot → pk (None once deleted; slots are never reused)
+        self.bitsets = bitsets        # facet key → int
+        self.live = live              # bits of products that still exist
+        self.spec_labels = spec_labels
+        self.built_at = built_at
+
+    @classmethod
+    def build(cls, spec_labels=()):
+        from .models import Product
+
+        built_at = timezone.now()
+        pks = list(Product.objects.order_by("pk").values_list("pk", flat=True))
+        slots = {pk: slot for slot, pk in enumerate(pks)}
+        bitsets = _bitsets(_facet_keys(spec_labels=spec_labels), slots)
+        return cls(slots, pks, bitsets, (1 << len(pks)) - 1, frozenset(spec_labels), built_at)
+
+    def patched(self):
+        """A new index with changes since this one was built, or None to rebuild."""
+        from .models import Product
+
+        built_at = timezone.now()
+        changed = list(
+            Product.objects.filter(updated_at__gte=self.built_at - PATCH_MARGIN).values_list("pk", flat=True)
+        )
+        existing = set(Product.objects.values_list("pk", flat=True))
+        removed = [pk for pk in self.slots if pk not in existing]
+        added = sorted(existing.difference(self.slots))
+        if len(changed) + len(removed) + len(added) > MAX_PATCH_PRODUCTS:
+            return None
+
+        slots, pks = dict(self.slots), list(self.pks)
+        stale = 0
+        for pk in (*changed, *removed):
+            if pk in self.slots:
+                stale |= 1 << self.slots[pk]
+        removed_bits = 0
+        for pk in removed:
+            removed_bits |= 1 << slots[pk]
+            pks[slots.pop(pk)] = None
+        for pk in added:
+            slots[pk] = len(pks)
+            pks.append(pk)
+
+        keep = ~stale
+        bitsets = {key: bits & keep for key, bits in self.bitsets.items()}
+        fresh = set(changed).union(added)
+        fresh_slots = {pk: slots[pk] for pk in fresh if pk in slots}
+        for key, bits in _bitsets(_facet_keys(fresh, self.spec_labels), fresh_slots).items():
+            bitsets[key] = bitsets.get(key, 0) | bits
+        added_bits = ((1 << len(pks)) - 1) ^ ((1 << len(self.pks)) - 1)
+        live = (self.live | added_bits) & ~removed_bits
+        return FacetIndex(slots, pks, bitsets, live, self.spec_labels, built_at)
+
+    def __len__(self):
+        return self.live.bit_count()
+
+    def nbytes(self):
+        """Approximate size of the bitsets in bytes."""
+        return sum((bits.bit_length() + 7) // 8 for bits in self.bitsets.values())
+
+    # ── Queries ───────────────────────────────────────────────────────
+
+    def _selected_bits(self, facet, values):
+        bits = 0
+        for choice in facet.choices:
+            if choice.value in values:
+                bits |= self.bitsets.get(choice.key, 0)
+        return bits
+
+    def match(self, facets, selection, exclude=None):
+        """Bits of the products matching ``selection`` (ignoring facet ``exclude``)."""
+        bits = self.live
+        for facet in facets:
+            if facet.name != exclude and facet.name in selection:
+                bits &= self._selected_bits(facet, selection[facet.name])
+        return bits
+
+    def counts(self, facets, selection):
+        """``{"total": n, "f<i>_<j>": n, …}`` – the same shape as the SQL aggregate."""
+        counts = {"total": self.match(facets, selection).bit_count()}
+        for i, facet in enumerate(facets):
+            others = self.match(facets, selection, exclude=facet.name)
+            for j, choice in enumerate(facet.choices):
+                counts[f"f{i}_{j}"] = (others & self.bitsets.get(choice.key, 0)).bit_count()
+        return counts
+
+    def product_pks(self, bits, limit=None):
+        """Primary keys of the products in ``bits``, in slot order."""
+        pks = []
+        while bits and (limit is None or len(pks) < limit):
+            low = bits & -bits
+            pks.append(self.pks[low.bit_length() - 1])
+            bits ^= low
+        return pks
+
+    def membership(self, bits):
+        """A ``pk -> bool`` test for the products in ``bits``, constant time per call."""
+        data = bits.to_bytes((len(self.pks) + 7) // 8, "little")
+        slots = self.slots
+
+        def contains(pk):
+            slot = slots.get(pk)
+            return slot is not None and bool(data[slot >> 3] >> (slot & 7) & 1)
+        return contains
+
+
+_index = (None, None)  # (generation, FacetIndex)
+_rebuild_lock = threading.Lock()
+
+
+def _spec_labels(facets):
+    return frozenset(f.choices[0].key[1] for f in facets if f.choices and f.choices[0].key[0] == "spec")
+
+
+def get_index(facets):
+    """This worker's index for the current catalogue, patched or rebuilt as needed."""
+    global _index
+    generation = get_generation("content")
+    current_generation, index = _index
+    spec_labels = _spec_labels(facets)
+    if index is not None and current_generation == generation and index.spec_labels == spec_labels:
+        return index
+    # Only one thread refreshes; the others keep answering from the old copy.
+    if not _rebuild_lock.acquire(blocking=index is None):
+        return index
+    try:
+        current_generation, index = _index
+        if index is None or current_generation != generation or index.spec_labels != spec_labels:
+            refreshed = None
+            if index is not None and index.spec_labels == spec_labels:
+                refreshed = index.patched()
+            index = refreshed or FacetIndex.build(spec_labels)
+            _index = (generation, index)
+        return index
+    finally:
+        _rebuild_lock.release()
@@ -0,0 +1,198 @@
+"""
+Server-side faceted navigation for the product catalogue.
+
+Facets are category, the four grade flags, signal word, dangerous goods,
+GHS hazard class and H-code, and one facet per common ``ProductSpec``
+label.  Values selected within a facet are OR-ed and facets are AND-ed; each value's count is what the result size
+would be with that value added to the other facets' selections
+("disjunctive" counts, so picking one category still shows the others).
+
+Counts come from the per-worker bitset index in ``app.facet_index`` – no
+query once it is built.  ``_compute`` is the equivalent SQL, one
+``aggregate()`` with a conditional ``COUNT`` per facet value, kept as the
+reference the index is tested and benchmarked against.  The category and
+spec data the facet definitions are built from is cached under the
+``content`` generation, like rendered pages.
+"""
+
+from collections import namedtuple
+from functools import reduce
+from operator import or_
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .cache import get_generation
+
+FACETS_KEY = "vcp:facets:{}:{}"
+FACETS_TIMEOUT = 60 * 60 * 24
+
+GRADES = (
+    ("technical", "Technical", "is_technical_grade"),
+    ("industrial", "Industrial", "is_industrial_grade"),
+    ("analytical", "Analytical", "is_analytical_grade"),
+    ("pharma", "Pharma", "is_pharma_grade"),
+)
+SIGNAL_WORDS = ("Danger", "Warning")
+# H-codes only: precautionary codes describe handling, not the product.
+HAZARD_GROUPS = ("Physical", "Health", "Environmental")
+
+# Spec labels shown as facets: the most common ones, and only values that
+# more than one product shares (one-off values do not narrow anything).
+MAX_SPEC_FACETS = 6
+MIN_SPEC_PRODUCTS = 2
+SPEC_SEPARATOR = ":"
+
+# ``key`` names the value's bitset in ``app.facet_index``; unlike ``value``
+# (a category slug, say) it does not change when a label is edited.
+Choice = namedtuple("Choice", "value label condition key")
+Facet = namedtuple("Facet", "name label param choices")
+FacetValue = namedtuple("FacetValue", "value label count selected")
+FacetCounts = namedtuple("FacetCounts", "total facets")  # facets: [(Facet, [FacetValue, …])]
+
+
+def _catalogue_values():
+    """Plain (picklable) category and spec-pair data the facets are built from."""
+    from .models import HazardCode, ProductCategory, ProductSpec
+
+    categories = list(ProductCategory.objects.order_by("order", "label").values_list("pk", "slug", "label"))
+    used_codes = HazardCode.objects.filter(group__in=HAZARD_GROUPS, products__isnull=False).distinct()
+    hazard_classes = sorted(set(used_codes.exclude(hazard_class="").values_list("hazard_class", flat=True)))
+    hazard_codes = sorted(set(used_codes.values_list("code", flat=True)))
+    pairs = (
+        ProductSpec.objects.values("label", "value")
+        .annotate(products=Count("product", distinct=True))
+        .filter(products__gte=MIN_SPEC_PRODUCTS)
+        .order_by("label", "value")
+    )
+    specs = {}
+    for row in pairs:
+        specs.setdefault(row["label"], []).append(row["value"])
+    popular = sorted(specs, key=lambda label: (-len(specs[label]), label))[:MAX_SPEC_FACETS]
+    return categories, [(label, specs[label]) for label in sorted(popular)], hazard_classes, hazard_codes
+
+
+def _spec_facet(label, values):
+    from .models import ProductSpec
+
+    choices = []
+    for value in values:
+        # A subquery rather than a join: no duplicate rows, so no COUNT(DISTINCT).
+        products = ProductSpec.objects.filter(label=label, value=value).values("product_id")
+        choices.append(Choice(
+            f"{label}{SPEC_SEPARATOR}{value}", value, Q(pk__in=products), ("spec", label, value),
+        ))
+    return Facet(f"spec:{label}", label, "spec", choices)
+
+
+def _hazard_facet(name, label, param, lookup, values):
+    from .models import ProductHazardStatement
+
+    choices = []
+    for value in values:
+        products = ProductHazardStatement.objects.filter(**{lookup: value}).values("product_id")
+        choices.append(Choice(value, value, Q(pk__in=products), (name, value)))
+    return Facet(name, label, param, choices)
+
+
+def get_facets():
+    """The facet definitions for the current catalogue (source data cached)."""
+    key = FACETS_KEY.format(get_generation("content"), "values")
+    values = cache.get(key)
+    if values is None:
+        values = _catalogue_values()
+        cache.set(key, values, FACETS_TIMEOUT)
+    categories, specs, hazard_classes, hazard_codes = values
+    return [
+        Facet("category", "Category", "category", [
+            Choice(slug, label, Q(category_id=pk), ("category", pk)) for pk, slug, label in categories
+        ]),
+        Facet("grade", "Grade", "grade", [
+            Choice(value, label, Q(**{field: True}), ("grade", value)) for value, label, field in GRADES
+        ]),
+        Facet("signal_word", "GHS signal word", "signal_word", [
+            Choice(word.lower(), word, Q(signal_word=word), ("signal_word", word)) for word in SIGNAL_WORDS
+        ]),
+        Facet("dangerous_goods", "Dangerous goods", "dangerous_goods", [
+            Choice("yes", "Dangerous goods", Q(dangerous_goods=True), ("dangerous_goods", True)),
+            Choice("no", "Not dangerous goods", Q(dangerous_goods=False), ("dangerous_goods", False)),
+        ]),
+        _hazard_facet("hazard_class", "Hazard class", "hazard_class", "code__hazard_class", hazard_classes),
+        _hazard_facet("hazard_code", "Hazard statement", "hazard", "code__code", hazard_codes),
+        *(_spec_facet(label, values) for label, values in specs),
+    ]
+
+
+def selection_from(query_dict, facets=None):
+    """``{facet name: frozenset of values}`` for the known values in ``query_dict``."""
+    selection = {}
+    for facet in facets or get_facets():
+        requested = set(query_dict.getlist(facet.param))
+        chosen = frozenset(c.value for c in facet.choices if c.value in requested)
+        if chosen:
+            selection[facet.name] = chosen
+    return selection
+
+
+def selection_condition(facets, selection, exclude=None):
+    """The product-level ``Q`` for ``selection``, ignoring facet ``exclude``."""
+    condition = Q()
+    for facet in facets:
+        if facet.name == exclude or facet.name not in selection:
+            continue
+        chosen = [c.condition for c in facet.choices if c.value in selection[facet.name]]
+        condition &= reduce(or_, chosen)
+    return condition
+
+
+def filter_products(queryset, selection, facets=None):
+    return queryset.filter(selection_condition(facets or get_facets(), selection))
+
+
+def _count(condition):
+    return Count("pk", filter=condition or None)
+
+
+def _compute(facets, selection):
+    from .models import Product
+
+    aggregates = {"total": _count(selection_condition(facets, selection))}
+    for i, facet in enumerate(facets):
+        others = selection_condition(facets, selection, exclude=facet.name)
+        for j, choice in enumerate(facet.choices):
+            aggregates[f"f{i}_{j}"] = _count(others & choice.condition)
+    return Product.objects.order_by().aggregate(**aggregates)
+
+
+def facet_counts(selection, facets=None):
+    """``FacetCounts`` for ``selection``, counted on the bitset index."""
+    from .facet_index import get_index
+
+    facets = facets or get_facets()
+    counts = get_index(facets).counts(facets, selection)
+
+    results = []
+    for i, facet in enumerate(facets):
+        chosen = selection.get(facet.name, frozenset())
+        values = [
+            FacetValue(choice.value, choice.label, counts[f"f{i}_{j}"], choice.value in chosen)
+            for j, choice in enumerate(facet.choices)
+        ]
+        results.append((facet, values))
+    return FacetCounts(counts["total"], results)
+
+
+def facet_counts_json(counts):
+    """``FacetCounts`` as plain data for ``JsonResponse``."""
+    return {
+        "total": counts.total,
+        "facets": [
+            {
+                "name": facet.name,
+                "label": facet.label,
+                "param": facet.param,
+                "values": [value._asdict() for value in values],
+            }
+            for facet, values in counts.facets
+        ],
+    }
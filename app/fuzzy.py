@@ -0,0 +1,195 @@
+"""
+Typo-tolerant product name matching with a trigram index.
+
+Every product contributes *entries*: the whole value of its name, brand
+name, common names and molecular formula, plus each word of four or more
+letters in them, so "toluenesulphonic" finds the "toluenesulfonic" inside
+"p-Toluenesulfonic acid".  Entries are split into pg_trgm-style trigrams
+(each word padded as ``"  word "``) and ranked by Jaccard similarity of the
+trigram sets.
+
+Like ``app.autocomplete``, each worker keeps an immutable snapshot – here
+one ``array`` of entry ids per trigram – rebuilt when the ``fuzzy``
+generation moves.  Used by the public search ("similar products") and by
+``ProductAdmin.get_search_results``.
+"""
+
+import math
+import re
+import threading
+from array import array
+from bisect import bisect_left
+from collections import Counter, namedtuple
+
+from django.urls import reverse
+
+from .cache import bump_generation, get_generation
+from .search import normalize
+
+SIMILARITY_THRESHOLD = 0.3
+MIN_WORD_LENGTH = 4
+# Entries scored exactly, picked by how many of the rarer trigrams they share.
+MAX_CANDIDATES = 300
+# Trigrams in more than this share of all entries ("  b", "ene") are only
+# ever checked on candidates, never used to find them.
+COMMON_TRIGRAM_SHARE = 0.05
+
+FuzzyMatch = namedtuple("FuzzyMatch", "pk name url similarity")
+
+_WORD_RE = re.compile(r"[^\W_]+")
+
+
+def trigrams(text):
+    """The pg_trgm trigram set of ``text``."""
+    grams = set()
+    for word in _WORD_RE.findall(normalize(text)):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _entries(values):
+    """Whole values plus their longer words, de-duplicated."""
+    seen = set()
+    for value in values:
+        value = " ".join(_WORD_RE.findall(normalize(value)))
+        if not value:
+            continue
+        candidates = [value]
+        words = value.split()
+        if len(words) > 1:
+            candidates.extend(w for w in words if len(w) >= MIN_WORD_LENGTH)
+        for candidate in candidates:
+            if candidate not in seen:
+                seen.add(candidate)
+                yield candidate
+
+
+class TrigramIndex:
+    """Posting arrays of entry ids per trigram, with entry → product slots."""
+
+    __slots__ = (
+        "trigram_ids", "postings", "entry_sizes", "entry_slots", "pks", "names", "slugs", "url_template",
+    )
+
+    def __init__(self, rows):
+        self.trigram_ids = {}
+        postings = []
+        self.entry_sizes = array("H")
+        self.entry_slots = array("I")
+        self.pks = array("Q")
+        names, slugs = [], []
+        for pk, name, slug, brand, common_names, formula in rows:
+            slot = len(names)
+            self.pks.append(pk)
+            names.append(name)
+            slugs.append(slug)
+            for entry in _entries((name, brand, *common_names.splitlines(), formula)):
+                grams = trigrams(entry)
+                entry_id = len(self.entry_slots)
+                self.entry_sizes.append(min(len(grams), 0xFFFF))
+                self.entry_slots.append(slot)
+                for gram in grams:
+                    gram_id = self.trigram_ids.get(gram)
+                    if gram_id is None:
+                        gram_id = self.trigram_ids[gram] = len(postings)
+                        postings.append(array("I"))
+                    postings[gram_id].append(entry_id)
+        self.postings = tuple(postings)
+        self.names = tuple(names)
+        self.slugs = tuple(slugs)
+        self.url_template = reverse("product_detail", kwargs={"slug": "__slug__"})
+
+    def __len__(self):
+        return len(self.names)
+
+    def match(self, query, limit=10, threshold=SIMILARITY_THRESHOLD):
+        """Return up to ``limit`` ``FuzzyMatch`` tuples, most similar first."""
+        grams = trigrams(query)
+        if not grams:
+            return []
+        postings = self.postings
+        size = len(grams)
+        # Jaccard ≥ t needs at least ⌈t·|query|⌉ shared trigrams, so every
+        # match contains one of the |query| − needed + 1 rarest trigrams:
+        # only those are counted.  Candidates are then checked against the
+        # common trigrams by bisecting their (sorted) posting arrays.
+        needed = max(1, math.ceil(threshold * size))
+        ids = sorted(
+            (self.trigram_ids[g] for g in grams if g in self.trigram_ids),
+            key=lambda gram_id: len(postings[gram_id]),
+        )
+        if len(ids) < needed:
+            return []
+        cut = len(ids) - needed + 1
+        common_length = COMMON_TRIGRAM_SHARE * len(self.entry_slots)
+        while cut > 1 and len(postings[ids[cut - 1]]) > common_length:
+            cut -= 1
+        counts = Counter()
+        for gram_id in ids[:cut]:
+            counts.update(postings[gram_id])  # counted in C
+        common = [postings[gram_id] for gram_id in ids[cut:]]
+
+        best = {}
+        for entry_id, shared in counts.most_common(MAX_CANDIDATES):
+            for posting in common:
+                i = bisect_left(posting, entry_id)
+                if i < len(posting) and posting[i] == entry_id:
+                    shared += 1
+            if shared < needed:
+                continue
+            similarity = shared / (size + self.entry_sizes[entry_id] - shared)
+            if similarity >= threshold:
+                slot = self.entry_slots[entry_id]
+                if similarity > best.get(slot, 0.0):
+                    best[slot] = similarity
+        ranked = sorted(best.items(), key=lambda item: (-item[1], self.names[item[0]]))[:limit]
+        return [
+            FuzzyMatch(
+                self.pks[slot], self.names[slot],
+                self.url_template.replace("__slug__", self.slugs[slot]), round(similarity, 3),
+            )
+            for slot, similarity in ranked
+        ]
+
+
+def _load():
+    from .models import Product
+
+    rows = Product.objects.order_by().values_list(
+        "pk", "name", "slug", "brand_name", "common_names", "molecular_formula",
+    )
+    return TrigramIndex(rows.iterator(chunk_size=5000))
+
+
+_index = (None, None)  # (generation, TrigramIndex)
+_rebuild_lock = threading.Lock()
+
+
+def get_index():
+    """Return this worker's index, rebuilding it if products have changed."""
+    global _index
+    generation = get_generation("fuzzy")
+    current_generation, index = _index
+    if index is not None and current_generation == generation:
+        return index
+    # Only one thread rebuilds; the others keep answering from the old copy.
+    if not _rebuild_lock.acquire(blocking=index is None):
+        return index
+    try:
+        current_generation, index = _index
+        if index is None or current_generation != generation:
+            index = _load()
+            _index = (generation, index)
+        return index
+    finally:
+        _rebuild_lock.release()
+
+
+def fuzzy_products(query, limit=10, threshold=SIMILARITY_THRESHOLD):
+    query = (query or "")[:100]
+    return get_index().match(query, limit, threshold)
+
+
+def invalidate_fuzzy():
+    bump_generation("fuzzy")
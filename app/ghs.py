@@ -0,0 +1,222 @@
+"""
+GHS hazard / precautionary statements and pictograms as code tables.
+
+``Product.hazard_statements`` and ``precautionary_statements`` hold one
+statement per line ("H314: Causes severe skin burns and eye damage") and
+``hazard_pictograms`` a comma-separated list ("GHS05, GHS07").  On save
+``sync_product`` mirrors them into ``ProductHazardStatement`` rows (a
+through table to ``HazardCode``, which knows each code's GHS hazard class)
+and ``ProductPictogram`` rows (the through table of ``Product.pictograms``),
+each keeping the line or label as typed, so
+
+    Product.objects.filter(hazard_codes__hazard_class="Skin corrosion/irritation")
+    Product.objects.filter(pictograms__code="GHS05")
+
+are plain joins, and ``prefetch_safety`` loads everything a product page
+shows in two queries instead of re-splitting text on every render.
+"""
+
+import re
+
+from django.db import transaction
+from django.db.models import Prefetch
+
+PICTOGRAMS = {
+    "GHS01": "Exploding bomb",
+    "GHS02": "Flame",
+    "GHS03": "Flame over circle",
+    "GHS04": "Gas cylinder",
+    "GHS05": "Corrosion",
+    "GHS06": "Skull and crossbones",
+    "GHS07": "Exclamation mark",
+    "GHS08": "Health hazard",
+    "GHS09": "Environment",
+}
+
+# (first code, last code, hazard class) – GHS Annex 3 numbering.
+HAZARD_CLASSES = (
+    (200, 205, "Explosives"),
+    (206, 208, "Desensitized explosives"),
+    (220, 221, "Flammable gases"),
+    (222, 223, "Aerosols"),
+    (224, 226, "Flammable liquids"),
+    (228, 228, "Flammable solids"),
+    (229, 229, "Aerosols"),
+    (230, 232, "Flammable gases"),
+    (240, 242, "Self-reactive substances and organic peroxides"),
+    (250, 250, "Pyrophoric substances"),
+    (251, 252, "Self-heating substances"),
+    (260, 261, "Water-reactive substances"),
+    (270, 272, "Oxidizers"),
+    (280, 281, "Gases under pressure"),
+    (290, 290, "Corrosive to metals"),
+    (300, 302, "Acute toxicity"),
+    (304, 305, "Aspiration hazard"),
+    (310, 312, "Acute toxicity"),
+    (314, 316, "Skin corrosion/irritation"),
+    (317, 317, "Skin sensitization"),
+    (318, 320, "Serious eye damage/irritation"),
+    (330, 333, "Acute toxicity"),
+    (334, 334, "Respiratory sensitization"),
+    (335, 336, "Specific target organ toxicity"),
+    (340, 341, "Germ cell mutagenicity"),
+    (350, 351, "Carcinogenicity"),
+    (360, 362, "Reproductive toxicity"),
+    (370, 373, "Specific target organ toxicity"),
+    (400, 402, "Hazardous to the aquatic environment"),
+    (410, 413, "Hazardous to the aquatic environment"),
+    (420, 420, "Hazardous to the ozone layer"),
+)
+
+P_GROUPS = {"1": "General", "2": "Prevention", "3": "Response", "4": "Storage", "5": "Disposal"}
+
+_CODE = r"(?:EUH|H|P)\s?\d{3}"
+_STATEMENT_RE = re.compile(
+    rf"^\s*({_CODE}(?:\s*\+\s*{_CODE})*)\s*(?:[:\-–—.]\s*)?(.*)$", re.IGNORECASE,
+)
+_PICTOGRAM_RE = re.compile(r"^GHS\s?0?([1-9])$", re.IGNORECASE)
+_PICTOGRAM_NAMES = {name.lower(): code for code, name in PICTOGRAMS.items()}
+
+
+def classify(code):
+    """(group, hazard class) of a normalised code such as "H314" or "P301+P312"."""
+    first = code.split("+")[0]
+    if first.startswith("EUH"):
+        return "Supplemental", ""
+    number = int(first[1:])
+    if first.startswith("P"):
+        return P_GROUPS.get(str(number)[0], "Precautionary"), ""
+    group = {2: "Physical", 3: "Health", 4: "Environmental"}.get(number // 100, "Other")
+    for low, high, hazard_class in HAZARD_CLASSES:
+        if low <= number <= high:
+            return group, hazard_class
+    return group, ""
+
+
+def parse_statements(text):
+    """Yield ``(code or "", line)`` for each non-empty line of ``text``."""
+    for line in (text or "").splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        match = _STATEMENT_RE.match(line)
+        if match:
+            code = re.sub(r"\s+", "", match.group(1)).upper()
+            yield code, line
+        else:
+            yield "", line
+
+
+def pictogram_code(label):
+    """The GHS code a pictogram label names ("GHS5" or "Flame" → "GHS02"…), or ""."""
+    label = label.strip()
+    match = _PICTOGRAM_RE.match(label)
+    return f"GHS0{match.group(1)}" if match else _PICTOGRAM_NAMES.get(label.lower(), "")
+
+
+def parse_pictograms(text):
+    """GHS pictogram codes in ``text`` ("GHS5, Flame" → ["GHS05", "GHS02"]); unknown tokens are skipped."""
+    codes = []
+    for token in (text or "").split(","):
+        code = pictogram_code(token)
+        if code and code not in codes:
+            codes.append(code)
+    return codes
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Syncing
+# ─────────────────────────────────────────────────────────────────────
+
+def _hazard_codes(parsed, HazardCode):
+    """``HazardCode`` rows for every code in ``parsed``, created as needed."""
+    statements = {}
+    for code, line in parsed:
+        if code:
+            statements.setdefault(code, _STATEMENT_RE.match(line).group(2).strip())
+    existing = {row.code: row for row in HazardCode.objects.filter(code__in=statements)}
+    missing = []
+    for code, statement in statements.items():
+        if code not in existing:
+            group, hazard_class = classify(code)
+            missing.append(HazardCode(code=code, group=group, hazard_class=hazard_class, statement=statement))
+    if missing:
+        HazardCode.objects.bulk_create(missing, ignore_conflicts=True)
+        existing.update((row.code, row) for row in HazardCode.objects.filter(code__in=[r.code for r in missing]))
+    return existing
+
+
+def sync_product(product, apps=None):
+    """Mirror the product's statement and pictogram text into the code tables.
+
+    ``apps`` is a migration's app registry, for syncing historical models.
+    """
+    from django.apps import apps as global_apps
+
+    apps = apps or global_apps
+    HazardCode = apps.get_model("app", "HazardCode")
+    GHSPictogram = apps.get_model("app", "GHSPictogram")
+    ProductHazardStatement = apps.get_model("app", "ProductHazardStatement")
+    ProductPictogram = apps.get_model("app", "ProductPictogram")
+    HAZARD, PRECAUTIONARY = "H", "P"  # ProductHazardStatement.KIND_CHOICES
+    lines = [
+        (HAZARD, code, line)
+        for code, line in parse_statements(product.hazard_statements)
+    ] + [
+        (PRECAUTIONARY, code, line)
+        for code, line in parse_statements(product.precautionary_statements)
+    ]
+    with transaction.atomic():
+        codes = _hazard_codes(((code, line) for _, code, line in lines), HazardCode)
+        product.hazard_statement_rows.all().delete()
+        ProductHazardStatement.objects.bulk_create([
+            ProductHazardStatement(
+                product=product, kind=kind, code=codes.get(code), text=line, position=position,
+            )
+            for position, (kind, code, line) in enumerate(lines)
+        ])
+        labels = [s.strip() for s in (product.hazard_pictograms or "").split(",") if s.strip()]
+        pictograms = {p.code: p for p in GHSPictogram.objects.filter(code__in=parse_pictograms(product.hazard_pictograms))}
+        product.pictogram_rows.all().delete()
+        # A repeated pictogram is linked once, so joins on it match the product once.
+        ProductPictogram.objects.bulk_create([
+            ProductPictogram(
+                product=product, pictogram=pictograms.pop(pictogram_code(label), None), label=label, position=position,
+            )
+            for position, label in enumerate(labels)
+        ])
+
+
+def resync_all(batch_size=500, apps=None):
+    """Re-sync every product; yields the running total."""
+    from django.apps import apps as global_apps
+
+    Product = (apps or global_apps).get_model("app", "Product")
+    fields = ("pk", "hazard_statements", "precautionary_statements", "hazard_pictograms")
+    products = Product.objects.order_by("pk").only(*fields)
+    done, last_pk = 0, 0
+    while True:
+        batch = list(products.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return
+        for product in batch:
+            sync_product(product, apps)
+        done += len(batch)
+        last_pk = batch[-1].pk
+        yield done
+
+
+def safety_lookups():
+    """Prefetch lookups for statement rows (with their codes) and pictogram rows."""
+    from .models import ProductHazardStatement, ProductPictogram
+
+    rows = ProductHazardStatement.objects.select_related("code").order_by("position")
+    return [
+        Prefetch("hazard_statement_rows", queryset=rows),
+        Prefetch("pictogram_rows", queryset=ProductPictogram.objects.order_by("position")),
+    ]
+
+
+def prefetch_safety(queryset):
+    """Prefetch statement rows (with their codes) and pictogram rows for ``queryset``."""
+    return queryset.prefetch_related(*safety_lookups())
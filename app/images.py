@@ -0,0 +1,378 @@
+"""
+Responsive image derivatives – resized AVIF / WebP / JPEG copies of uploads.
+
+Every configured image field (see ``IMAGE_FIELDS``) gets one copy per format
+at each width in ``WIDTHS`` that is not larger than the original.  Files are
+content-addressed (``derivatives/<sha256>/<width>.<ext>``) and the
+``ImageDerivative`` rows record which copies belong to which upload, so
+re-running the build skips anything whose bytes have not changed.
+
+Encoding is pure Pillow work on bytes and runs in a process pool; reading
+sources, writing files and updating rows stay in the calling process.
+Intrinsic dimensions, byte size, dominant colour and a tiny blurred
+placeholder are recorded in ``ImageMetadata`` when the upload is saved, so
+templates can emit ``width``/``height`` and a placeholder background without
+opening the file.  Templates render all of it with ``{% picture %}`` from
+``templatetags/responsive_images.py``.
+"""
+
+import base64
+import hashlib
+import io
+import posixpath
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.apps import apps
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+
+from .cache import bump_generation, get_generation
+
+# (model label, field name) pairs that get derivatives.
+IMAGE_FIELDS = (
+    ("app.ProductImage", "image"),
+    ("app.ProductArticle", "cover_image"),
+    ("app.Product", "structure_image"),
+    ("app.CompanyDetails", "company_logo"),
+)
+
+WIDTHS = (72, 144, 320, 640, 960, 1280)
+DERIVATIVE_ROOT = "derivatives"
+
+# Preferred first; the last one is the <img> fallback.
+FORMATS = ("avif", "webp", "fallback")
+MIME_TYPES = {"avif": "image/avif", "webp": "image/webp", "jpeg": "image/jpeg", "png": "image/png"}
+EXTENSIONS = {"avif": "avif", "webp": "webp", "jpeg": "jpg", "png": "png"}
+SAVE_OPTIONS = {
+    "avif": {"quality": 55, "speed": 6},
+    "webp": {"quality": 78, "method": 5},
+    "jpeg": {"quality": 80, "optimize": True, "progressive": True},
+    "png": {"optimize": True},
+}
+
+PLACEHOLDER_WIDTH = 16
+
+IMAGE_INFO_KEY = "vcp:img:{}:{}"
+IMAGE_INFO_TIMEOUT = 60 * 60 * 24
+
+Encoded = namedtuple("Encoded", "format width height data")
+Variant = namedtuple("Variant", "width height url")
+Metadata = namedtuple("Metadata", "width height bytes has_alpha dominant_color placeholder")
+# ``variants`` maps format → [Variant, …] (narrowest first); ``metadata`` may be None.
+ImageInfo = namedtuple("ImageInfo", "metadata variants")
+BuildResult = namedtuple("BuildResult", "source created skipped error")
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def target_widths(source_width):
+    """Widths to produce for an original ``source_width`` pixels wide."""
+    widths = [w for w in WIDTHS if w < source_width]
+    widths.append(min(source_width, WIDTHS[-1]))
+    return sorted(set(widths))
+
+
+def derivative_name(digest, width, fmt):
+    return posixpath.join(DERIVATIVE_ROOT, digest[:2], digest, f"{width}.{EXTENSIONS[fmt]}")
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Encoding (runs in worker processes – no Django access)
+# ─────────────────────────────────────────────────────────────────────
+
+def _has_alpha(image):
+    return image.mode in ("RGBA", "LA", "PA") or (
+        image.mode == "P" and "transparency" in image.info
+    )
+
+
+def extract_metadata(data):
+    """Return a ``Metadata`` tuple for the image ``data``."""
+    from PIL import Image, ImageFilter, ImageOps
+
+    with Image.open(io.BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original)
+        has_alpha = _has_alpha(image)
+        width, height = image.size
+        small = image.convert("RGBA" if has_alpha else "RGB")
+        small.thumbnail((64, 64))
+
+    # Most frequent colour of a 4-colour quantisation of the thumbnail.
+    quantised = small.convert("RGB").quantize(colors=4)
+    palette = quantised.getpalette()
+    _, index = max(quantised.getcolors())
+    dominant = "#{:02x}{:02x}{:02x}".format(*palette[index * 3:index * 3 + 3])
+
+    placeholder = ""
+    if not has_alpha:
+        # Transparent images would show the placeholder through them.
+        tiny = small.resize(
+            (PLACEHOLDER_WIDTH, max(1, round(PLACEHOLDER_WIDTH * height / width))), Image.BILINEAR,
+        ).filter(ImageFilter.GaussianBlur(1))
+        buffer = io.BytesIO()
+        tiny.save(buffer, format="WEBP", quality=30)
+        placeholder = "data:image/webp;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+    return Metadata(width, height, len(data), has_alpha, dominant, placeholder)
+
+
+def encode_variants(data):
+    """Return an ``Encoded`` tuple per (width, format) for the image ``data``."""
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original)
+        has_alpha = _has_alpha(image)
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+    fallback = "png" if has_alpha else "jpeg"
+    results = []
+    for width in target_widths(image.width):
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+        for fmt in FORMATS:
+            fmt = fallback if fmt == "fallback" else fmt
+            buffer = io.BytesIO()
+            resized.save(buffer, format=fmt.upper(), **SAVE_OPTIONS[fmt])
+            results.append(Encoded(fmt, width, height, buffer.getvalue()))
+    return results
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Building
+# ─────────────────────────────────────────────────────────────────────
+
+def iter_sources():
+    """Yield the storage name of every configured image field that is set."""
+    seen = set()
+    for label, field_name in IMAGE_FIELDS:
+        model = apps.get_model(label)
+        names = (
+            model.objects.exclude(**{field_name: ""}).exclude(**{f"{field_name}__isnull": True})
+            .values_list(field_name, flat=True)
+        )
+        for name in names.iterator():
+            if name not in seen:
+                seen.add(name)
+                yield name
+
+
+def source_names(instance):
+    """Storage names of the configured image fields set on ``instance``."""
+    label = instance._meta.label
+    names = []
+    for model_label, field_name in IMAGE_FIELDS:
+        if model_label == label:
+            value = getattr(instance, field_name)
+            if value and value.name:
+                names.append(value.name)
+    return names
+
+
+def _read(name):
+    with default_storage.open(name, "rb") as handle:
+        return handle.read()
+
+
+def record_metadata(name, data=None, digest=None):
+    """Extract and save ``ImageMetadata`` for upload ``name``; return the row."""
+    from .models import ImageMetadata
+
+    if data is None:
+        data = _read(name)
+    digest = digest or content_hash(data)
+    meta = extract_metadata(data)
+    row, _ = ImageMetadata.objects.update_or_create(
+        source=name, defaults={"content_hash": digest, **meta._asdict()},
+    )
+    invalidate_image_info()
+    return row
+
+
+def record_missing_metadata(names):
+    """Record metadata for those of ``names`` that have none yet."""
+    from .models import ImageMetadata
+
+    known = set(ImageMetadata.objects.filter(source__in=names).values_list("source", flat=True))
+    for name in names:
+        if name not in known:
+            try:
+                record_metadata(name)
+            except Exception:
+                # Missing or unreadable upload – templates fall back to the bare URL.
+                pass
+
+
+def _store(source, digest, encoded):
+    """Write ``encoded`` variants and replace ``source``'s rows."""
+    from .models import ImageDerivative
+
+    rows = []
+    for item in encoded:
+        name = derivative_name(digest, item.width, item.format)
+        # Content-addressed: an existing file already holds these bytes.
+        if not default_storage.exists(name):
+            name = default_storage.save(name, ContentFile(item.data))
+        rows.append(ImageDerivative(
+            source=source, content_hash=digest, format=item.format,
+            width=item.width, height=item.height, file=name, bytes=len(item.data),
+        ))
+    with transaction.atomic():
+        ImageDerivative.objects.filter(source=source).delete()
+        ImageDerivative.objects.bulk_create(rows)
+    return len(rows)
+
+
+def build_derivatives(names=None, jobs=None, force=False):
+    """Build derivatives for ``names`` (default: every configured upload).
+
+    Uploads whose content hash already has rows are skipped unless ``force``.
+    ``jobs=0`` encodes in the calling process.  Returns ``BuildResult`` tuples.
+    """
+    from .models import ImageDerivative, ImageMetadata
+
+    names = list(iter_sources() if names is None else names)
+    pending, results = [], []
+    for name in names:
+        try:
+            data = _read(name)
+            digest = content_hash(data)
+            if force or not ImageMetadata.objects.filter(source=name, content_hash=digest).exists():
+                record_metadata(name, data, digest)
+        except Exception as exc:
+            results.append(BuildResult(name, 0, False, f"{type(exc).__name__}: {exc}"))
+            continue
+        if not force and ImageDerivative.objects.filter(source=name, content_hash=digest).exists():
+            results.append(BuildResult(name, 0, True, None))
+            continue
+        pending.append((name, digest, data))
+
+    if pending:
+        if jobs == 0:
+            encoded = map(_safe_encode, (data for _, _, data in pending))
+            results.extend(_collect(pending, encoded))
+        else:
+            # Forked workers must not share the parent's database sockets.
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                encoded = pool.map(_safe_encode, (data for _, _, data in pending))
+                results.extend(_collect(pending, encoded))
+        invalidate_image_info()
+    return results
+
+
+def _safe_encode(data):
+    try:
+        return encode_variants(data)
+    except Exception as exc:
+        return f"{type(exc).__name__}: {exc}"
+
+
+def _collect(pending, encoded):
+    for (name, digest, _), variants in zip(pending, encoded):
+        if isinstance(variants, str):
+            yield BuildResult(name, 0, False, variants)
+        else:
+            yield BuildResult(name, _store(name, digest, variants), False, None)
+
+
+def remove_derivatives(names):
+    """Forget the metadata and derivatives of deleted uploads; shared files are kept."""
+    from .models import ImageDerivative, ImageMetadata
+
+    ImageMetadata.objects.filter(source__in=names).delete()
+    rows = ImageDerivative.objects.filter(source__in=names)
+    hashes = set(rows.values_list("content_hash", flat=True))
+    files = set(rows.values_list("file", flat=True))
+    rows.delete()
+    still_used = set(ImageDerivative.objects.filter(content_hash__in=hashes).values_list("file", flat=True))
+    for name in files - still_used:
+        default_storage.delete(name)
+    invalidate_image_info()
+
+
+# Single uploads saved in the admin are encoded off the request thread.
+_build_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="image-derivatives")
+_build_lock = threading.Lock()
+
+
+def _build_job(names):
+    with _build_lock:
+        try:
+            build_derivatives(names, jobs=0)
+            from .page_cache import invalidate_pages
+            invalidate_pages()
+        finally:
+            connections.close_all()
+
+
+def schedule_derivatives(names):
+    """Build derivatives for ``names`` once the current transaction commits."""
+    names = list(names)
+    if names:
+        transaction.on_commit(lambda: _build_executor.submit(_build_job, names))
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Lookup
+# ─────────────────────────────────────────────────────────────────────
+
+def invalidate_image_info():
+    bump_generation("images")
+
+
+def image_info(name):
+    """Return the ``ImageInfo`` for upload ``name`` (cached; no file access)."""
+    if not name:
+        return ImageInfo(None, {})
+    key = IMAGE_INFO_KEY.format(get_generation("images"), hashlib.md5(name.encode()).hexdigest())
+    info = cache.get(key)
+    if info is None:
+        from .models import ImageDerivative, ImageMetadata
+
+        row = ImageMetadata.objects.filter(source=name).values(*Metadata._fields).first()
+        variants = {}
+        rows = ImageDerivative.objects.filter(source=name).order_by("width")
+        for fmt, width, height, file in rows.values_list("format", "width", "height", "file"):
+            variants.setdefault(fmt, []).append(Variant(width, height, default_storage.url(file)))
+        info = ImageInfo(Metadata(**row) if row else None, variants)
+        cache.set(key, info, IMAGE_INFO_TIMEOUT)
+    return info
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Prefetching
+# ─────────────────────────────────────────────────────────────────────
+
+PRIMARY_IMAGES_ATTR = "primary_images"  # read by Product.primary_image
+
+
+def primary_image_prefetch():
+    """A ``Prefetch`` of each product's primary image – the one flagged
+    ``is_primary``, else the first by ``order`` – into ``primary_images``.
+
+    A correlated subquery picks one row per product, so N products cost one
+    query and no gallery rows are loaded.
+    """
+    from django.db.models import OuterRef, Prefetch, Subquery
+
+    from .models import ProductImage
+
+    first = (
+        ProductImage.objects.filter(product_id=OuterRef("product_id"))
+        .order_by("-is_primary", "order", "pk").values("pk")[:1]
+    )
+    return Prefetch(
+        "images", queryset=ProductImage.objects.filter(pk=Subquery(first)), to_attr=PRIMARY_IMAGES_ATTR,
+    )
+
+
+def with_primary_image(queryset):
+    """``queryset`` with ``Product.primary_image`` answered from one prefetch query."""
+    return queryset.prefetch_related(primary_image_prefetch())
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.models import ProductProperty
+from app.properties import backfill
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-parse every product's flash point, melting / boiling point, density, "
+        "viscosity, vapour pressure and pH into SI-normalised ProductProperty rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Products per transaction (default: 1000).")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        done = 0
+        for done in backfill(batch_size=options["batch_size"]):
+            self.stdout.write(f"{done:>8,} products parsed")
+
+        rows = ProductProperty.objects.all()
+        self.stdout.write(self.style.SUCCESS(
+            f"Parsed {done:,} products in {time.perf_counter() - started:.2f} s "
+            f"({rows.count():,} values, {rows.filter(confidence__lt=1).count():,} below full confidence)"
+        ))
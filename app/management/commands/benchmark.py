@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app.benchmarks import BENCHMARKS, format_seconds, isolated
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a micro-benchmark against synthetic data. All writes are rolled "
+        "back and a private in-memory cache is used."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("name", nargs="?", help=f"One of: {', '.join(sorted(BENCHMARKS))}")
+        parser.add_argument("--size", type=int, default=None, help="Number of synthetic rows.")
+
+    def handle(self, *args, **options):
+        name = options["name"]
+        if name not in BENCHMARKS:
+            raise CommandError(f"Choose a benchmark: {', '.join(sorted(BENCHMARKS))}")
+        func, default_size = BENCHMARKS[name]
+        size = options["size"] or default_size
+
+        def report(label, seconds, extra=""):
+            timing = format_seconds(seconds) if seconds is not None else " " * 12
+            self.stdout.write(f"{timing}  {label}" + (f"  ({extra})" if extra else ""))
+
+        self.stdout.write(f"Benchmark {name!r} with {size:,} rows")
+        with isolated():
+            func(size, report)
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app.images import build_derivatives, iter_sources, remove_derivatives
+from app.models import ImageDerivative, ImageMetadata
+from app.page_cache import invalidate_pages
+
+
+class Command(BaseCommand):
+    help = (
+        "Record metadata and build resized AVIF/WebP/JPEG derivatives for every "
+        "uploaded image. Uploads whose content hash is unchanged are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--jobs", type=int, default=None,
+            help="Worker processes (default: number of CPUs; 0 encodes in-process).",
+        )
+        parser.add_argument("--force", action="store_true", help="Rebuild even unchanged uploads.")
+        parser.add_argument(
+            "--prune", action="store_true",
+            help="Also drop derivatives of uploads that are no longer referenced.",
+        )
+
+    def handle(self, *args, **options):
+        sources = list(iter_sources())
+        results = build_derivatives(sources, jobs=options["jobs"], force=options["force"])
+
+        failures = []
+        for result in results:
+            if result.error:
+                failures.append(result)
+                self.stdout.write(self.style.ERROR(f"FAILED   {result.source}  ({result.error})"))
+            elif result.skipped:
+                self.stdout.write(f"skipped  {result.source}")
+            else:
+                self.stdout.write(f"{result.created:>3} new  {result.source}")
+
+        if options["prune"]:
+            known = set(ImageDerivative.objects.values_list("source", flat=True))
+            known |= set(ImageMetadata.objects.values_list("source", flat=True))
+            stale = known - set(sources)
+            if stale:
+                remove_derivatives(stale)
+            self.stdout.write(f"Pruned derivatives of {len(stale)} removed upload(s)")
+
+        invalidate_pages()
+        built = sum(1 for r in results if r.created)
+        self.stdout.write(f"\n{built} built, {len(results) - built - len(failures)} unchanged, {len(failures)} failed")
+        if failures:
+            raise CommandError(f"{len(failures)} image(s) failed")
@@ -0,0 +1,66 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app.static_export import activate_release, export_site, prune_releases
+
+
+class Command(BaseCommand):
+    help = (
+        "Prerender every public URL (as listed in the sitemap) into a static "
+        "HTML tree with precompressed siblings, then atomically switch the "
+        "'current' symlink to the new release."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output", default=getattr(settings, "STATIC_EXPORT_ROOT", None),
+            help="Export root (default: settings.STATIC_EXPORT_ROOT).",
+        )
+        parser.add_argument(
+            "--jobs", type=int, default=None,
+            help="Worker processes (default: number of CPUs).",
+        )
+        parser.add_argument(
+            "--keep", type=int, default=3,
+            help="Number of releases to keep on disk.",
+        )
+
+    def handle(self, *args, **options):
+        output = options["output"]
+        if not output:
+            raise CommandError("No output directory: pass --output or set STATIC_EXPORT_ROOT.")
+        Path(output).mkdir(parents=True, exist_ok=True)
+
+        release, results = export_site(output, jobs=options["jobs"])
+
+        total_seconds = total_bytes = total_gzip = 0
+        failures = []
+        for result in sorted(results, key=lambda r: r.path):
+            total_seconds += result.seconds
+            if result.error:
+                failures.append(result)
+                self.stdout.write(self.style.ERROR(
+                    f"{result.seconds * 1000:8.1f} ms  {'FAILED':>10}  {result.path}  ({result.error})"
+                ))
+                continue
+            total_bytes += result.bytes
+            total_gzip += result.gzip_bytes
+            self.stdout.write(
+                f"{result.seconds * 1000:8.1f} ms  {result.bytes:>10,} B  "
+                f"gz {result.gzip_bytes:>9,} B  {result.path}"
+            )
+
+        self.stdout.write(
+            f"\n{len(results) - len(failures)} pages, {total_bytes:,} B "
+            f"({total_gzip:,} B gzipped), {total_seconds:.2f} s render time"
+        )
+        if failures:
+            raise CommandError(
+                f"{len(failures)} page(s) failed; release left inactive at {release}"
+            )
+
+        activate_release(output, release)
+        prune_releases(output, options["keep"])
+        self.stdout.write(self.style.SUCCESS(f"Activated {release}"))
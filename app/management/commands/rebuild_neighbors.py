@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app import recommend
+from app.models import ProductNeighbor
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-fit the vocabulary and IDF weights, then recompute every product's nearest "
+        "neighbours (the related-products block) from its text, specs, category and grades, "
+        "in batches.  Saves only re-vectorise the edited products against the last fit."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=recommend.BATCH_SIZE,
+            help=f"Products per similarity batch and transaction (default: {recommend.BATCH_SIZE}).",
+        )
+
+    def handle(self, *args, **options):
+        if recommend.np is None:
+            raise CommandError("NumPy is required to compute product neighbours.")
+        started = time.perf_counter()
+        done = 0
+        for done in recommend.rebuild_all(batch_size=options["batch_size"]):
+            self.stdout.write(f"{done:>8,} products")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {ProductNeighbor.objects.count():,} neighbours for {done:,} products "
+            f"in {time.perf_counter() - started:.2f} s"
+        ))
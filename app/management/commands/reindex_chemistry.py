@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.chemistry import reindex_all
+from app.models import ProductChemistry
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-parse every product's molecular formula, molecular weight and CAS number "
+        "into the chemistry index tables, in primary-key batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Products per transaction (default: 1000).")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        done = 0
+        for done in reindex_all(batch_size=options["batch_size"]):
+            self.stdout.write(f"{done:>8,} products indexed")
+
+        rows = ProductChemistry.objects.all()
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {done:,} products in {time.perf_counter() - started:.2f} s "
+            f"({rows.exclude(formula_error='').count()} unparsable formulas, "
+            f"{rows.filter(weight_matches=False).count()} weight mismatches, "
+            f"{rows.filter(cas_valid=False).count()} invalid CAS numbers)"
+        ))
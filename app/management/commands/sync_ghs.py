@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.ghs import resync_all
+from app.models import HazardCode, ProductHazardStatement
+
+
+class Command(BaseCommand):
+    help = "Re-sync every product's hazard / precautionary statements and pictograms into the GHS code tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Products loaded per query (default: 500).")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        done = 0
+        for done in resync_all(batch_size=options["batch_size"]):
+            self.stdout.write(f"{done:>8,} products synced")
+
+        uncoded = ProductHazardStatement.objects.filter(code__isnull=True).count()
+        self.stdout.write(self.style.SUCCESS(
+            f"Synced {done:,} products in {time.perf_counter() - started:.2f} s "
+            f"({HazardCode.objects.count():,} distinct codes, {uncoded:,} lines without a code)"
+        ))
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_image_derivative'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageMetadata',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(help_text='Storage name of the upload.', max_length=255, unique=True)),
+                ('content_hash', models.CharField(max_length=64)),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('bytes', models.PositiveIntegerField()),
+                ('has_alpha', models.BooleanField(default=False)),
+                ('dominant_color', models.CharField(help_text='CSS hex colour, e.g. #1a365d.', max_length=7)),
+                ('placeholder', models.TextField(blank=True, default='', help_text='Tiny blurred WebP as a data: URI.')),
+            ],
+            options={
+                'verbose_name_plural': 'Image metadata',
+            },
+        ),
+    ]
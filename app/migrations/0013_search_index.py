@@ -0,0 +1,45 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:40
+
+from django.db import migrations, utils
+
+SEARCH_TABLE = "app_search_fts"
+SEARCH_STATE_TABLE = "app_search_state"
+
+
+def create_search_tables(apps, schema_editor):
+    """FTS5 index on SQLite; other databases use the in-memory backend."""
+    connection = schema_editor.connection
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+                "title, keywords, body, "
+                "kind UNINDEXED, display_title UNINDEXED, url UNINDEXED, summary UNINDEXED, "
+                "tokenize = 'unicode61 remove_diacritics 2')"
+            )
+        except utils.OperationalError:
+            return  # SQLite built without FTS5
+        cursor.execute(
+            f"CREATE TABLE {SEARCH_STATE_TABLE} (name varchar(50) PRIMARY KEY, value text NOT NULL)"
+        )
+
+
+def drop_search_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {SEARCH_STATE_TABLE}")
+        cursor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0012_image_metadata'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_tables, drop_search_tables),
+    ]
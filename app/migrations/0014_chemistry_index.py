@@ -0,0 +1,44 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0013_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductChemistry',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='chemistry', serialize=False, to='app.product')),
+                ('formula', models.CharField(blank=True, default='', help_text='Hill notation.', max_length=200)),
+                ('formula_error', models.CharField(blank=True, default='', max_length=200)),
+                ('computed_weight', models.FloatField(blank=True, null=True)),
+                ('stated_weight', models.FloatField(blank=True, null=True)),
+                ('weight_matches', models.BooleanField(help_text='Stated weight agrees with the formula; empty when either is missing.', null=True)),
+                ('molecular_weight', models.FloatField(blank=True, db_index=True, help_text='Computed from the formula, else the stated value (g/mol).', null=True)),
+                ('cas_number', models.CharField(blank=True, db_index=True, default='', max_length=20)),
+                ('cas_valid', models.BooleanField(null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Product chemistry',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductElement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('symbol', models.CharField(max_length=3)),
+                ('count', models.PositiveIntegerField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='elements', to='app.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['symbol', 'count'], name='app_product_symbol_1710b8_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'symbol'), name='unique_product_element')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0014_chemistry_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductProperty',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(choices=[('flash_point', 'Flash point'), ('melting_point', 'Melting point'), ('boiling_point', 'Boiling point'), ('density', 'Density'), ('viscosity', 'Viscosity'), ('vapor_pressure', 'Vapor pressure'), ('ph_value', 'Ph value')], max_length=32)),
+                ('raw', models.CharField(help_text='The text it was parsed from.', max_length=100)),
+                ('value', models.FloatField()),
+                ('minimum', models.FloatField(blank=True, null=True)),
+                ('maximum', models.FloatField(blank=True, null=True)),
+                ('unit', models.CharField(blank=True, default='', help_text='SI unit; empty for pH.', max_length=8)),
+                ('confidence', models.FloatField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='properties', to='app.product')),
+            ],
+            options={
+                'verbose_name_plural': 'Product properties',
+                'indexes': [models.Index(fields=['name', 'minimum'], name='app_product_name_5e9b17_idx'), models.Index(fields=['name', 'maximum'], name='app_product_name_335466_idx'), models.Index(fields=['name', 'value'], name='app_product_name_240ba4_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'name'), name='unique_product_property')],
+            },
+        ),
+    ]
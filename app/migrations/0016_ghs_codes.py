@@ -0,0 +1,84 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+PICTOGRAMS = {
+    "GHS01": "Exploding bomb",
+    "GHS02": "Flame",
+    "GHS03": "Flame over circle",
+    "GHS04": "Gas cylinder",
+    "GHS05": "Corrosion",
+    "GHS06": "Skull and crossbones",
+    "GHS07": "Exclamation mark",
+    "GHS08": "Health hazard",
+    "GHS09": "Environment",
+}
+
+
+def create_pictograms(apps, schema_editor):
+    GHSPictogram = apps.get_model("app", "GHSPictogram")
+    GHSPictogram.objects.bulk_create(
+        [GHSPictogram(code=code, name=name) for code, name in PICTOGRAMS.items()],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0015_product_property'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GHSPictogram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=5, unique=True)),
+                ('name', models.CharField(max_length=50)),
+            ],
+            options={
+                'verbose_name': 'GHS pictogram',
+                'ordering': ['code'],
+            },
+        ),
+        migrations.CreateModel(
+            name='HazardCode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=60, unique=True)),
+                ('group', models.CharField(db_index=True, help_text='Physical / Health / Environmental for H-codes, Prevention, Response … for P-codes.', max_length=20)),
+                ('hazard_class', models.CharField(blank=True, db_index=True, default='', max_length=80)),
+                ('statement', models.TextField(blank=True, default='')),
+            ],
+            options={
+                'ordering': ['code'],
+            },
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='pictograms',
+            field=models.ManyToManyField(blank=True, related_name='products', to='app.ghspictogram'),
+        ),
+        migrations.CreateModel(
+            name='ProductHazardStatement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('H', 'Hazard statement'), ('P', 'Precautionary statement')], max_length=1)),
+                ('text', models.CharField(max_length=500)),
+                ('position', models.PositiveIntegerField(default=0)),
+                ('code', models.ForeignKey(blank=True, help_text='Empty for lines without a recognisable code.', null=True, on_delete=django.db.models.deletion.PROTECT, to='app.hazardcode')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hazard_statement_rows', to='app.product')),
+            ],
+            options={
+                'ordering': ['position'],
+            },
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='hazard_codes',
+            field=models.ManyToManyField(blank=True, related_name='products', through='app.ProductHazardStatement', to='app.hazardcode'),
+        ),
+        migrations.RunPython(create_pictograms, migrations.RunPython.noop),
+    ]
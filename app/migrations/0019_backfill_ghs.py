@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:10
+
+from django.db import migrations
+
+
+def backfill_ghs(apps, schema_editor):
+    """Statement rows and pictogram links for products saved before 0016.
+
+    Now done by 0022, whose re-sync also writes the pictogram rows that
+    ``app.ghs.sync_product`` expects and these historical models lack.
+    """
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0018_product_neighbor'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_ghs, migrations.RunPython.noop),
+    ]
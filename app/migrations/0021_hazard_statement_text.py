@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0020_search_change_log'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='producthazardstatement',
+            name='text',
+            field=models.TextField(),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from app.ghs import resync_all
+
+
+def backfill_pictograms(apps, schema_editor):
+    """Pictogram rows, labels as typed, for every product."""
+    for _ in resync_all(apps=apps):
+        pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0021_hazard_statement_text'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductPictogram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('label', models.TextField()),
+                ('position', models.PositiveIntegerField(default=0)),
+                ('pictogram', models.ForeignKey(blank=True, help_text='Empty for entries naming no GHS pictogram, and for repeats.', null=True, on_delete=django.db.models.deletion.PROTECT, to='app.ghspictogram')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pictogram_rows', to='app.product')),
+            ],
+            options={
+                'ordering': ['position'],
+            },
+        ),
+        # A many-to-many cannot be altered to a custom through table; the
+        # links are rebuilt from ``hazard_pictograms`` below.
+        migrations.RemoveField(
+            model_name='product',
+            name='pictograms',
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='pictograms',
+            field=models.ManyToManyField(blank=True, related_name='products', through='app.ProductPictogram', to='app.ghspictogram'),
+        ),
+        migrations.RunPython(backfill_pictograms, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,7 @@
 from django.db import models
 
+from .properties import PROPERTIES
+
 
 class ProductCategory(models.Model):
     """Filter-nav categories (Industrial Chemicals, APIs, Specialty, etc.)."""
@@ -16,6 +18,7 @@ class ProductCategory(models.Model):
         help_text="Display this category in the overview grid on the products page",
     )
     order = models.PositiveIntegerField(default=0, help_text="Display order")
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["order"]
@@ -29,6 +32,21 @@ class ProductCategory(models.Model):
 # Product
 # ─────────────────────────────────────────────────────────────────────
 
+# Columns a product card (grid, related and promoted products) shows; the
+# sort key is included so the grid can page on it.
+CARD_FIELDS = ("slug", "name", "icon", "description", "order", "category_id")
+
+
+class ProductQuerySet(models.QuerySet):
+    def card_rows(self):
+        """``(pk, *CARD_FIELDS)`` tuples, without instantiating models.
+
+        The wide text columns – descriptions, safety and SEO copy – stay in
+        the database.
+        """
+        return self.values_list("pk", *CARD_FIELDS)
+
+
 class Product(models.Model):
     """Comprehensive product model – all optional fields are blank/null-safe."""
 
@@ -37,6 +55,8 @@ class Product(models.Model):
         ("Danger", "Danger"),
         ("Warning", "Warning"),
     ]
+    # /products/<segment>/ addresses taken by other views (see app.urls).
+    RESERVED_SLUGS = {"facets", "cards"}
 
     # ── 1. Basic Information ──────────────────────────────────────────
     category = models.ForeignKey(
@@ -117,6 +137,14 @@ class Product(models.Model):
         max_length=500, blank=True, default="",
         help_text='GHS pictogram codes separated by commas, e.g. "GHS02, GHS07"',
     )
+    # Normalised copies of the three fields above, kept in sync on save
+    # (see app.ghs) – filter and prefetch these instead of splitting text.
+    hazard_codes = models.ManyToManyField(
+        "HazardCode", through="ProductHazardStatement", blank=True, related_name="products",
+    )
+    pictograms = models.ManyToManyField(
+        "GHSPictogram", through="ProductPictogram", blank=True, related_name="products",
+    )
     signal_word = models.CharField(
         max_length=20, blank=True, default="",
         choices=SIGNAL_WORD_CHOICES,
@@ -227,36 +255,58 @@ class Product(models.Model):
     # ── Ordering ──────────────────────────────────────────────────────
     order = models.PositiveIntegerField(default=0, help_text="Display order")
 
+    # Bumped on every save and whenever an inline row (spec, image, …)
+    # changes – see app.signals.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         ordering = ["order", "name"]
+        # Keyset pagination of the product grid (see app.pagination).
+        indexes = [models.Index(fields=["order", "name", "id"])]
 
     def __str__(self):
         return self.name
 
     # ── slug auto-generation ──────────────────────────────────────────
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        if self.slug in self.RESERVED_SLUGS:
+            raise ValidationError({'slug': f'"{self.slug}" is the address of another page – choose a different slug.'})
+
     def save(self, *args, **kwargs):
-        if not self.slug:
+        if not self.slug or self.slug in self.RESERVED_SLUGS:
             from django.utils.text import slugify
             import uuid
-            base = slugify(self.name)
+            base = self.slug or slugify(self.name)
             if not base:
                 base = uuid.uuid4().hex[:8]
             candidate = base
             suffix = 1
             qs = self.__class__.objects.filter(slug=candidate).exclude(pk=self.pk)
-            while qs.exists():
+            while candidate in self.RESERVED_SLUGS or qs.exists():
                 candidate = f"{base}-{suffix}"
                 qs = self.__class__.objects.filter(slug=candidate).exclude(pk=self.pk)
                 suffix += 1
             self.slug = candidate
 
-        from django.db import IntegrityError
-        try:
-            super().save(*args, **kwargs)
-        except IntegrityError:
-            import uuid
-            self.slug = f"{self.slug}-{uuid.uuid4().hex[:6]}"
-            super().save(*args, **kwargs)
+        from django.db import IntegrityError, transaction
+        from . import chemistry, ghs, properties
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    super().save(*args, **kwargs)
+            except IntegrityError:
+                import uuid
+                self.slug = f"{self.slug}-{uuid.uuid4().hex[:6]}"
+                super().save(*args, **kwargs)
+            # Structured side tables, re-derived from the text fields once the
+            # row itself is saved: a failure here is not a slug collision, and
+            # the caches invalidated on commit never see half-written rows.
+            chemistry.index_product(self)
+            properties.index_product(self)
+            ghs.sync_product(self)
 
     def get_absolute_url(self):
         from django.urls import reverse
@@ -265,6 +315,14 @@ class Product(models.Model):
     # ── Section-availability helpers (used in templates) ──────────────
     @property
     def primary_image(self):
+        """The image flagged primary, else the first; no query when images
+        were prefetched (``prefetch_related("images")`` or
+        ``app.images.with_primary_image``)."""
+        images = getattr(self, "primary_images", None)
+        if images is None:
+            images = self._prefetched("images")
+        if images is not None:
+            return next((img for img in images if img.is_primary), images[0] if images else None)
         img = self.images.filter(is_primary=True).first()
         return img or self.images.first()
 
@@ -289,16 +347,28 @@ class Product(models.Model):
     def common_names_list(self):
         return [s.strip() for s in self.common_names.splitlines() if s.strip()] if self.common_names else []
 
+    def _prefetched(self, name):
+        return getattr(self, "_prefetched_objects_cache", {}).get(name)
+
     @property
     def hazard_statements_list(self):
+        rows = self._prefetched("hazard_statement_rows")
+        if rows is not None:
+            return [r.text for r in rows if r.kind == ProductHazardStatement.HAZARD]
         return [s.strip() for s in self.hazard_statements.splitlines() if s.strip()] if self.hazard_statements else []
 
     @property
     def precautionary_statements_list(self):
+        rows = self._prefetched("hazard_statement_rows")
+        if rows is not None:
+            return [r.text for r in rows if r.kind == ProductHazardStatement.PRECAUTIONARY]
         return [s.strip() for s in self.precautionary_statements.splitlines() if s.strip()] if self.precautionary_statements else []
 
     @property
     def hazard_pictograms_list(self):
+        rows = self._prefetched("pictogram_rows")
+        if rows is not None:
+            return [r.label for r in rows]
         return [s.strip() for s in self.hazard_pictograms.split(',') if s.strip()] if self.hazard_pictograms else []
 
     @property
@@ -481,6 +551,186 @@ class ProductPricingTier(models.Model):
         return f"{self.product.name} – {self.min_quantity}+"
 
 
+# ─────────────────────────────────────────────────────────────────────
+# Chemistry index  (derived from Product on save – see app.chemistry)
+# ─────────────────────────────────────────────────────────────────────
+
+class ProductChemistry(models.Model):
+    """Parsed formula, molecular weight and CAS status of a product."""
+    product = models.OneToOneField(
+        Product, on_delete=models.CASCADE, primary_key=True, related_name="chemistry",
+    )
+    formula = models.CharField(max_length=200, blank=True, default="", help_text="Hill notation.")
+    formula_error = models.CharField(max_length=200, blank=True, default="")
+    computed_weight = models.FloatField(null=True, blank=True)
+    stated_weight = models.FloatField(null=True, blank=True)
+    weight_matches = models.BooleanField(
+        null=True, help_text="Stated weight agrees with the formula; empty when either is missing.",
+    )
+    molecular_weight = models.FloatField(
+        null=True, blank=True, db_index=True,
+        help_text="Computed from the formula, else the stated value (g/mol).",
+    )
+    cas_number = models.CharField(max_length=20, blank=True, default="", db_index=True)
+    cas_valid = models.BooleanField(null=True)
+
+    class Meta:
+        verbose_name_plural = "Product chemistry"
+
+    def __str__(self):
+        return f"{self.product_id} – {self.formula or self.formula_error or '—'}"
+
+
+class ProductElement(models.Model):
+    """One element of a product's molecular formula and its atom count."""
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="elements",
+    )
+    symbol = models.CharField(max_length=3)
+    count = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["product", "symbol"], name="unique_product_element"),
+        ]
+        indexes = [models.Index(fields=["symbol", "count"])]
+
+    def __str__(self):
+        return f"{self.symbol}{self.count}"
+
+
+class ProductProperty(models.Model):
+    """A physical property of a product parsed into SI units (see app.properties)."""
+    NAME_CHOICES = [(name, name.replace("_", " ").capitalize()) for name in PROPERTIES]
+
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="properties",
+    )
+    name = models.CharField(max_length=32, choices=NAME_CHOICES)
+    raw = models.CharField(max_length=100, help_text="The text it was parsed from.")
+    value = models.FloatField()
+    minimum = models.FloatField(null=True, blank=True)
+    maximum = models.FloatField(null=True, blank=True)
+    unit = models.CharField(max_length=8, blank=True, default="", help_text="SI unit; empty for pH.")
+    confidence = models.FloatField()
+
+    class Meta:
+        verbose_name_plural = "Product properties"
+        constraints = [
+            models.UniqueConstraint(fields=["product", "name"], name="unique_product_property"),
+        ]
+        indexes = [
+            models.Index(fields=["name", "minimum"]),
+            models.Index(fields=["name", "maximum"]),
+            models.Index(fields=["name", "value"]),
+        ]
+
+    def __str__(self):
+        return f"{self.name} = {self.value:g} {self.unit}".rstrip()
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Related-product neighbours  (computed from Product text – see app.recommend)
+# ─────────────────────────────────────────────────────────────────────
+
+class ProductNeighbor(models.Model):
+    """One of a product's most similar products, ``rank`` 0 being the closest."""
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="neighbors",
+    )
+    neighbor = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="+",
+    )
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField(help_text="Cosine similarity of the two products' feature vectors.")
+
+    class Meta:
+        ordering = ["rank"]
+        constraints = [
+            # Also the index behind the detail page's lookup.
+            models.UniqueConstraint(fields=["product", "rank"], name="unique_product_neighbor_rank"),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} → {self.neighbor_id} ({self.score:.3f})"
+
+
+# ─────────────────────────────────────────────────────────────────────
+# GHS code tables  (synced from Product text on save – see app.ghs)
+# ─────────────────────────────────────────────────────────────────────
+
+class HazardCode(models.Model):
+    """A GHS H-, P- or EUH- code (or combination such as "P301+P312")."""
+    code = models.CharField(max_length=60, unique=True)
+    group = models.CharField(
+        max_length=20, db_index=True,
+        help_text="Physical / Health / Environmental for H-codes, Prevention, Response … for P-codes.",
+    )
+    hazard_class = models.CharField(max_length=80, blank=True, default="", db_index=True)
+    statement = models.TextField(blank=True, default="")
+
+    class Meta:
+        ordering = ["code"]
+
+    def __str__(self):
+        return self.code
+
+
+class ProductHazardStatement(models.Model):
+    """One line of a product's hazard or precautionary statements, in order."""
+    HAZARD = "H"
+    PRECAUTIONARY = "P"
+    KIND_CHOICES = [(HAZARD, "Hazard statement"), (PRECAUTIONARY, "Precautionary statement")]
+
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="hazard_statement_rows",
+    )
+    code = models.ForeignKey(
+        HazardCode, on_delete=models.PROTECT, null=True, blank=True,
+        help_text="Empty for lines without a recognisable code.",
+    )
+    kind = models.CharField(max_length=1, choices=KIND_CHOICES)
+    text = models.TextField()
+    position = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["position"]
+
+    def __str__(self):
+        return self.text
+
+
+class GHSPictogram(models.Model):
+    code = models.CharField(max_length=5, unique=True)
+    name = models.CharField(max_length=50)
+
+    class Meta:
+        ordering = ["code"]
+        verbose_name = "GHS pictogram"
+
+    def __str__(self):
+        return f"{self.code} – {self.name}"
+
+
+class ProductPictogram(models.Model):
+    """One entry of a product's pictogram list, as typed, in order."""
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="pictogram_rows",
+    )
+    pictogram = models.ForeignKey(
+        GHSPictogram, on_delete=models.PROTECT, null=True, blank=True,
+        help_text="Empty for entries naming no GHS pictogram, and for repeats.",
+    )
+    label = models.TextField()
+    position = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["position"]
+
+    def __str__(self):
+        return self.label
+
+
 # ─────────────────────────────────────────────────────────────────────
 # Company Details  (singleton – only one row expected)
 # ─────────────────────────────────────────────────────────────────────
@@ -563,6 +813,7 @@ class CompanyDetails(models.Model):
         max_length=1000, blank=True, default="",
         help_text="Google Maps embed URL only (e.g. https://www.google.com/maps/embed?pb=…). Do NOT paste full iframe HTML.",
     )
+    updated_at = models.DateTimeField(auto_now=True)
 
     @property
     def safe_google_maps_iframe(self):
@@ -647,6 +898,7 @@ class ProductArticle(models.Model):
     promote_section_title = models.CharField(max_length=180, blank=True, default="Explore Our Other Products")
     promote_section_text = models.TextField(blank=True, default="")
     promoted_products = models.ManyToManyField(Product, blank=True, related_name="article_promotions")
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["-published_on", "order", "-id"]
@@ -685,3 +937,54 @@ class ProductArticle(models.Model):
     @property
     def seo_title(self):
         return self.meta_title or self.title
+
+
+class ImageDerivative(models.Model):
+    """A resized, re-encoded copy of an uploaded image (built by app.images)."""
+
+    source = models.CharField(max_length=255, db_index=True, help_text="Storage name of the original upload.")
+    content_hash = models.CharField(max_length=64, db_index=True)
+    format = models.CharField(max_length=8)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    file = models.CharField(max_length=255)
+    bytes = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ["source", "format", "width"]
+        constraints = [
+            models.UniqueConstraint(fields=["source", "format", "width"], name="unique_image_derivative"),
+        ]
+
+    def __str__(self):
+        return f"{self.source} – {self.width}w {self.format}"
+
+
+class ImageMetadata(models.Model):
+    """Dimensions, size and placeholder of an uploaded image, recorded at save time."""
+
+    source = models.CharField(max_length=255, unique=True, help_text="Storage name of the upload.")
+    content_hash = models.CharField(max_length=64)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    bytes = models.PositiveIntegerField()
+    has_alpha = models.BooleanField(default=False)
+    dominant_color = models.CharField(max_length=7, help_text="CSS hex colour, e.g. #1a365d.")
+    placeholder = models.TextField(blank=True, default="", help_text="Tiny blurred WebP as a data: URI.")
+
+    class Meta:
+        verbose_name_plural = "Image metadata"
+
+    def __str__(self):
+        return f"{self.source} ({self.width}×{self.height})"
+
+
+class SearchChange(models.Model):
+    """A search document written or removed, so in-memory indexes in other
+    processes can apply just that document (see app.search)."""
+
+    doc_id = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.doc_id} @ {self.created_at:%Y-%m-%d %H:%M:%S}"
@@ -0,0 +1,230 @@
+"""
+Anonymous full-page cache for the public catalogue views.
+
+Pages are stored gzip-compressed in the Django cache under the request path
+plus the current ``content`` generation (see ``app.cache``).  Saving or
+deleting any catalogue row bumps the generation, so a cached page is never
+served after the content it was rendered from has changed, and steady-state
+browsing never reaches the ORM.
+
+Per-visitor fragments (the CSRF token, flash messages) are "punched out" of
+the cached shell: templates emit them through ``{% hole %}``, which renders a
+placeholder while a cacheable page is being built.  Placeholders are filled
+for each visitor by ``fill_holes`` – a plain string substitution after the
+cache lookup – or, for pages served outside Django, left for ``script.js``
+to fill from the ``page_fragments`` JSON endpoint (see ``strip_holes``).
+"""
+
+import gzip
+import hashlib
+import re
+from collections import namedtuple
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.contrib.messages import get_messages
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.html import format_html
+from django.utils.http import parse_http_date_safe
+
+from .cache import bump_generation, get_generation
+
+CONTENT_GENERATION = "content"
+PAGE_KEY = "vcp:page:{}:{}"
+
+# Response headers carried over to responses served from the cache.
+STORED_HEADERS = ("Content-Type", "Content-Language", "ETag", "Last-Modified")
+
+# Set by app.static_export: render the raw shell, bypassing the cache.
+# Not an HTTP_* key, so it cannot be supplied by a client.
+STATIC_EXPORT_META = "vcp.static_export"
+
+HOLE_MARKER = "<!--vcp-hole:{}-->"
+HOLE_PREFIX = b"<!--vcp-hole:"
+HOLE_RE = re.compile(r"<!--vcp-hole:(\w+)-->")
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Hole punching
+# ─────────────────────────────────────────────────────────────────────
+
+def _csrf_fragment(request):
+    return format_html(
+        '<input type="hidden" name="csrfmiddlewaretoken" value="{}">', get_token(request),
+    )
+
+
+def _messages_fragment(request):
+    messages = list(get_messages(request))
+    if not messages:
+        return ""
+    return render_to_string("messages.html", {"messages": messages}, request=request)
+
+
+Fragment = namedtuple("Fragment", "render placeholder cached_value")
+
+# ``placeholder`` is left for script.js to fill in pages served outside Django.
+# ``cached_value`` (if not None) is baked into the cached shell: requests that
+# carry a messages cookie bypass the cache, so cached visitors never have any.
+FRAGMENTS = {
+    "csrf_token": Fragment(
+        _csrf_fragment,
+        '<input type="hidden" name="csrfmiddlewaretoken" value="" data-fragment="csrf_token">',
+        None,
+    ),
+    "messages": Fragment(
+        _messages_fragment,
+        '<div class="messages" data-fragment="messages"></div>',
+        "",
+    ),
+}
+
+
+def render_fragment(name, request):
+    """Render the per-visitor fragment ``name`` for ``request``."""
+    return FRAGMENTS[name].render(request)
+
+
+def is_shell_render(request):
+    """True while a cacheable page shell is being rendered for ``request``."""
+    return getattr(request, "page_cache_shell", False)
+
+
+def fill_holes(content, request):
+    """Replace every placeholder in ``content`` (str) with this visitor's fragment."""
+    return HOLE_RE.sub(lambda m: str(render_fragment(m.group(1), request)), content)
+
+
+def bake_holes(content):
+    """Replace placeholders whose value is the same for every cached visitor."""
+    def bake(match):
+        value = FRAGMENTS[match.group(1)].cached_value
+        return match.group(0) if value is None else value
+    return HOLE_RE.sub(bake, content)
+
+
+def strip_holes(content):
+    """Replace placeholders with empty elements that ``script.js`` fills in."""
+    return HOLE_RE.sub(lambda m: FRAGMENTS[m.group(1)].placeholder, content)
+
+
+def invalidate_pages():
+    """Expire every cached page (called from signal handlers)."""
+    bump_generation(CONTENT_GENERATION)
+
+
+def _is_enabled():
+    return getattr(settings, "PAGE_CACHE_ENABLED", False)
+
+
+def _is_anonymous(request):
+    """True for plain visitors – no session (admin login) and no pending messages."""
+    if request.method not in ("GET", "HEAD"):
+        return False
+    cookies = request.COOKIES
+    return settings.SESSION_COOKIE_NAME not in cookies and "messages" not in cookies
+
+
+def _is_cacheable(request, response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not response.has_header("Content-Encoding")
+        and "private" not in response.get("Cache-Control", "")
+        and "no-store" not in response.get("Cache-Control", "")
+        # A CSRF token was minted for this visitor – the body is personal.
+        and not request.META.get("CSRF_COOKIE_NEEDS_UPDATE")
+    )
+
+
+def _page_key(request):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return PAGE_KEY.format(get_generation(CONTENT_GENERATION), path)
+
+
+def _accepts_gzip(request):
+    return "gzip" in request.META.get("HTTP_ACCEPT_ENCODING", "")
+
+
+def _fill_response(request, response):
+    if HOLE_PREFIX not in response.content:
+        return
+    charset = response.charset
+    response.content = fill_holes(response.content.decode(charset), request).encode(charset)
+
+
+def _response_from_entry(request, entry):
+    headers = entry["headers"]
+    if "ETag" in headers or "Last-Modified" in headers:
+        not_modified = get_conditional_response(
+            request,
+            etag=headers.get("ETag"),
+            last_modified=parse_http_date_safe(headers.get("Last-Modified", "")),
+        )
+        if not_modified is not None:
+            for header in ("ETag", "Last-Modified"):
+                if header in headers:
+                    not_modified[header] = headers[header]
+            not_modified["X-Page-Cache"] = "HIT"
+            return not_modified
+
+    body = entry["body"]
+    response = HttpResponse(status=entry["status"])
+    if entry.get("holes"):
+        response.content = gzip.decompress(body)
+        _fill_response(request, response)
+    elif _accepts_gzip(request):
+        response.content = body
+        response["Content-Encoding"] = "gzip"
+    else:
+        response.content = gzip.decompress(body)
+    for header, value in headers.items():
+        response[header] = value
+    patch_vary_headers(response, ("Accept-Encoding",))
+    response["X-Page-Cache"] = "HIT"
+    return response
+
+
+def cache_public_page(view_func):
+    """Serve anonymous GET/HEAD requests for ``view_func`` from the page cache."""
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if request.META.get(STATIC_EXPORT_META):
+            request.page_cache_shell = True
+            return view_func(request, *args, **kwargs)
+        if not (_is_enabled() and _is_anonymous(request)):
+            return view_func(request, *args, **kwargs)
+
+        key = _page_key(request)
+        entry = cache.get(key)
+        if entry is not None:
+            return _response_from_entry(request, entry)
+
+        request.page_cache_shell = True
+        response = view_func(request, *args, **kwargs)
+        request.page_cache_shell = False
+        if _is_cacheable(request, response):
+            shell = response.content
+            if HOLE_PREFIX in shell:
+                shell = bake_holes(shell.decode(response.charset)).encode(response.charset)
+            cache.set(key, {
+                "status": response.status_code,
+                "body": gzip.compress(shell, compresslevel=6),
+                "headers": {h: response[h] for h in STORED_HEADERS if response.has_header(h)},
+                "holes": HOLE_PREFIX in shell,
+            }, getattr(settings, "PAGE_CACHE_TIMEOUT", 60 * 60 * 24))
+            # Later hits may be served gzipped: intermediaries must key this
+            # first response on the encoding too.
+            patch_vary_headers(response, ("Accept-Encoding",))
+            response["X-Page-Cache"] = "MISS"
+        if not response.streaming:
+            _fill_response(request, response)
+        return response
+
+    return wrapper
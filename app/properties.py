@@ -0,0 +1,293 @@
+"""
+Numeric, SI-normalised physical properties parsed from free text.
+
+Editors type ``Product.flash_point`` and friends the way SDS sheets print
+them: "> 60 °C (closed cup)", "1.12 g/cm³ at 20 °C", "10.5 – 11.5",
+"≈ 2 mmHg @ 25°C".  ``parse_property`` turns such a string into a
+``Parsed`` tuple in SI units (K, kg/m³, Pa·s or m²/s, Pa; pH is unitless):
+
+* ``minimum`` / ``maximum`` – what the text guarantees; an exact value sets
+  both, "> 60 °C" only the minimum, "< 0.1 hPa" only the maximum;
+* ``value`` – the single best number (a bound, or the middle of a range);
+* ``confidence`` – 1.0 for an exact value with a unit, lower for assumed
+  units, approximations and relative densities.
+
+Each product's parsed values live in ``ProductProperty`` rows written on
+save, indexed by ``(name, minimum)`` and ``(name, maximum)``, so
+``property_filter(products, "flash_point", at_least=60, unit="°C")`` is one
+indexed query.  ``manage.py backfill_properties`` re-parses the catalogue.
+"""
+
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+
+Parsed = namedtuple("Parsed", "value minimum maximum unit confidence")
+
+# Product field → kind of quantity.
+PROPERTIES = {
+    "flash_point": "temperature",
+    "melting_point": "temperature",
+    "boiling_point": "temperature",
+    "density": "density",
+    "viscosity": "viscosity",
+    "vapor_pressure": "pressure",
+    "ph_value": "ph",
+}
+
+# Unit aliases (lower-case, without spaces, dots or middle dots) →
+# (SI unit, factor); temperature "factors" name the scale.
+UNITS = {
+    "temperature": {
+        "°c": ("K", "C"), "c": ("K", "C"), "degc": ("K", "C"), "celsius": ("K", "C"),
+        "°f": ("K", "F"), "f": ("K", "F"), "degf": ("K", "F"), "fahrenheit": ("K", "F"),
+        "k": ("K", "K"), "kelvin": ("K", "K"),
+    },
+    "density": {
+        "g/cm3": ("kg/m³", 1000), "g/cc": ("kg/m³", 1000), "g/ml": ("kg/m³", 1000),
+        "kg/l": ("kg/m³", 1000), "kg/dm3": ("kg/m³", 1000), "g/l": ("kg/m³", 1),
+        "kg/m3": ("kg/m³", 1), "lb/gal": ("kg/m³", 119.826), "lbs/gal": ("kg/m³", 119.826),
+    },
+    "viscosity": {
+        "mpas": ("Pa·s", 1e-3), "cp": ("Pa·s", 1e-3), "cps": ("Pa·s", 1e-3), "centipoise": ("Pa·s", 1e-3),
+        "pas": ("Pa·s", 1), "p": ("Pa·s", 0.1), "poise": ("Pa·s", 0.1),
+        "cst": ("m²/s", 1e-6), "mm2/s": ("m²/s", 1e-6), "m2/s": ("m²/s", 1),
+    },
+    "pressure": {
+        "pa": ("Pa", 1), "hpa": ("Pa", 100), "kpa": ("Pa", 1000), "mbar": ("Pa", 100),
+        "bar": ("Pa", 1e5), "mmhg": ("Pa", 133.322), "torr": ("Pa", 133.322),
+        "atm": ("Pa", 101325), "psi": ("Pa", 6894.76), "mpa": ("Pa", 1e6),
+    },
+    "ph": {},
+}
+
+# Unit assumed when the text has none (confidence is reduced).
+DEFAULT_UNITS = {"temperature": "°c", "density": "g/cm3", "viscosity": "mpas", "pressure": "hpa"}
+
+_NOT_A_VALUE_RE = re.compile(
+    r"^\s*(?:n/?a|nil|none|not\s+(?:applicable|available|determined|established)|"
+    r"no\s+data|non[-\s]?flammable|not\s+flammable|-+)\s*\.?\s*$",
+    re.IGNORECASE,
+)
+_NUMBER = r"(?<![\w.])-?\d+(?:[.,]\d+)?(?:\s*(?:[eE]|[x×]\s*10\s*\^?)\s*[-+]?\d+)?"
+_NUMBER_RE = re.compile(_NUMBER)
+_RANGE_TAIL_RE = re.compile(r"\s*(?:-|–|—|to|~|\.\.\.?|…)\s*(" + _NUMBER + ")", re.IGNORECASE)
+_LOWER_BOUND_RE = re.compile(r"(?:>|≥|=>|>=|\babove\b|\bover\b|\bmore than\b|\bgreater than\b|\bmin\b)\W*$", re.IGNORECASE)
+_UPPER_BOUND_RE = re.compile(r"(?:<|≤|=<|<=|\bbelow\b|\bunder\b|\bless than\b|\bmax\b)\W*$", re.IGNORECASE)
+_TRAILING_MIN_RE = re.compile(r"\bmin(?:imum)?\b", re.IGNORECASE)
+_TRAILING_MAX_RE = re.compile(r"\bmax(?:imum)?\b", re.IGNORECASE)
+_APPROX_RE = re.compile(r"(?:~|≈|\bapprox|\bca\b|\bcirca\b|\babout\b)", re.IGNORECASE)
+_RELATIVE_DENSITY_RE = re.compile(r"\b(?:s\.?g\.?|specific\s+gravity|relative\s+density)\b", re.IGNORECASE)
+
+
+def _number(text):
+    text = re.sub(r"\s+", "", text).lower().replace("×", "x")
+    mantissa, _, exponent = text.partition("e")
+    if not exponent:
+        mantissa, _, exponent = mantissa.partition("x10")
+        exponent = exponent.lstrip("^")
+    if "," in mantissa and "." not in mantissa:
+        whole, _, fraction = mantissa.partition(",")
+        # "1,120" is a thousands separator; "1,12" and "0,950" are decimal commas.
+        if len(fraction) == 3 and whole.lstrip("-") not in ("", "0"):
+            mantissa = whole + fraction
+        else:
+            mantissa = f"{whole}.{fraction}"
+    value = float(mantissa)
+    return value * 10 ** int(exponent) if exponent else value
+
+
+def _alias_pattern(alias):
+    # "mmhg" also matches "mm Hg", "mPa·s" and "mPa s" match "mpas"; the
+    # unit must not run on into a longer word ("p" is not "per").
+    return re.compile(r"[\s.·*]*".join(map(re.escape, alias)) + r"(?![a-z])")
+
+
+_UNIT_PATTERNS = {
+    kind: [(alias, _alias_pattern(alias)) for alias in sorted(aliases, key=len, reverse=True)]
+    for kind, aliases in UNITS.items()
+}
+
+
+def _match_unit(kind, text):
+    """(alias, SI unit, factor) for the unit at the start of ``text``, or None."""
+    text = text.strip()
+    normalized = text.lower().replace("³", "3").replace("²", "2").replace("º", "°").replace("˚", "°")
+    normalized = re.sub(r"deg(?:rees?)?\s*", "°", normalized)
+    for alias, pattern in _UNIT_PATTERNS[kind]:
+        if pattern.match(normalized):
+            if alias == "mpa" and not text.startswith("MPa"):
+                continue  # millipascal is a viscosity unit, not a pressure
+            return (alias,) + UNITS[kind][alias]
+    return None
+
+
+def _to_si(kind, number, si_unit, factor):
+    if kind != "temperature":
+        return number * factor
+    if factor == "C":
+        return number + 273.15
+    if factor == "F":
+        return (number - 32) * 5 / 9 + 273.15
+    return number
+
+
+@lru_cache(maxsize=8192)
+def parse_property(name, text):
+    """Parse ``text`` for property ``name``; return ``Parsed`` or None.
+
+    Memoised: the same supplier strings recur across a catalogue.
+    """
+    kind = PROPERTIES[name]
+    text = (text or "").replace("−", "-").replace(" ", " ").strip()
+    if not text or _NOT_A_VALUE_RE.match(text):
+        return None
+    first = _NUMBER_RE.search(text)
+    if first is None:
+        return None
+
+    prefix = text[:first.start()]
+    low = _number(first.group())
+    high = None
+    end = first.end()
+    tail = _RANGE_TAIL_RE.match(text, end)
+    if tail:
+        high = _number(tail.group(1))
+        end = tail.end()
+        if high < low:
+            low, high = high, low
+
+    confidence = 1.0
+    unit_text = text[end:]
+    relative = kind == "density" and bool(_RELATIVE_DENSITY_RE.search(text))
+    if kind == "ph":
+        si_unit, factor = "", 1
+    else:
+        unit = _match_unit(kind, unit_text)
+        if unit is None and kind == "density" and relative:
+            unit = ("g/cm3",) + UNITS["density"]["g/cm3"]
+            confidence *= 0.8  # relative to water, not an absolute density
+        elif unit is None:
+            default = DEFAULT_UNITS[kind]
+            if kind == "density" and low > 100:
+                default = "kg/m3"  # nobody sells a liquid at 100 g/cm³
+            unit = (default,) + UNITS[kind][default]
+            confidence *= 0.6
+        _, si_unit, factor = unit
+
+    if _APPROX_RE.search(prefix):
+        confidence *= 0.8
+    if "decomp" in text.lower():
+        confidence *= 0.7
+
+    low = _to_si(kind, low, si_unit, factor)
+    minimum = maximum = low
+    if high is not None:
+        maximum = _to_si(kind, high, si_unit, factor)
+        value = (minimum + maximum) / 2
+    elif _LOWER_BOUND_RE.search(prefix) or _TRAILING_MIN_RE.search(unit_text):
+        maximum, value = None, low
+        confidence *= 0.9
+    elif _UPPER_BOUND_RE.search(prefix) or _TRAILING_MAX_RE.search(unit_text):
+        minimum, value = None, low
+        confidence *= 0.9
+    else:
+        value = low
+    return Parsed(_round(value), _round(minimum), _round(maximum), si_unit, round(confidence, 2))
+
+
+def _round(number):
+    return None if number is None else float(f"{number:.6g}")
+
+
+def to_si(name, number, unit=None):
+    """Convert ``number`` given in ``unit`` (default: the property's usual unit) to SI."""
+    kind = PROPERTIES[name]
+    if kind == "ph":
+        return number
+    match = _match_unit(kind, unit or DEFAULT_UNITS[kind])
+    if match is None:
+        raise ValueError(f"Unknown {kind} unit {unit!r}")
+    _, si_unit, factor = match
+    return _to_si(kind, number, si_unit, factor)
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Indexing
+# ─────────────────────────────────────────────────────────────────────
+
+def property_rows(product):
+    """Unsaved ``ProductProperty`` rows for the parsable properties of ``product``."""
+    from .models import ProductProperty
+
+    rows = []
+    for name in PROPERTIES:
+        raw = getattr(product, name)
+        parsed = parse_property(name, raw)
+        if parsed is not None:
+            rows.append(ProductProperty(product_id=product.pk, name=name, raw=raw[:100], **parsed._asdict()))
+    return rows
+
+
+def index_products(products):
+    """Replace the ``ProductProperty`` rows of ``products``; return how many products."""
+    from .models import ProductProperty
+
+    products = list(products)
+    rows = [row for product in products for row in property_rows(product)]
+    with transaction.atomic():
+        ProductProperty.objects.filter(product_id__in=[p.pk for p in products]).delete()
+        ProductProperty.objects.bulk_create(rows)
+    return len(products)
+
+
+def index_product(product):
+    index_products([product])
+
+
+def backfill(batch_size=1000):
+    """Re-parse every product in primary-key batches; yields the running total."""
+    from .models import Product
+
+    products = Product.objects.order_by("pk").only("pk", *PROPERTIES)
+    done, last_pk = 0, 0
+    while True:
+        batch = list(products.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return
+        done += index_products(batch)
+        last_pk = batch[-1].pk
+        yield done
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Queries
+# ─────────────────────────────────────────────────────────────────────
+
+def property_filter(queryset, name, at_least=None, at_most=None, unit=None):
+    """Products of ``queryset`` whose ``name`` is known to lie within the bounds.
+
+    Bounds are in ``unit`` (default: the usual unit – °C, g/cm³, mPa·s, hPa).
+    "> 60 °C" satisfies ``at_least=60`` but not ``at_most=100``.
+    """
+    # (product, name) is unique, so the join cannot duplicate products.
+    conditions = {"properties__name": name}
+    if at_least is not None:
+        conditions["properties__minimum__gte"] = to_si(name, at_least, unit)
+    if at_most is not None:
+        conditions["properties__maximum__lte"] = to_si(name, at_most, unit)
+    return queryset.filter(**conditions)
+
+
+def order_by_property(queryset, name, descending=False):
+    """Order ``queryset`` by the parsed SI value of ``name``; unknown values last."""
+    from .models import ProductProperty
+
+    value = Subquery(ProductProperty.objects.filter(product=OuterRef("pk"), name=name).values("value")[:1])
+    field = f"{name}_si"
+    queryset = queryset.annotate(**{field: value})
+    order = F(field).desc(nulls_last=True) if descending else F(field).asc(nulls_last=True)
+    return queryset.order_by(order, "pk")
@@ -0,0 +1,538 @@
+"""
+Content-based "related products", precomputed into ``ProductNeighbor``.
+
+Each product becomes one feature vector:
+
+* TF-IDF over the words of its description, primary applications, industry
+  usage and spec values (sublinear term frequency, smoothed IDF, terms that
+  are too rare or too common dropped, capped at ``MAX_FEATURES``);
+* a one-hot block for its category;
+* a block for its grades (technical, industrial, analytical, pharma).
+
+Each block is L2-normalised and weighted, and the whole vector normalised
+again, so the dot product of two rows is their cosine similarity.  The
+text block is kept sparse – compressed rows plus the same entries by
+column – so memory grows with the number of words, not products × features;
+the category and grade blocks are reduced to a category number and four
+floats per product.  The ``TOP_K`` nearest neighbours are found in batches
+of ``BATCH_SIZE`` rows and stored ranked, so the detail page reads them
+with one indexed query.
+
+The vocabulary, IDF weights and vectors are fitted by ``rebuild_all``
+(``manage.py rebuild_neighbors``) and kept in the shared cache as a
+``Model``.  A product edit does not recompute everything: ``refresh``
+re-vectorises only the products edited since the stored model was written
+(against its vocabulary and IDF), drops deleted ones, and scores just the
+edited rows against the catalogue.  Those same scores tell which other
+lists gain or lose an edited product; such a list is patched – its other
+entries re-scored pair by pair, the edited products merged in – and only
+recomputed in full when an edited product it held fell to its bottom.
+Words that are new since the last rebuild carry no weight until the next
+one re-fits the vocabulary; schedule ``rebuild_neighbors`` (nightly, say)
+to pick them up.
+
+Saves are coalesced: ``schedule_refresh`` only records the products, and
+one background job waits ``REFRESH_DELAY`` seconds and refreshes everything
+recorded by then – an admin form with a dozen spec inlines costs one
+refresh, not thirteen.
+
+NumPy is optional: without it nothing is stored and ``recommended_products``
+falls back to products of the same category.
+"""
+
+import math
+import re
+import threading
+import time
+from collections import Counter, defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .cache import bump_generation
+
+try:
+    import numpy as np
+except ImportError:  # optional – related products fall back to the same category without it
+    np = None
+
+TOP_K = 8
+BATCH_SIZE = 128  # rows scored at once; each batch holds BATCH_SIZE × products float64 scores
+MIN_SCORE = 0.05  # weaker matches are not worth showing
+MAX_MATCHES = 2_000_000  # (row, product, word) matches expanded at once while scoring
+REFRESH_DELAY = 2.0  # seconds to gather the saves of one edit before refreshing
+MODEL_KEY = "recommend:model"
+# Products saved this long before the stored model are re-vectorised too, so
+# a refresh racing another worker's still picks up that worker's edits.
+CHANGE_OVERLAP = timedelta(seconds=30)
+
+MAX_FEATURES = 4096
+MIN_DF = 2          # a word must occur in at least this many products …
+MAX_DF = 0.5        # … and at most this share of them
+
+TEXT_WEIGHT = 1.0
+CATEGORY_WEIGHT = 0.5
+GRADE_WEIGHT = 0.35
+
+TEXT_FIELDS = ("description", "primary_applications", "industry_usage")
+GRADE_FIELDS = ("is_technical_grade", "is_industrial_grade", "is_analytical_grade", "is_pharma_grade")
+
+_WORD_RE = re.compile(r"[a-z][a-z0-9]+(?:-[a-z0-9]+)*")
+STOP_WORDS = frozenset("""
+    a an and are as at be by can for from has have in is it its of on or such that the their this
+    to used uses using was which with within
+""".split())
+
+# Compressed sparse rows (or columns): line i holds indices[indptr[i]:indptr[i + 1]]
+# with the values at the same positions of data.
+Sparse = namedtuple("Sparse", "indptr indices data")
+
+
+class Vectors(namedtuple("Vectors", "pks text columns categories category_weights grades")):
+    """Feature vectors of the catalogue; row i is the product ``pks[i]``.
+
+    ``text`` holds the weighted TF-IDF block by row and ``columns`` the same
+    entries by term.  A row's category block is ``category_weights[i]`` at
+    column ``categories[i]``; ``grades`` is the dense ``n × 4`` grade block.
+    Every block is already divided by the row's overall norm.
+    """
+    __slots__ = ()
+
+    @property
+    def features(self):
+        categories = int(self.categories.max(initial=-1)) + 1
+        return len(self.columns.indptr) - 1 + categories + len(GRADE_FIELDS)
+
+    @property
+    def nbytes(self):
+        arrays = (self.pks, *self.text, *self.columns, self.categories, self.category_weights, self.grades)
+        return sum(array.nbytes for array in arrays)
+
+
+class Model(namedtuple("Model", "vectors vocabulary idf category_ids as_of")):
+    """Fitted ``Vectors`` with what new rows are weighed against.
+
+    ``vocabulary`` maps a term to its text column, ``idf`` holds the column
+    weights and ``category_ids`` maps a category pk to its column.  The rows
+    reflect every product saved before ``as_of``.
+    """
+    __slots__ = ()
+
+
+def _words(text):
+    return [word for word in _WORD_RE.findall(text.lower()) if word not in STOP_WORDS]
+
+
+def _documents(pks=None):
+    """``(pk, category_id, grades, Counter of terms)`` for every product (or those in ``pks``), by pk."""
+    from .models import Product, ProductSpec
+
+    products, specs = Product.objects.order_by("pk"), ProductSpec.objects.order_by()
+    if pks is not None:
+        products, specs = products.filter(pk__in=pks), specs.filter(product_id__in=pks)
+    spec_terms = defaultdict(list)
+    rows = specs.values_list("product_id", "value")
+    for product_id, value in rows.iterator(chunk_size=5000):
+        # Words of the value and the whole value ("99.5%", "white powder").
+        spec_terms[product_id] += _words(value)
+        spec_terms[product_id].append("=" + value.strip().lower())
+
+    fields = ("pk", "category_id", *TEXT_FIELDS, *GRADE_FIELDS)
+    rows = products.values_list(*fields)
+    for pk, category_id, *values in rows.iterator(chunk_size=5000):
+        texts, grades = values[:len(TEXT_FIELDS)], values[len(TEXT_FIELDS):]
+        terms = Counter(word for text in texts for word in _words(text))
+        terms.update(spec_terms.get(pk, ()))
+        yield pk, category_id, grades, terms
+
+
+def _ranges(starts, ends):
+    """``np.concatenate([np.arange(a, b) for a, b in zip(starts, ends)])``, without the loop."""
+    lengths = ends - starts
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return np.arange(lengths.sum(), dtype=np.int64) + offsets
+
+
+def _weigh(documents, vocabulary, idf, category_ids):
+    """``Vectors`` of ``documents`` (``_documents`` rows) against a fitted vocabulary."""
+    pks, categories, grades = [], [], []
+    indptr, indices, weights = [0], [], []
+    for pk, category_id, product_grades, terms in documents:
+        pks.append(pk)
+        categories.append(category_ids[category_id])
+        grades.append(product_grades)
+        for term, count in terms.items():
+            j = vocabulary.get(term)
+            if j is not None:
+                indices.append(j)
+                weights.append((1 + math.log(count)) * idf[j])
+        indptr.append(len(indices))
+    n = len(pks)
+    indptr = np.array(indptr, dtype=np.int64)
+    indices = np.array(indices, dtype=np.int32)
+    data = np.array(weights, dtype=np.float32)
+    owner = np.repeat(np.arange(n), np.diff(indptr))
+
+    # Block norms, then the norm of the whole weighted vector.
+    text_norm = np.sqrt(np.bincount(owner, weights=data.astype(np.float64) ** 2, minlength=n))
+    grade = np.array(grades, dtype=np.float32).reshape(n, len(GRADE_FIELDS))
+    grade_norm = np.linalg.norm(grade, axis=1)
+    norm = np.sqrt(
+        (text_norm > 0) * TEXT_WEIGHT ** 2 + CATEGORY_WEIGHT ** 2 + (grade_norm > 0) * GRADE_WEIGHT ** 2
+    )
+    np.divide(TEXT_WEIGHT, text_norm * norm, out=text_norm, where=text_norm > 0)
+    data *= text_norm[owner].astype(np.float32)
+    np.divide(grade, (grade_norm * norm / GRADE_WEIGHT)[:, None], out=grade, where=grade_norm[:, None] > 0)
+
+    return Vectors(
+        pks=np.array(pks, dtype=np.int64),
+        text=Sparse(indptr, indices, data),
+        columns=_by_term(indptr, indices, data, len(vocabulary)),
+        categories=np.array(categories, dtype=np.int32),
+        category_weights=(CATEGORY_WEIGHT / norm).astype(np.float32),
+        grades=grade,
+    )
+
+
+def _by_term(indptr, indices, data, features):
+    """The entries of a by-row ``Sparse`` by term: who else uses each word."""
+    owner = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+    order = np.argsort(indices, kind="stable")
+    column_ptr = np.zeros(features + 1, dtype=np.int64)
+    np.cumsum(np.bincount(indices, minlength=features), out=column_ptr[1:])
+    return Sparse(column_ptr, owner[order].astype(np.int32), data[order])
+
+
+def fit():
+    """A ``Model`` fitted to the whole catalogue (float32 rows, L2-normalised)."""
+    as_of = timezone.now()
+    documents = list(_documents())
+    n = len(documents)
+    document_frequency = Counter(term for *_, terms in documents for term in terms)
+    kept = [(df, term) for term, df in document_frequency.items() if MIN_DF <= df <= max(MAX_DF * n, MIN_DF)]
+    kept.sort(key=lambda item: (-item[0], item[1]))
+    vocabulary = {term: j for j, (_, term) in enumerate(kept[:MAX_FEATURES])}
+    idf = [math.log((1 + n) / (1 + df)) + 1 for df, _ in kept[:MAX_FEATURES]]
+    categories = {category_id for _, category_id, *_ in documents}
+    category_ids = {category_id: j for j, category_id in enumerate(sorted(categories, key=str))}
+    return Model(_weigh(documents, vocabulary, idf, category_ids), vocabulary, idf, category_ids, as_of)
+
+
+def vectorize():
+    """The ``Vectors`` of the whole catalogue, freshly fitted."""
+    return fit().vectors
+
+
+def fitted():
+    """The stored ``Model``, or None until ``rebuild_all`` (or a refresh) stores one."""
+    return cache.get(MODEL_KEY)
+
+
+def _patched(model, changed):
+    """``model`` with the products saved since it was written, and ``changed``,
+    re-vectorised against its vocabulary, and deleted products dropped."""
+    from .models import Product
+
+    as_of = timezone.now()
+    present = set(Product.objects.values_list("pk", flat=True))
+    edited = set(changed) | set(
+        Product.objects.filter(updated_at__gte=model.as_of - CHANGE_OVERLAP).values_list("pk", flat=True)
+    )
+    documents = list(_documents(sorted(edited & present)))
+    category_ids = dict(model.category_ids)
+    for _, category_id, *_ in documents:
+        category_ids.setdefault(category_id, len(category_ids))
+    new = _weigh(documents, model.vocabulary, model.idf, category_ids)
+
+    # Stack the rows kept from the model and the new ones, then order by pk.
+    old = model.vectors
+    keep = np.flatnonzero(np.isin(old.pks, list(present - edited)))
+    starts = np.concatenate([old.text.indptr[keep], new.text.indptr[:-1] + len(old.text.indices)])
+    lengths = np.concatenate([np.diff(old.text.indptr)[keep], np.diff(new.text.indptr)])
+    stacked_indices = np.concatenate([old.text.indices, new.text.indices])
+    stacked_data = np.concatenate([old.text.data, new.text.data])
+    pks = np.concatenate([old.pks[keep], new.pks])
+    order = np.argsort(pks, kind="stable")
+    positions = _ranges(starts[order], starts[order] + lengths[order])
+    indptr = np.zeros(len(pks) + 1, dtype=np.int64)
+    np.cumsum(lengths[order], out=indptr[1:])
+    indices, data = stacked_indices[positions], stacked_data[positions]
+    vectors = Vectors(
+        pks=pks[order],
+        text=Sparse(indptr, indices, data),
+        columns=_by_term(indptr, indices, data, len(model.vocabulary)),
+        categories=np.concatenate([old.categories[keep], new.categories])[order],
+        category_weights=np.concatenate([old.category_weights[keep], new.category_weights])[order],
+        grades=np.concatenate([old.grades[keep], new.grades])[order],
+    )
+    return model._replace(vectors=vectors, category_ids=category_ids, as_of=as_of)
+
+
+def similarities(vectors, rows):
+    """Cosine similarity of each product at ``rows`` to every product (``len(rows) × n``)."""
+    rows = np.asarray(rows, dtype=np.int64)
+    n = len(vectors.pks)
+    text, columns = vectors.text, vectors.columns
+    # The words of each row, then every product using each of those words.
+    starts, ends = text.indptr[rows], text.indptr[rows + 1]
+    row_ends = np.cumsum(ends - starts)
+    owner = np.repeat(np.arange(len(rows)), ends - starts)
+    positions = _ranges(starts, ends)
+    terms, weights = text.indices[positions], text.data[positions]
+    starts, ends = columns.indptr[terms], columns.indptr[terms + 1]
+    matches_per_row = np.bincount(owner, weights=ends - starts, minlength=len(rows))
+
+    scores = np.empty((len(rows), n), dtype=np.float64)
+    first = 0
+    while first < len(rows):
+        # Whole rows, at most MAX_MATCHES expanded matches at a time (at least one row).
+        last = first + max(1, int(np.searchsorted(np.cumsum(matches_per_row[first:]), MAX_MATCHES, side="right")))
+        a, b = (row_ends[first - 1] if first else 0), row_ends[last - 1]
+        counts = ends[a:b] - starts[a:b]
+        matches = _ranges(starts[a:b], ends[a:b])
+        scores[first:last] = np.bincount(
+            np.repeat((owner[a:b] - first) * n, counts) + columns.indices[matches],
+            weights=np.repeat(weights[a:b], counts) * columns.data[matches],
+            minlength=(last - first) * n,
+        ).reshape(last - first, n)
+        first = last
+
+    same_category = vectors.categories[rows, None] == vectors.categories[None, :]
+    scores += np.outer(vectors.category_weights[rows], vectors.category_weights) * same_category
+    scores += vectors.grades[rows] @ vectors.grades.T
+    scores[np.arange(len(rows)), rows] = -np.inf  # not its own neighbour
+    return scores
+
+
+def pair_similarities(vectors, left, right):
+    """Cosine similarity of the products at ``left[i]`` and ``right[i]``, pair by pair."""
+    left, right = np.asarray(left, dtype=np.int64), np.asarray(right, dtype=np.int64)
+    text, features = vectors.text, len(vectors.columns.indptr) - 1
+    # The words of each right-hand row, keyed by (pair, word) and sorted for lookup …
+    starts, ends = text.indptr[right], text.indptr[right + 1]
+    positions = _ranges(starts, ends)
+    keys = np.repeat(np.arange(len(right)), ends - starts) * features + text.indices[positions]
+    order = np.argsort(keys, kind="stable")
+    keys, values = keys[order], text.data[positions][order]
+    # … and looked up with the words of the left-hand row.
+    starts, ends = text.indptr[left], text.indptr[left + 1]
+    positions = _ranges(starts, ends)
+    pair = np.repeat(np.arange(len(left)), ends - starts)
+    wanted = pair * features + text.indices[positions]
+    found = np.minimum(np.searchsorted(keys, wanted), max(len(keys) - 1, 0))
+    hit = keys[found] == wanted if len(keys) else np.zeros(len(wanted), dtype=bool)
+    scores = np.bincount(pair[hit], weights=text.data[positions][hit] * values[found[hit]], minlength=len(left))
+
+    same_category = vectors.categories[left] == vectors.categories[right]
+    scores += vectors.category_weights[left] * vectors.category_weights[right] * same_category
+    scores += np.einsum("ij,ij->i", vectors.grades[left], vectors.grades[right])
+    return scores
+
+
+def _ranked(vectors, rows, scores, k=TOP_K):
+    """``{pk: [(neighbor_pk, score), …]}`` from the ``similarities`` of ``rows``."""
+    k = min(k, len(vectors.pks) - 1)
+    if k > 0:
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        top, top_scores = np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+    result = {}
+    for i, row in enumerate(rows):
+        pk = int(vectors.pks[row])
+        result[pk] = [] if k <= 0 else [
+            (int(vectors.pks[j]), float(score))
+            for j, score in zip(top[i], top_scores[i]) if score >= MIN_SCORE
+        ]
+    return result
+
+
+def nearest(vectors, rows, k=TOP_K):
+    """``{pk: [(neighbor_pk, score), …]}`` for the products at ``rows``, best first."""
+    result = {}
+    for start in range(0, len(rows), BATCH_SIZE):
+        batch = np.asarray(rows[start:start + BATCH_SIZE], dtype=np.int64)
+        result.update(_ranked(vectors, batch, similarities(vectors, batch), k))
+    return result
+
+
+def _save(neighbors):
+    """Store ``neighbors``; returns the pks whose ranked neighbours changed."""
+    from .models import ProductNeighbor
+
+    previous = defaultdict(list)
+    with transaction.atomic():
+        rows = ProductNeighbor.objects.filter(product_id__in=list(neighbors))
+        for pk, neighbor_pk in rows.order_by("product_id", "rank").values_list("product_id", "neighbor_id"):
+            previous[pk].append(neighbor_pk)
+        rows.delete()
+        ProductNeighbor.objects.bulk_create([
+            ProductNeighbor(product_id=pk, neighbor_id=neighbor_pk, rank=rank, score=score)
+            for pk, rows in neighbors.items()
+            for rank, (neighbor_pk, score) in enumerate(rows)
+        ], batch_size=1000)
+    return {pk for pk, rows in neighbors.items() if [neighbor_pk for neighbor_pk, _ in rows] != previous[pk]}
+
+
+def invalidate_recommendations(pks=()):
+    """Expire pages showing related products (see ``product_validators``)
+    and re-export the detail pages of the products ``pks``."""
+    from .page_cache import invalidate_pages
+    from .static_export import paths_for_neighbors, schedule_regeneration
+
+    bump_generation("recommendations")
+    invalidate_pages()
+    if pks:
+        schedule_regeneration(*paths_for_neighbors(pks))
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Full and incremental refresh
+# ─────────────────────────────────────────────────────────────────────
+
+def rebuild_all(batch_size=BATCH_SIZE):
+    """Re-fit the model and recompute every product's neighbours; yields the running count."""
+    model = fit()
+    cache.set(MODEL_KEY, model, None)
+    vectors = model.vectors
+    updated = set()
+    for start in range(0, len(vectors.pks), batch_size):
+        rows = list(range(start, min(start + batch_size, len(vectors.pks))))
+        updated |= _save(nearest(vectors, rows))
+        yield rows[-1] + 1
+    invalidate_recommendations(updated)
+
+
+def refresh(changed=(), stale=()):
+    """Recompute the neighbours affected by edits to the products ``changed``.
+
+    ``stale`` are products whose lists are known to be out of date (they
+    listed a product that has since been deleted).  Returns the pks of the
+    products whose ranked neighbours changed.
+
+    Only edited rows are re-vectorised, against the stored model; with none
+    stored yet (or evicted from the cache) the model is fitted from scratch.
+    """
+    from django.db.models import Count, Min
+
+    from .models import ProductNeighbor
+
+    model = fitted()
+    model = fit() if model is None else _patched(model, changed)
+    cache.set(MODEL_KEY, model, None)
+    vectors = model.vectors
+    n = len(vectors.pks)
+    index = {int(pk): i for i, pk in enumerate(vectors.pks)}
+    changed = sorted({pk for pk in changed if pk in index})
+    edited = set(changed)
+
+    # A list takes in an edited product that beats its weakest entry (any
+    # entry above MIN_SCORE while it is not full), and must re-score every
+    # edited product it already holds.
+    floor = np.full(n, MIN_SCORE, dtype=np.float64)
+    weakest = ProductNeighbor.objects.order_by().values("product_id").annotate(floor=Min("score"), n=Count("pk"))
+    for pk, score, count in weakest.values_list("product_id", "floor", "n"):
+        if pk in index and count >= TOP_K:
+            floor[index[pk]] = max(score, MIN_SCORE)
+    holders = np.zeros(n, dtype=bool)
+    holder_pks = ProductNeighbor.objects.filter(neighbor_id__in=changed).values_list("product_id", flat=True)
+    holders[[index[pk] for pk in holder_pks if pk in index]] = True
+
+    neighbors, incoming = {}, defaultdict(dict)  # incoming: other pk → {edited pk: score}
+    for start in range(0, len(changed), BATCH_SIZE):
+        batch = np.array([index[pk] for pk in changed[start:start + BATCH_SIZE]], dtype=np.int64)
+        scores = similarities(vectors, batch)
+        neighbors.update(_ranked(vectors, batch, scores))
+        for i, j in zip(*np.nonzero((scores > floor) | (holders & (scores > -np.inf)))):
+            incoming[int(vectors.pks[j])][int(vectors.pks[batch[i]])] = float(scores[i, j])
+
+    recompute = {pk for pk in stale if pk in index} - edited
+    candidates = sorted(set(incoming) - edited - recompute)
+    listed = defaultdict(list)
+    rows = ProductNeighbor.objects.filter(product_id__in=candidates).order_by("product_id", "rank")
+    for pk, neighbor_pk in rows.values_list("product_id", "neighbor_id"):
+        listed[pk].append(neighbor_pk)
+    # The entries they keep are re-scored: either end may have been re-vectorised.
+    pairs = [(pk, other) for pk in candidates for other in listed[pk] if other in index and other not in edited]
+    kept = defaultdict(list)
+    if pairs:
+        scores = pair_similarities(vectors, [index[pk] for pk, _ in pairs], [index[other] for _, other in pairs])
+        for (pk, other), score in zip(pairs, scores.tolist()):
+            kept[pk].append((other, score))
+    for pk in candidates:
+        scores = incoming[pk]
+        weakest = min((score for _, score in kept[pk]), default=math.inf)
+        if len(listed[pk]) >= TOP_K and any(scores[other] < weakest for other in listed[pk] if other in edited):
+            # An edited product fell to the bottom of a full list; what replaces it is unknown.
+            recompute.add(pk)
+            continue
+        merged = kept[pk] + [(other, score) for other, score in scores.items() if score >= MIN_SCORE]
+        merged.sort(key=lambda row: -row[1])
+        neighbors[pk] = [row for row in merged if row[1] >= MIN_SCORE][:TOP_K]
+    neighbors.update(nearest(vectors, sorted(index[pk] for pk in recompute)))
+
+    updated, pks = set(), list(neighbors)
+    for start in range(0, len(pks), BATCH_SIZE):
+        updated |= _save({pk: neighbors[pk] for pk in pks[start:start + BATCH_SIZE]})
+    return updated
+
+
+_refresh_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="recommendations")
+_refresh_lock = threading.Lock()
+_pending = {"changed": set(), "stale": set()}  # recorded by schedule_refresh, drained by _refresh_job
+_pending_lock = threading.Lock()
+
+
+def _refresh_job():
+    time.sleep(REFRESH_DELAY)  # let the rest of the edit's saves arrive
+    with _refresh_lock:
+        with _pending_lock:
+            changed, stale = set(_pending["changed"]), set(_pending["stale"])
+            _pending["changed"].clear()
+            _pending["stale"].clear()
+        if not (changed or stale):
+            return  # an earlier job already took them
+        try:
+            updated = refresh(changed, stale)
+            if updated:
+                invalidate_recommendations(updated)
+        finally:
+            connections.close_all()
+
+
+def _enqueue(changed, stale):
+    with _pending_lock:
+        queued = bool(_pending["changed"] or _pending["stale"])
+        _pending["changed"].update(changed)
+        _pending["stale"].update(stale)
+    if not queued:
+        _refresh_executor.submit(_refresh_job)
+
+
+def schedule_refresh(changed=(), stale=()):
+    """Refresh the neighbours affected by ``changed`` once the current
+    transaction commits, together with any other refresh pending by then."""
+    changed, stale = list(changed), list(stale)
+    if np is not None and (changed or stale):
+        transaction.on_commit(lambda: _enqueue(changed, stale))
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Lookup
+# ─────────────────────────────────────────────────────────────────────
+
+def recommended_products(product, catalog, limit=3):
+    """Catalogue records of ``product``'s nearest neighbours, topped up with
+    other products of its category when fewer than ``limit`` are stored."""
+    from .models import ProductNeighbor
+
+    pks = ProductNeighbor.objects.filter(product_id=product.pk).values_list("neighbor_id", flat=True)[:limit]
+    records = [catalog.by_pk[pk] for pk in pks if pk in catalog.by_pk]
+    if len(records) < limit:
+        shown = {record.pk for record in records}
+        siblings = catalog.related(product.pk, product.category_id, limit)
+        records += [record for record in siblings if record.pk not in shown][:limit - len(records)]
+    return records
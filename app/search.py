@@ -0,0 +1,499 @@
+"""
+Site search – an inverted index over products, articles and insights.
+
+Every searchable item is flattened into a ``Document`` with three weighted
+fields (title, keywords, body) of normalised text.  Two interchangeable
+backends index those documents:
+
+* ``Fts5Backend`` – an SQLite FTS5 virtual table ranked with ``bm25()``;
+  used when the default database is SQLite with FTS5 compiled in.
+* ``MemoryBackend`` – a per-process inverted index with BM25F scoring, for
+  every other database.  Each write is logged in ``SearchChange``; when the
+  shared ``search`` generation moves, a worker re-reads just the documents
+  logged since its last look and swaps in an updated copy of its index
+  (untouched postings are shared, so readers need no lock).
+
+Both are updated one document at a time from signal handlers (see
+``app.signals``) and share the same tokeniser, so queries behave the same.
+Queries are AND-ed term lists; the last term also matches as a prefix.
+Result lists are cached under the ``search`` generation, which every index
+write bumps.
+"""
+
+import hashlib
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict, namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from .cache import bump_generation, get_generation
+from .insights_data import INSIGHTS
+
+FIELD_WEIGHTS = {"title": 10.0, "keywords": 5.0, "body": 1.0}
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_PREFIX_EXPANSIONS = 50
+SUMMARY_LENGTH = 220
+
+RESULTS_KEY = "vcp:search:{}:{}"
+RESULTS_TIMEOUT = 60 * 15
+
+# Changes re-read on every refresh, covering writes that committed out of
+# order; a worker that has not looked for longer than the log is kept
+# rebuilds its index from scratch.
+CHANGE_OVERLAP = timedelta(seconds=30)
+CHANGE_RETENTION = timedelta(days=1)
+
+SEARCH_TABLE = "app_search_fts"
+SEARCH_STATE_TABLE = "app_search_state"
+
+# Document ids: one id space for all kinds so both backends can use them as rowids.
+KINDS = {"product": 0, "article": 1, "insight": 2}
+KIND_COUNT = len(KINDS)
+
+Document = namedtuple("Document", "id kind title url summary fields")
+Result = namedtuple("Result", "kind title url summary score")
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def normalize(text):
+    """Lower-case, fold compatibility forms (H₂S → h2s) and strip accents."""
+    text = unicodedata.normalize("NFKD", text or "")
+    return "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(normalize(text))
+
+
+def document_id(kind, key):
+    return key * KIND_COUNT + KINDS[kind]
+
+
+def _summary(text):
+    text = " ".join((text or "").split())
+    if len(text) <= SUMMARY_LENGTH:
+        return text
+    return text[:SUMMARY_LENGTH].rsplit(" ", 1)[0] + "…"
+
+
+def _fields(title, keywords, body):
+    return {
+        "title": normalize(title),
+        "keywords": normalize(" ".join(k for k in keywords if k)),
+        "body": normalize(" ".join(b for b in body if b)),
+    }
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Documents
+# ─────────────────────────────────────────────────────────────────────
+
+def product_document(product):
+    return Document(
+        document_id("product", product.pk), "product", product.name,
+        reverse("product_detail", kwargs={"slug": product.slug}),
+        _summary(product.description),
+        _fields(
+            product.name,
+            [product.brand_name, product.common_names, product.cas_number, product.sku,
+             product.category.label],
+            [product.description, product.primary_applications],
+        ),
+    )
+
+
+def article_document(article):
+    return Document(
+        document_id("article", article.pk), "article", article.title,
+        reverse("article_detail", kwargs={"slug": article.slug}),
+        _summary(article.short_summary or article.content),
+        _fields(article.title, [article.meta_keywords], [article.short_summary, article.content]),
+    )
+
+
+def insight_document(item):
+    return Document(
+        document_id("insight", item["number"]), "insight", item["title"],
+        reverse("insight_detail", kwargs={"slug": item["slug"]}),
+        _summary(item["meta_description"]),
+        _fields(item["title"], item["tags"], item["paragraphs"]),
+    )
+
+
+def iter_documents(doc_ids=None):
+    """Every searchable document, or only those among ``doc_ids`` that exist."""
+    from .models import Product, ProductArticle
+
+    products = Product.objects.select_related("category")
+    articles = ProductArticle.objects.filter(is_published=True)
+    insights = INSIGHTS
+    if doc_ids is not None:
+        keys = defaultdict(list)
+        for doc_id in doc_ids:
+            keys[doc_id % KIND_COUNT].append(doc_id // KIND_COUNT)
+        products = products.filter(pk__in=keys[KINDS["product"]])
+        articles = articles.filter(pk__in=keys[KINDS["article"]])
+        insights = [item for item in INSIGHTS if item["number"] in keys[KINDS["insight"]]]
+    for product in products.iterator(chunk_size=2000):
+        yield product_document(product)
+    for article in articles.iterator(chunk_size=500):
+        yield article_document(article)
+    for item in insights:
+        yield insight_document(item)
+
+
+def _match_terms(query):
+    """Split ``query`` into tokens; returns (terms, last_is_prefix)."""
+    terms = tokenize(query)[:10]
+    # A trailing space means the last word is complete.
+    return terms, bool(terms) and not query[-1:].isspace()
+
+
+# ─────────────────────────────────────────────────────────────────────
+# In-memory backend
+# ─────────────────────────────────────────────────────────────────────
+
+class InvertedIndex:
+    """Postings of weighted term frequencies with BM25F ranking.
+
+    ``add`` and ``remove`` are for building; an index that is being searched
+    is changed through ``updated``, which leaves it untouched.
+    """
+
+    def __init__(self):
+        self.postings = defaultdict(dict)   # term → {doc id: weighted tf}
+        self.documents = {}                 # doc id → (Document, weighted length, terms)
+        self.total_length = 0.0
+        self._vocabulary = None             # sorted terms, rebuilt lazily for prefixes
+        self._copied = None                 # terms whose postings this copy owns (None: all)
+
+    def updated(self, documents=(), removed=()):
+        """A copy with ``documents`` (re)added and the ids ``removed`` dropped.
+
+        Only the postings of the terms involved are copied; the rest are
+        shared with this index, which is never modified.
+        """
+        index = InvertedIndex()
+        index.postings = defaultdict(dict, self.postings)
+        index.documents = dict(self.documents)
+        index.total_length = self.total_length
+        index._vocabulary = self._vocabulary
+        index._copied = set()
+        for doc_id in removed:
+            index.remove(doc_id)
+        for document in documents:
+            index.add(document)
+        index._copied = None
+        return index
+
+    def _own(self, term):
+        if self._copied is not None and term not in self._copied:
+            self._copied.add(term)
+            if term in self.postings:
+                self.postings[term] = dict(self.postings[term])
+        return self.postings[term]
+
+    def add(self, document):
+        self.remove(document.id)
+        counts = defaultdict(float)
+        for field, text in document.fields.items():
+            weight = FIELD_WEIGHTS[field]
+            for term in TOKEN_RE.findall(text):
+                counts[term] += weight
+        for term, tf in counts.items():
+            if term not in self.postings:
+                self._vocabulary = None
+            self._own(term)[document.id] = tf
+        length = sum(counts.values())
+        self.documents[document.id] = (document, length, tuple(counts))
+        self.total_length += length
+
+    def remove(self, doc_id):
+        entry = self.documents.pop(doc_id, None)
+        if entry is None:
+            return
+        _, length, terms = entry
+        self.total_length -= length
+        for term in terms:
+            postings = self._own(term)
+            postings.pop(doc_id, None)
+            if not postings:
+                del self.postings[term]
+                self._vocabulary = None
+
+    def _expand(self, prefix):
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.postings)
+        vocabulary = self._vocabulary
+        start = bisect_left(vocabulary, prefix)
+        matches = []
+        for term in vocabulary[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not term.startswith(prefix):
+                break
+            matches.append(term)
+        return matches
+
+    def search(self, query, limit=20):
+        terms, prefix = _match_terms(query)
+        if not terms or not self.documents:
+            return []
+        groups = [[t] for t in terms[:-1]] + [self._expand(terms[-1]) if prefix else [terms[-1]]]
+        groups = [[t for t in group if t in self.postings] for group in groups]
+        if not all(groups):
+            return []
+
+        count = len(self.documents)
+        average = self.total_length / count
+        # Every group must match: start from the rarest group and filter the
+        # candidates by membership, so common terms are never scanned in full.
+        groups.sort(key=lambda group: sum(len(self.postings[t]) for t in group))
+        candidates = set().union(*(self.postings[t].keys() for t in groups[0]))
+        for group in groups[1:]:
+            lists = [self.postings[t] for t in group]
+            candidates = {d for d in candidates if any(d in postings for postings in lists)}
+            if not candidates:
+                return []
+
+        norms = {
+            d: BM25_K1 * (1 - BM25_B + BM25_B * self.documents[d][1] / average)
+            for d in candidates
+        }
+        scores = dict.fromkeys(candidates, 0.0)
+        for group in groups:
+            for term in group:
+                postings = self.postings[term]
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id in candidates:
+                    tf = postings.get(doc_id)
+                    if tf:
+                        scores[doc_id] += idf * tf * (BM25_K1 + 1) / (tf + norms[doc_id])
+
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [
+            Result(doc.kind, doc.title, doc.url, doc.summary, score)
+            for doc, score in ((self.documents[i][0], s) for i, s in best)
+        ]
+
+
+class MemoryBackend:
+    name = "memory"
+
+    def __init__(self):
+        self._state = None  # (generation, changes applied up to, InvertedIndex)
+        self._lock = threading.Lock()
+
+    def _current(self):
+        generation = get_generation("search")
+        state = self._state
+        if state is not None and state[0] == generation:
+            return state[2]
+        # One thread catches up; the others keep searching the previous copy.
+        if not self._lock.acquire(blocking=state is None):
+            return state[2]
+        try:
+            state = self._state
+            if state is None or state[0] != generation:
+                self._state = self._refreshed(state, generation)
+            return self._state[2]
+        finally:
+            self._lock.release()
+
+    def _refreshed(self, state, generation):
+        from .models import SearchChange
+
+        started = timezone.now()
+        if state is None or state[1] < started - CHANGE_RETENTION:
+            index = InvertedIndex()
+            for document in iter_documents():
+                index.add(document)
+            return generation, started, index
+        changes = SearchChange.objects.filter(created_at__gte=state[1] - CHANGE_OVERLAP)
+        doc_ids = set(changes.values_list("doc_id", flat=True))
+        documents = list(iter_documents(doc_ids))
+        # Logged ids that no longer load were deleted (or unpublished).
+        removed = doc_ids - {document.id for document in documents}
+        return generation, started, state[2].updated(documents, removed)
+
+    def search(self, query, limit=20):
+        return self._current().search(query, limit)
+
+    def update(self, doc_id, document):
+        from .models import SearchChange
+
+        SearchChange.objects.create(doc_id=document.id if document is not None else doc_id)
+        SearchChange.objects.filter(created_at__lt=timezone.now() - CHANGE_RETENTION).delete()
+        bump_generation("search")
+
+    def rebuild(self):
+        self._state = None
+        bump_generation("search")
+
+
+# ─────────────────────────────────────────────────────────────────────
+# SQLite FTS5 backend
+# ─────────────────────────────────────────────────────────────────────
+
+class Fts5Backend:
+    """Documents live in an FTS5 table whose rowid is the document id."""
+
+    name = "fts5"
+
+    def __init__(self):
+        self._checked = False
+
+    def _ensure(self):
+        """Fill the table on first use, and re-index insights after deploys."""
+        if self._checked:
+            return
+        from .conditional import INSIGHTS_DIGEST
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT value FROM {SEARCH_STATE_TABLE} WHERE name = 'insights'")
+            row = cursor.fetchone()
+        if row is None:
+            self.rebuild()
+        elif row[0] != INSIGHTS_DIGEST:
+            with transaction.atomic():
+                for item in INSIGHTS:
+                    self.update(None, insight_document(item))
+                self._set_state("insights", INSIGHTS_DIGEST)
+        self._checked = True
+
+    def _set_state(self, name, value):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT OR REPLACE INTO {SEARCH_STATE_TABLE} (name, value) VALUES (%s, %s)",
+                [name, value],
+            )
+
+    def search(self, query, limit=20):
+        terms, prefix = _match_terms(query)
+        if not terms:
+            return []
+        self._ensure()
+        # Tokens are \w+ only, so quoting them is always safe.
+        match = " AND ".join(f'"{t}"' for t in terms)
+        if prefix:
+            match += "*"
+        weights = ", ".join(str(w) for w in FIELD_WEIGHTS.values())
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT kind, display_title, url, summary, bm25({SEARCH_TABLE}, {weights}) AS score "
+                f"FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s ORDER BY score LIMIT %s",
+                [match, limit],
+            )
+            # bm25() is negative – lower is better.
+            return [Result(kind, title, url, summary, -score) for kind, title, url, summary, score in cursor]
+
+    def update(self, doc_id, document):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s",
+                [document.id if document is not None else doc_id],
+            )
+            if document is not None:
+                cursor.execute(
+                    f"INSERT INTO {SEARCH_TABLE} "
+                    "(rowid, title, keywords, body, kind, display_title, url, summary) "
+                    "VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+                    [document.id, document.fields["title"], document.fields["keywords"],
+                     document.fields["body"], document.kind, document.title, document.url,
+                     document.summary],
+                )
+        bump_generation("search")
+
+    def rebuild(self):
+        from .conditional import INSIGHTS_DIGEST
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+            batch = []
+            for document in iter_documents():
+                batch.append([
+                    document.id, document.fields["title"], document.fields["keywords"],
+                    document.fields["body"], document.kind, document.title, document.url,
+                    document.summary,
+                ])
+                if len(batch) >= 1000:
+                    self._insert_many(cursor, batch)
+                    batch = []
+            if batch:
+                self._insert_many(cursor, batch)
+            cursor.execute(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('optimize')")
+            self._set_state("insights", INSIGHTS_DIGEST)
+        self._checked = True
+        bump_generation("search")
+
+    @staticmethod
+    def _insert_many(cursor, rows):
+        cursor.executemany(
+            f"INSERT INTO {SEARCH_TABLE} "
+            "(rowid, title, keywords, body, kind, display_title, url, summary) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+            rows,
+        )
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Public API
+# ─────────────────────────────────────────────────────────────────────
+
+_backend = None
+
+
+def fts5_table_exists():
+    return connection.vendor == "sqlite" and SEARCH_TABLE in connection.introspection.table_names()
+
+
+def get_backend():
+    """FTS5 when its table exists, otherwise the in-memory index.
+
+    ``settings.SEARCH_BACKEND`` ("fts5" / "memory") overrides the choice.
+    """
+    global _backend
+    if _backend is None:
+        choice = getattr(settings, "SEARCH_BACKEND", None)
+        if choice is None:
+            choice = "fts5" if fts5_table_exists() else "memory"
+        _backend = Fts5Backend() if choice == "fts5" else MemoryBackend()
+    return _backend
+
+
+def site_search(query, limit=20):
+    """Return up to ``limit`` ``Result`` tuples for ``query``, best first."""
+    query = (query or "")[:200]
+    terms, prefix = _match_terms(query)
+    if not terms:
+        return []
+    signature = f"{' '.join(terms)}|{prefix}|{limit}"
+    key = RESULTS_KEY.format(get_generation("search"), hashlib.md5(signature.encode()).hexdigest())
+    results = cache.get(key)
+    if results is None:
+        results = get_backend().search(query, limit)
+        cache.set(key, results, RESULTS_TIMEOUT)
+    return results
+
+
+def index_document(document):
+    get_backend().update(document.id, document)
+
+
+def unindex_document(kind, key):
+    get_backend().update(document_id(kind, key), None)
+
+
+def rebuild_index():
+    get_backend().rebuild()
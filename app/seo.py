@@ -1,17 +1,42 @@
 """
-SEO helpers – robots.txt and dynamic XML sitemap for Google / Bing crawlers.
+SEO helpers – robots.txt and a sharded XML sitemap for Google / Bing crawlers.
+
+``/sitemap.xml`` is a sitemap index pointing at one shard per content type
+and page (``/sitemap-<section>-<page>.xml``).  Database-backed sections are
+sharded by primary-key range, so a saved row maps straight to the one shard
+that lists it, and ``lastmod`` comes from the rows' ``updated_at``.
+
+Shards are streamed from a generator on first request and a gzip copy is kept
+in the cache under a per-shard generation number; signal handlers bump only
+the shard (and the index) whose content changed.
 """
 
-from datetime import date
+import gzip
+import zlib
 from xml.sax.saxutils import escape
 
-from django.http import HttpResponse
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.urls import reverse
-from .models import Product, ProductArticle
+from django.utils.cache import patch_vary_headers
+
+from .cache import bump_generation, get_generation
 from .insights_data import INSIGHTS
+from .models import Product, ProductArticle
 
 DOMAIN = "https://vasudevchemopharma.com"
 
+# Protocol limit is 50,000 URLs per file.
+SITEMAP_PAGE_SIZE = getattr(settings, "SITEMAP_PAGE_SIZE", 50000)
+SITEMAP_TIMEOUT = 60 * 60 * 24 * 7
+SITEMAP_KEY = "vcp:sitemap:{}:{}"
+
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+URLSET_OPEN = '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+URLSET_CLOSE = "</urlset>\n"
+
 
 def robots_txt(request):
     """Serve robots.txt as plain text."""
@@ -28,72 +53,266 @@ def robots_txt(request):
     return HttpResponse("\n".join(lines), content_type="text/plain; charset=utf-8")
 
 
-def sitemap_xml(request):
-    """Generate a dynamic XML sitemap containing every public URL."""
+def _url_entry(loc, lastmod=None, changefreq=None, priority=None):
+    parts = [f"  <url>\n    <loc>{escape(DOMAIN + loc)}</loc>\n"]
+    if lastmod:
+        parts.append(f"    <lastmod>{lastmod.date().isoformat()}</lastmod>\n")
+    if changefreq:
+        parts.append(f"    <changefreq>{changefreq}</changefreq>\n")
+    if priority:
+        parts.append(f"    <priority>{priority}</priority>\n")
+    parts.append("  </url>\n")
+    return "".join(parts)
 
-    today = date.today().isoformat()
 
-    urls = []
+# ─────────────────────────────────────────────────────────────────────
+# Sections
+# ─────────────────────────────────────────────────────────────────────
 
-    # ── Static pages ──────────────────────────────────────────────────
-    static_pages = [
-        {"loc": "/", "changefreq": "weekly", "priority": "1.0"},
-        {"loc": "/aboutus/", "changefreq": "monthly", "priority": "0.8"},
-        {"loc": "/ourservices/", "changefreq": "monthly", "priority": "0.8"},
-        {"loc": "/products/", "changefreq": "weekly", "priority": "0.9"},
-        {"loc": "/insights/", "changefreq": "weekly", "priority": "0.8"},
-        {"loc": "/articles/", "changefreq": "weekly", "priority": "0.7"},
-    ]
-    for page in static_pages:
-        urls.append(
-            f"  <url>\n"
-            f"    <loc>{DOMAIN}{page['loc']}</loc>\n"
-            f"    <lastmod>{today}</lastmod>\n"
-            f"    <changefreq>{page['changefreq']}</changefreq>\n"
-            f"    <priority>{page['priority']}</priority>\n"
-            f"  </url>"
-        )
+class SitemapSection:
+    """A content type listed in the sitemap, split into numbered shards."""
 
-    # ── Product detail pages (from database) ──────────────────────────
-    for slug in Product.objects.values_list("slug", flat=True):
-        loc = escape(f"{DOMAIN}/products/{slug}/")
-        urls.append(
-            f"  <url>\n"
-            f"    <loc>{loc}</loc>\n"
-            f"    <lastmod>{today}</lastmod>\n"
-            f"    <changefreq>weekly</changefreq>\n"
-            f"    <priority>0.8</priority>\n"
-            f"  </url>"
-        )
+    name = None
+    changefreq = "weekly"
+    priority = "0.7"
 
-    # ── Article detail pages (from database) ────────────────────────
-    for slug in ProductArticle.objects.filter(is_published=True).values_list("slug", flat=True):
-        loc = escape(f"{DOMAIN}/articles/{slug}/")
-        urls.append(
-            f"  <url>\n"
-            f"    <loc>{loc}</loc>\n"
-            f"    <lastmod>{today}</lastmod>\n"
-            f"    <changefreq>weekly</changefreq>\n"
-            f"    <priority>0.7</priority>\n"
-            f"  </url>"
-        )
+    def shard_count(self):
+        return 1
+
+    def entries(self, page):
+        """Yield ``(path, lastmod)`` tuples for shard ``page`` (1-based)."""
+        raise NotImplementedError
+
+    def lastmod(self, page):
+        return None
+
+    def shard_for(self, pk):
+        return 1
+
+    def iter_xml(self, page):
+        yield XML_HEADER + URLSET_OPEN
+        for path, lastmod in self.entries(page):
+            yield _url_entry(path, lastmod, self.changefreq, self.priority)
+        yield URLSET_CLOSE
+
+
+class ModelSection(SitemapSection):
+    """Rows sharded by primary-key range: shard N holds pks in ((N-1)·size, N·size]."""
 
-    # ── Insight articles (from static data) ───────────────────────────
-    for article in INSIGHTS:
-        loc = escape(f"{DOMAIN}/insights/{article['slug']}/")
-        urls.append(
-            f"  <url>\n"
-            f"    <loc>{loc}</loc>\n"
-            f"    <lastmod>{today}</lastmod>\n"
-            f"    <changefreq>monthly</changefreq>\n"
-            f"    <priority>0.7</priority>\n"
-            f"  </url>"
+    model = None
+    url_name = None
+
+    def queryset(self):
+        return self.model.objects.all()
+
+    def _range(self, page):
+        return self.queryset().filter(
+            pk__gt=(page - 1) * SITEMAP_PAGE_SIZE, pk__lte=page * SITEMAP_PAGE_SIZE,
         )
 
-    xml = (
-        '<?xml version="1.0" encoding="UTF-8"?>\n'
-        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
-        + "\n".join(urls)
-        + "\n</urlset>\n"
+    def shard_count(self):
+        highest = self.queryset().aggregate(top=Max("pk"))["top"] or 0
+        return max(1, -(-highest // SITEMAP_PAGE_SIZE))
+
+    def shard_for(self, pk):
+        return (pk - 1) // SITEMAP_PAGE_SIZE + 1
+
+    def entries(self, page):
+        rows = self._range(page).order_by("pk").values_list("slug", "updated_at")
+        for slug, updated_at in rows.iterator(chunk_size=2000):
+            yield reverse(self.url_name, kwargs={"slug": slug}), updated_at
+
+    def lastmod(self, page):
+        return self._range(page).aggregate(latest=Max("updated_at"))["latest"]
+
+
+class ProductSection(ModelSection):
+    name = "products"
+    model = Product
+    url_name = "product_detail"
+    priority = "0.8"
+
+
+class ArticleSection(ModelSection):
+    name = "articles"
+    model = ProductArticle
+    url_name = "article_detail"
+
+    def queryset(self):
+        return ProductArticle.objects.filter(is_published=True)
+
+
+class InsightSection(SitemapSection):
+    name = "insights"
+    changefreq = "monthly"
+
+    def entries(self, page):
+        # Static data without dates – lastmod is omitted rather than invented.
+        for article in INSIGHTS:
+            yield f"/insights/{article['slug']}/", None
+
+
+class PageSection(SitemapSection):
+    name = "pages"
+
+    PAGES = [
+        ("/", "weekly", "1.0"),
+        ("/aboutus/", "monthly", "0.8"),
+        ("/ourservices/", "monthly", "0.8"),
+        ("/products/", "weekly", "0.9"),
+        ("/insights/", "weekly", "0.8"),
+        ("/articles/", "weekly", "0.7"),
+    ]
+
+    def _lastmods(self):
+        from .cache import get_company_details
+
+        company = get_company_details().updated_at
+        products = Product.objects.aggregate(latest=Max("updated_at"))["latest"]
+        articles = ProductArticle.objects.filter(is_published=True).aggregate(latest=Max("updated_at"))["latest"]
+        return {
+            "/": company,
+            "/aboutus/": company,
+            "/ourservices/": company,
+            "/products/": max(filter(None, (products, company)), default=None),
+            "/insights/": company,
+            "/articles/": max(filter(None, (articles, company)), default=None),
+        }
+
+    def entries(self, page):
+        lastmods = self._lastmods()
+        for path, _, _ in self.PAGES:
+            yield path, lastmods.get(path)
+
+    def iter_xml(self, page):
+        lastmods = self._lastmods()
+        yield XML_HEADER + URLSET_OPEN
+        for path, changefreq, priority in self.PAGES:
+            yield _url_entry(path, lastmods.get(path), changefreq, priority)
+        yield URLSET_CLOSE
+
+    def lastmod(self, page):
+        return max(filter(None, self._lastmods().values()), default=None)
+
+
+SECTIONS = {section.name: section for section in (
+    PageSection(), ProductSection(), ArticleSection(), InsightSection(),
+)}
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Generations & cache
+# ─────────────────────────────────────────────────────────────────────
+
+def _shard_generation(section, page):
+    return get_generation(f"sitemap:{section}:{page}")
+
+
+def invalidate_shard(section, pk=None):
+    """Expire the shard of ``section`` holding ``pk`` (and the index)."""
+    page = SECTIONS[section].shard_for(pk) if pk is not None else 1
+    bump_generation(f"sitemap:{section}:{page}")
+    bump_generation("sitemap:index")
+
+
+def shard_path(section, page):
+    return reverse("sitemap_shard", kwargs={"section": section, "page": page})
+
+
+def sitemap_paths_for(section, pk):
+    """Sitemap files that list the ``section`` row ``pk``: index, its shard, pages."""
+    return {
+        reverse("sitemap_xml"),
+        shard_path(section, SECTIONS[section].shard_for(pk)),
+        shard_path("pages", 1),
+    }
+
+
+def sitemap_paths():
+    """Every sitemap file: the index followed by all shards."""
+    paths = [reverse("sitemap_xml")]
+    for name, section in SECTIONS.items():
+        paths.extend(shard_path(name, page) for page in range(1, section.shard_count() + 1))
+    return paths
+
+
+def iter_public_paths():
+    """Yield every public page path listed across all sitemap shards."""
+    for section in SECTIONS.values():
+        for page in range(1, section.shard_count() + 1):
+            for path, _ in section.entries(page):
+                yield path
+
+
+def _cached_response(request, key):
+    """Return the stored gzip copy at ``key`` as a response, or None."""
+    body = cache.get(key)
+    if body is None:
+        return None
+    accepts_gzip = "gzip" in request.META.get("HTTP_ACCEPT_ENCODING", "")
+    response = HttpResponse(
+        body if accepts_gzip else gzip.decompress(body),
+        content_type="application/xml; charset=utf-8",
     )
-    return HttpResponse(xml, content_type="application/xml; charset=utf-8")
+    if accepts_gzip:
+        response["Content-Encoding"] = "gzip"
+    patch_vary_headers(response, ("Accept-Encoding",))
+    return response
+
+
+def _streaming_response(key, chunks):
+    """Stream ``chunks`` to the client while compressing them.
+
+    The finished gzip body is stored at ``key`` once the generator is exhausted.
+    """
+    def stream():
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # 31 → gzip container
+        parts = []
+        for chunk in chunks:
+            data = chunk.encode()
+            parts.append(compressor.compress(data))
+            yield data
+        parts.append(compressor.flush())
+        cache.set(key, b"".join(parts), SITEMAP_TIMEOUT)
+
+    response = StreamingHttpResponse(stream(), content_type="application/xml; charset=utf-8")
+    patch_vary_headers(response, ("Accept-Encoding",))
+    return response
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Views
+# ─────────────────────────────────────────────────────────────────────
+
+def _iter_index():
+    yield XML_HEADER
+    yield '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+    for name, section in SECTIONS.items():
+        for page in range(1, section.shard_count() + 1):
+            lastmod = section.lastmod(page)
+            yield "  <sitemap>\n"
+            yield f"    <loc>{escape(DOMAIN + shard_path(name, page))}</loc>\n"
+            if lastmod:
+                yield f"    <lastmod>{lastmod.date().isoformat()}</lastmod>\n"
+            yield "  </sitemap>\n"
+    yield "</sitemapindex>\n"
+
+
+def sitemap_xml(request):
+    """Sitemap index listing every shard with its latest modification date."""
+    key = SITEMAP_KEY.format("index", get_generation("sitemap:index"))
+    return _cached_response(request, key) or _streaming_response(key, _iter_index())
+
+
+def sitemap_shard(request, section, page):
+    """One shard of ``section`` – at most SITEMAP_PAGE_SIZE URLs."""
+    sitemap = SECTIONS.get(section)
+    if sitemap is None or page < 1:
+        raise Http404("No such sitemap")
+    key = SITEMAP_KEY.format(f"{section}:{page}", _shard_generation(section, page))
+    response = _cached_response(request, key)
+    if response is not None:
+        return response
+    if page > sitemap.shard_count():
+        raise Http404("No such sitemap")
+    return _streaming_response(key, sitemap.iter_xml(page))
@@ -0,0 +1,328 @@
+"""
+Signal handlers that keep cached data in step with the database.
+"""
+
+from django.db import transaction
+from django.utils import timezone
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import recommend, search
+from .autocomplete import invalidate_autocomplete
+from .cache import invalidate_company_details
+from .catalog import CATEGORY_FIELDS, invalidate_catalog
+from .fuzzy import invalidate_fuzzy
+from .images import record_missing_metadata, remove_derivatives, schedule_derivatives, source_names
+from .models import (
+    CARD_FIELDS, CompanyDetails, Product, ProductArticle, ProductCategory, ProductDocument,
+    ProductFAQ, ProductImage, ProductNeighbor, ProductPricingTier, ProductSpec,
+)
+from .page_cache import invalidate_pages
+from .seo import invalidate_shard
+from .static_export import (
+    export_root, paths_for_article, paths_for_category, paths_for_product,
+    schedule_regeneration,
+)
+from .storage import invalidate_file_fields
+
+# Every model whose rows end up on a public page.
+CONTENT_MODELS = (
+    ProductCategory, Product, ProductSpec, ProductImage, ProductDocument,
+    ProductFAQ, ProductPricingTier, ProductArticle, CompanyDetails,
+)
+
+
+def _invalidate(func):
+    """Run ``func`` now and again once the surrounding transaction commits.
+
+    The second call discards anything a concurrent request cached from the
+    pre-commit state of the row.
+    """
+    func()
+    transaction.on_commit(func)
+
+
+@receiver([post_save, post_delete], sender=CompanyDetails)
+def company_details_changed(sender, instance, **kwargs):
+    _invalidate(invalidate_company_details)
+
+
+@receiver([post_save, post_delete], sender=CompanyDetails)
+@receiver([post_save, post_delete], sender=ProductImage)
+@receiver([post_save, post_delete], sender=ProductDocument)
+def file_fields_changed(sender, instance, **kwargs):
+    invalidate_file_fields(instance)
+
+
+def content_changed(sender, instance, **kwargs):
+    _invalidate(invalidate_pages)
+
+
+for _model in CONTENT_MODELS:
+    post_save.connect(content_changed, sender=_model, dispatch_uid=f"content_changed_save_{_model.__name__}")
+    post_delete.connect(content_changed, sender=_model, dispatch_uid=f"content_changed_delete_{_model.__name__}")
+
+
+@receiver(m2m_changed, sender=ProductArticle.promoted_products.through)
+def promoted_products_changed(sender, instance, action, pk_set=None, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    _invalidate(invalidate_pages)
+    # Keep the articles' ETags / Last-Modified in step with their promotions.
+    if isinstance(instance, ProductArticle):
+        article_ids = [instance.pk]
+    else:
+        article_ids = pk_set or []
+    if article_ids:
+        ProductArticle.objects.filter(pk__in=article_ids).update(updated_at=timezone.now())
+        for article_id in article_ids:
+            invalidate_shard("articles", article_id)
+
+
+# ── Catalogue snapshot ────────────────────────────────────────────────
+
+CATALOG_FIELDS = {Product: CARD_FIELDS, ProductCategory: CATEGORY_FIELDS}
+
+
+@receiver(pre_save, sender=Product)
+@receiver(pre_save, sender=ProductCategory)
+def remember_catalog_state(sender, instance, **kwargs):
+    if instance.pk is not None:
+        rows = sender.objects.filter(pk=instance.pk).values_list(*CATALOG_FIELDS[sender])
+        instance._catalog_previous = rows.first()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=ProductCategory)
+def catalog_fields_saved(sender, instance, created, **kwargs):
+    # Only the columns the snapshot copies; SEO or safety edits keep it.
+    current = tuple(getattr(instance, field) for field in CATALOG_FIELDS[sender])
+    if created or getattr(instance, "_catalog_previous", None) != current:
+        _invalidate(invalidate_catalog)
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=ProductCategory)
+@receiver([post_save, post_delete], sender=ProductSpec)
+@receiver([post_save, post_delete], sender=ProductImage)
+def catalog_rows_changed(sender, instance, **kwargs):
+    _invalidate(invalidate_catalog)
+
+
+@receiver(m2m_changed, sender=ProductArticle.promoted_products.through)
+def catalog_promotions_changed(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        _invalidate(invalidate_catalog)
+
+
+# ── updated_at propagation ────────────────────────────────────────────
+
+def touch_product(sender, instance, **kwargs):
+    """Inline rows (specs, images, …) count as changes to their product."""
+    Product.objects.filter(pk=instance.product_id).update(updated_at=timezone.now())
+    invalidate_shard("products", instance.product_id)
+
+
+for _model in (ProductSpec, ProductImage, ProductDocument, ProductFAQ, ProductPricingTier):
+    post_save.connect(touch_product, sender=_model, dispatch_uid=f"touch_product_save_{_model.__name__}")
+    post_delete.connect(touch_product, sender=_model, dispatch_uid=f"touch_product_delete_{_model.__name__}")
+
+
+# ── Image derivatives ─────────────────────────────────────────────────
+
+IMAGE_MODELS = (ProductImage, Product, ProductArticle, CompanyDetails)
+
+
+def image_fields_saved(sender, instance, **kwargs):
+    names = source_names(instance)
+    # Dimensions and placeholder are cheap – record them with the save so the
+    # very next render is dimensioned.  Derivatives are encoded afterwards;
+    # unchanged uploads are skipped by their content hash.
+    record_missing_metadata(names)
+    schedule_derivatives(names)
+
+
+def image_fields_deleted(sender, instance, **kwargs):
+    names = source_names(instance)
+    if names:
+        transaction.on_commit(lambda: remove_derivatives(names))
+
+
+for _model in IMAGE_MODELS:
+    post_save.connect(image_fields_saved, sender=_model, dispatch_uid=f"image_fields_saved_{_model.__name__}")
+    post_delete.connect(image_fields_deleted, sender=_model, dispatch_uid=f"image_fields_deleted_{_model.__name__}")
+
+
+# ── Search index ──────────────────────────────────────────────────────
+# Documents are built now (from the saved row) and written after commit.
+
+@receiver(post_save, sender=Product)
+def product_search_changed(sender, instance, **kwargs):
+    document = search.product_document(instance)
+    transaction.on_commit(lambda: search.index_document(document))
+
+
+@receiver(post_delete, sender=Product)
+def product_search_deleted(sender, instance, **kwargs):
+    pk = instance.pk  # cleared by Django once the delete finishes
+    transaction.on_commit(lambda: search.unindex_document("product", pk))
+
+
+@receiver(post_save, sender=ProductArticle)
+def article_search_changed(sender, instance, **kwargs):
+    if instance.is_published:
+        document = search.article_document(instance)
+        transaction.on_commit(lambda: search.index_document(document))
+    else:
+        pk = instance.pk
+        transaction.on_commit(lambda: search.unindex_document("article", pk))
+
+
+@receiver(post_delete, sender=ProductArticle)
+def article_search_deleted(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: search.unindex_document("article", pk))
+
+
+@receiver([post_save, post_delete], sender=Product)
+def product_names_changed(sender, instance, **kwargs):
+    # Both in-memory name indexes are rebuilt lazily on their next lookup.
+    _invalidate(invalidate_autocomplete)
+    _invalidate(invalidate_fuzzy)
+
+
+@receiver(post_save, sender=ProductCategory)
+def category_search_changed(sender, instance, **kwargs):
+    # The category label is indexed with each of its products.
+    documents = [search.product_document(p) for p in instance.products.select_related("category")]
+
+    def reindex():
+        for document in documents:
+            search.index_document(document)
+
+    transaction.on_commit(reindex)
+
+
+# ── Related-product neighbours ────────────────────────────────────────
+
+@receiver(post_save, sender=Product)
+def product_neighbors_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        recommend.schedule_refresh(changed=[instance.pk])
+
+
+@receiver(pre_delete, sender=Product)
+def product_neighbors_deleted(sender, instance, **kwargs):
+    # pre_delete: the rows naming it are cascaded away with the product.
+    listed_by = ProductNeighbor.objects.filter(neighbor=instance).values_list("product_id", flat=True)
+    recommend.schedule_refresh(stale=[pk for pk in listed_by if pk != instance.pk])
+
+
+@receiver([post_save, post_delete], sender=ProductSpec)
+def spec_neighbors_changed(sender, instance, **kwargs):
+    # Spec values are part of the product's feature vector.
+    recommend.schedule_refresh(changed=[instance.product_id])
+
+
+# ── Sitemap shards ────────────────────────────────────────────────────
+
+@receiver([post_save, post_delete], sender=Product)
+def product_sitemap_changed(sender, instance, **kwargs):
+    invalidate_shard("products", instance.pk)
+    invalidate_shard("pages")
+
+
+@receiver([post_save, post_delete], sender=ProductArticle)
+def article_sitemap_changed(sender, instance, **kwargs):
+    invalidate_shard("articles", instance.pk)
+    invalidate_shard("pages")
+
+
+@receiver([post_save, post_delete], sender=CompanyDetails)
+def company_sitemap_changed(sender, instance, **kwargs):
+    invalidate_shard("pages")
+
+
+# ── Incremental static-export regeneration ───────────────────────────
+
+INLINE_MODELS = (ProductSpec, ProductImage, ProductDocument, ProductFAQ, ProductPricingTier)
+
+
+@receiver(pre_save, sender=Product)
+@receiver(pre_save, sender=ProductArticle)
+def remember_export_state(sender, instance, **kwargs):
+    """Stash the pre-save slug (and category / published flag) for the export."""
+    if instance.pk is None or export_root() is None:
+        return
+    fields = ("slug", "category_id") if sender is Product else ("slug", "is_published")
+    instance._export_previous = sender.objects.filter(pk=instance.pk).values(*fields).first() or {}
+
+
+@receiver(post_save, sender=Product)
+def product_saved_export(sender, instance, **kwargs):
+    if export_root() is None:
+        return
+    previous = getattr(instance, "_export_previous", {})
+    schedule_regeneration(*paths_for_product(
+        instance, old_slug=previous.get("slug"), old_category_id=previous.get("category_id"),
+    ))
+
+
+@receiver(pre_delete, sender=Product)
+def product_deleted_export(sender, instance, **kwargs):
+    # pre_delete: article promotions are still linked at this point.
+    if export_root() is not None:
+        schedule_regeneration(*paths_for_product(instance, deleted=True))
+
+
+@receiver(post_save, sender=ProductArticle)
+def article_saved_export(sender, instance, **kwargs):
+    if export_root() is None:
+        return
+    previous = getattr(instance, "_export_previous", {})
+    schedule_regeneration(*paths_for_article(
+        instance, old_slug=previous.get("slug"), was_published=previous.get("is_published", False),
+    ))
+
+
+@receiver(post_delete, sender=ProductArticle)
+def article_deleted_export(sender, instance, **kwargs):
+    if export_root() is not None:
+        schedule_regeneration(*paths_for_article(instance, was_published=instance.is_published, deleted=True))
+
+
+@receiver(m2m_changed, sender=ProductArticle.promoted_products.through)
+def promotions_changed_export(sender, instance, action, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear") or export_root() is None:
+        return
+    if isinstance(instance, ProductArticle):
+        schedule_regeneration(*paths_for_article(instance))
+    else:
+        schedule_regeneration(*paths_for_product(instance))
+
+
+@receiver([post_save, post_delete], sender=ProductCategory)
+def category_changed_export(sender, instance, **kwargs):
+    if export_root() is not None:
+        schedule_regeneration(*paths_for_category(instance))
+
+
+@receiver([post_save, post_delete], sender=CompanyDetails)
+def company_changed_export(sender, instance, **kwargs):
+    schedule_regeneration(None)
+
+
+def inline_changed_export(sender, instance, **kwargs):
+    if export_root() is None:
+        return
+    try:
+        product = instance.product
+    except Product.DoesNotExist:
+        return  # cascading delete – handled by product_deleted_export
+    # Primary images also show on the related cards of sibling pages.
+    schedule_regeneration(*paths_for_product(product, related_rows=sender is ProductImage))
+
+
+for _model in INLINE_MODELS:
+    post_save.connect(inline_changed_export, sender=_model, dispatch_uid=f"export_save_{_model.__name__}")
+    post_delete.connect(inline_changed_export, sender=_model, dispatch_uid=f"export_delete_{_model.__name__}")
@@ -0,0 +1,129 @@
+"""
+Precomputed render snapshot of a product detail page.
+
+``product_detail.html`` used to re-evaluate the ``has_*`` section flags,
+re-split the multi-line text fields and walk ``product.specs.all`` several
+times per render, and to assemble its JSON-LD in the template.
+``get_snapshot`` does all of that once per product version: the result –
+flags, parsed lists, spec rows and the serialised JSON-LD – is one
+``ProductSnapshot`` cached under the product's ``updated_at``, which inline
+edits bump too (see ``app.signals``), so a stale snapshot is never read and
+nothing has to be deleted.
+
+Bump ``SNAPSHOT_VERSION`` whenever the snapshot's shape or contents change.
+"""
+
+import json
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
+
+from .ghs import safety_lookups
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_KEY = "vcp:snapshot:{}:{}:{}"
+SNAPSHOT_TIMEOUT = 60 * 60 * 24 * 7
+
+SITE_URL = "https://vasudevchemopharma.com"
+ORGANIZATION = {
+    "@type": "Organization",
+    "name": "Vasudev Chemo Pharma",
+    "url": SITE_URL,
+    "address": {
+        "@type": "PostalAddress",
+        "addressLocality": "Ankleshwar",
+        "addressRegion": "Gujarat",
+        "addressCountry": "IN",
+    },
+}
+
+Spec = namedtuple("Spec", "label value")
+ProductSnapshot = namedtuple("ProductSnapshot", [
+    # Section flags
+    "has_chemical_identification", "has_physical_properties", "has_specs", "has_specifications",
+    "has_safety_info", "has_application_info", "has_packaging_info",
+    # Parsed lists
+    "available_grades", "pack_sizes", "common_names", "hazard_statements",
+    "precautionary_statements", "hazard_pictograms", "seo_h2", "meta_keywords",
+    "specs",
+    # Serialised <script type="application/ld+json"> bodies ("" when absent)
+    "product_json_ld", "faq_json_ld",
+])
+
+# Same escaping as Django's json_script: the JSON cannot close the <script>.
+_JSON_SCRIPT_ESCAPES = {ord(">"): "\\u003E", ord("<"): "\\u003C", ord("&"): "\\u0026"}
+
+
+def _json_ld(data):
+    return json.dumps(data, ensure_ascii=False, indent=2).translate(_JSON_SCRIPT_ESCAPES)
+
+
+def _product_json_ld(product):
+    data = {
+        "@context": "https://schema.org",
+        "@type": "Product",
+        "name": product.name,
+        "description": product.meta_description_seo or product.description,
+        "url": f"{SITE_URL}{product.get_absolute_url()}",
+        "brand": {"@type": "Brand", "name": ORGANIZATION["name"]},
+        "manufacturer": ORGANIZATION,
+    }
+    if product.cas_number:
+        properties = [("CAS Number", product.cas_number), ("Molecular Formula", product.molecular_formula),
+                      ("Molecular Weight", product.molecular_weight)]
+        data["additionalProperty"] = [
+            {"@type": "PropertyValue", "name": name, "value": value} for name, value in properties if value
+        ]
+    return _json_ld(data)
+
+
+def _faq_json_ld(faqs):
+    if not faqs:
+        return ""
+    return _json_ld({
+        "@context": "https://schema.org",
+        "@type": "FAQPage",
+        "mainEntity": [
+            {"@type": "Question", "name": faq.question,
+             "acceptedAnswer": {"@type": "Answer", "text": faq.answer}}
+            for faq in faqs
+        ],
+    })
+
+
+def build_snapshot(product):
+    """Compute the ``ProductSnapshot`` of ``product`` (relations are prefetched as needed)."""
+    prefetch_related_objects([product], "specs", "faqs", *safety_lookups())
+    specs = [Spec(spec.label, spec.value) for spec in product.specs.all()]
+    chemical, physical = product.has_chemical_identification, product.has_physical_properties
+    return ProductSnapshot(
+        has_chemical_identification=chemical,
+        has_physical_properties=physical,
+        has_specs=bool(specs),
+        has_specifications=chemical or physical or bool(specs),
+        has_safety_info=product.has_safety_info,
+        has_application_info=product.has_application_info,
+        has_packaging_info=product.has_packaging_info,
+        available_grades=product.available_grades,
+        pack_sizes=product.pack_sizes_list,
+        common_names=product.common_names_list,
+        hazard_statements=product.hazard_statements_list,
+        precautionary_statements=product.precautionary_statements_list,
+        hazard_pictograms=product.hazard_pictograms_list,
+        seo_h2=product.seo_h2_list,
+        meta_keywords=product.meta_keywords_list,
+        specs=specs,
+        product_json_ld=_product_json_ld(product),
+        faq_json_ld=_faq_json_ld(list(product.faqs.all())),
+    )
+
+
+def get_snapshot(product):
+    """The cached snapshot for this version of ``product``, built on a miss."""
+    key = SNAPSHOT_KEY.format(SNAPSHOT_VERSION, product.pk, product.updated_at.timestamp())
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_snapshot(product)
+        cache.set(key, snapshot, SNAPSHOT_TIMEOUT)
+    return snapshot
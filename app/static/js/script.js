@@ -24,6 +24,172 @@ document.addEventListener('DOMContentLoaded', function () {
         });
     });
 
+    /* ─── Per-visitor fragments punched out of cached / exported pages ─── */
+    var fragmentSlots = document.querySelectorAll('[data-fragment]');
+    if (fragmentSlots.length && window.fetch) {
+        fetch('/fragments/', { credentials: 'same-origin', headers: { 'Accept': 'application/json' } })
+            .then(function (res) { return res.ok ? res.json() : null; })
+            .then(function (data) {
+                if (!data) return;
+                fragmentSlots.forEach(function (slot) {
+                    var name = slot.getAttribute('data-fragment');
+                    if (name === 'csrf_token') {
+                        slot.value = data.csrf_token;
+                    } else if (name === 'messages') {
+                        data.messages.forEach(function (msg) {
+                            var el = document.createElement('div');
+                            el.className = 'message message-' + msg.level;
+                            el.textContent = msg.message;
+                            slot.appendChild(el);
+                        });
+                    }
+                });
+            })
+            .catch(function () { /* fragments are best-effort */ });
+    }
+
+    /* ─── Typeahead on inputs with data-autocomplete="<endpoint>" ─── */
+    document.querySelectorAll('input[data-autocomplete]').forEach(function (input) {
+        var endpoint = input.getAttribute('data-autocomplete');
+        var list = document.createElement('ul');
+        list.className = 'autocomplete-list';
+        list.setAttribute('role', 'listbox');
+        list.id = (input.id || 'autocomplete') + '-suggestions';
+        list.hidden = true;
+        input.parentNode.appendChild(list);
+        input.setAttribute('aria-controls', list.id);
+        input.setAttribute('aria-autocomplete', 'list');
+
+        var timer = null;
+        var controller = null;
+        var active = -1;
+
+        function close() {
+            list.hidden = true;
+            list.innerHTML = '';
+            active = -1;
+        }
+
+        function highlight(index) {
+            var items = list.querySelectorAll('li');
+            if (!items.length) return;
+            active = (index + items.length) % items.length;
+            items.forEach(function (li, i) { li.classList.toggle('active', i === active); });
+        }
+
+        function render(results) {
+            list.innerHTML = '';
+            results.forEach(function (item) {
+                var li = document.createElement('li');
+                li.setAttribute('role', 'option');
+                var link = document.createElement('a');
+                link.href = item.url;
+                link.textContent = item.name;
+                var codes = [item.cas_number && 'CAS ' + item.cas_number, item.sku].filter(Boolean).join(' · ');
+                if (codes) {
+                    var small = document.createElement('small');
+                    small.textContent = codes;
+                    link.appendChild(small);
+                }
+                li.appendChild(link);
+                list.appendChild(li);
+            });
+            list.hidden = !results.length;
+            active = -1;
+        }
+
+        function fetchSuggestions() {
+            var query = input.value.trim();
+            if (controller) controller.abort();  /* only the latest keystroke matters */
+            if (query.length < 2) { close(); return; }
+            controller = window.AbortController ? new AbortController() : null;
+            fetch(endpoint + '?q=' + encodeURIComponent(query), {
+                headers: { 'Accept': 'application/json' },
+                signal: controller ? controller.signal : undefined
+            })
+                .then(function (res) { return res.ok ? res.json() : null; })
+                .then(function (data) { if (data && data.query.trim() === input.value.trim()) render(data.results); })
+                .catch(function () { /* aborted or offline */ });
+        }
+
+        input.addEventListener('input', function () {
+            clearTimeout(timer);
+            timer = setTimeout(fetchSuggestions, 120);
+        });
+        input.addEventListener('keydown', function (e) {
+            if (list.hidden) return;
+            if (e.key === 'ArrowDown') { e.preventDefault(); highlight(active + 1); }
+            else if (e.key === 'ArrowUp') { e.preventDefault(); highlight(active - 1); }
+            else if (e.key === 'Escape') { close(); }
+            else if (e.key === 'Enter' && active >= 0) {
+                e.preventDefault();
+                window.location.href = list.querySelectorAll('li a')[active].href;
+            }
+        });
+        document.addEventListener('click', function (e) {
+            if (e.target !== input && !list.contains(e.target)) close();
+        });
+    });
+
+    /* ─── "Load more" links: append the next block of cards in place ─── */
+    document.querySelectorAll('a[data-fragment-url][data-grid]').forEach(function (link) {
+        var grid = document.getElementById(link.getAttribute('data-grid'));
+        var loading = false;
+        var watcher = null;
+        if (!grid || !window.fetch) return;
+
+        function done(nextPage) {
+            loading = false;
+            link.classList.remove('loading');
+            if (nextPage) {
+                link.setAttribute('data-next-page', nextPage);
+                link.href = link.pathname + '?' + nextPage;
+            } else {
+                if (watcher) watcher.disconnect();
+                link.parentNode.removeChild(link);
+            }
+        }
+
+        function loadMore() {
+            if (loading) return;
+            loading = true;
+            link.classList.add('loading');
+            var url = link.getAttribute('data-fragment-url') + '?' + link.getAttribute('data-next-page');
+            fetch(url, { credentials: 'same-origin' })
+                .then(function (res) {
+                    if (!res.ok) throw new Error(res.status);
+                    return res.text().then(function (html) {
+                        var template = document.createElement('template');
+                        template.innerHTML = html;
+                        grid.appendChild(template.content);
+                        done(res.headers.get('X-Next-Page'));
+                    });
+                })
+                .catch(function () { window.location.href = link.href; });
+        }
+
+        link.addEventListener('click', function (e) {
+            e.preventDefault();
+            loadMore();
+        });
+        // Infinite scroll: fetch the next block shortly before the link is reached.
+        if (window.IntersectionObserver) {
+            watcher = new IntersectionObserver(function (entries) {
+                if (entries[0].isIntersecting) loadMore();
+            }, { rootMargin: '0px 0px 400px 0px' });
+            watcher.observe(link);
+        }
+    });
+
+    /* ─── Drop blurred image placeholders once the real image is in ─── */
+    document.querySelectorAll('img[data-placeholder]').forEach(function (img) {
+        function clear() {
+            img.style.background = '';
+            img.removeAttribute('data-placeholder');
+        }
+        if (img.complete) clear(); else img.addEventListener('load', clear, { once: true });
+    });
+
     /* ─── Contact form handling (only on pages with #contactForm) ─── */
     var contactForm = document.getElementById('contactForm');
     if (contactForm) {
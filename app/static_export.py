@@ -0,0 +1,343 @@
+"""
+Static-site export – prerender every public URL into a plain file tree.
+
+The URL list comes from the sitemap sections (``app.seo``) and every page is
+rendered through the real URLconf and middleware with the Django test client.
+Pages are written as ``<path>/index.html`` with precompressed ``.gz`` (and
+``.br`` when the ``brotli`` package is installed) siblings, so the tree can be
+served by WhiteNoise or any plain file server.
+
+Each export goes into a new ``releases/<version>/`` directory and the
+``current`` symlink is swapped atomically once every page has rendered.
+
+After the first export, model saves regenerate only the pages that read the
+changed row (see ``paths_for_product`` and friends); the work is queued on a
+single background thread once the transaction commits.
+"""
+
+import gzip
+import os
+import shutil
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.test import Client
+from django.urls import reverse
+
+from .page_cache import STATIC_EXPORT_META, strip_holes
+from .seo import DOMAIN
+
+try:
+    import brotli
+except ImportError:  # optional – only .gz siblings are written without it
+    brotli = None
+
+CURRENT_LINK = "current"
+RELEASES_DIR = "releases"
+
+PageResult = namedtuple("PageResult", "path status seconds bytes gzip_bytes brotli_bytes error")
+
+
+def public_paths():
+    """Return every public path listed in the sitemap, plus the sitemap files and robots.txt."""
+    from .seo import iter_public_paths, sitemap_paths
+
+    paths = list(dict.fromkeys(iter_public_paths()))
+    return paths + sitemap_paths() + [reverse("robots_txt")]
+
+
+def _iter_content(response):
+    return response.streaming_content if response.streaming else [response.content]
+
+
+def file_for_path(root, path):
+    """Map a URL path to the file that serves it inside ``root``."""
+    relative = path.lstrip("/")
+    if not relative or relative.endswith("/"):
+        relative += "index.html"
+    return Path(root) / relative
+
+
+def write_atomic(target, data):
+    """Write ``data`` to ``target`` via a temporary file and ``os.replace``."""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, target)
+
+
+def write_page(root, path, body):
+    """Write ``body`` and its precompressed siblings; return (gz, br) sizes."""
+    target = file_for_path(root, path)
+    write_atomic(target, body)
+    compressed = gzip.compress(body, compresslevel=9, mtime=0)
+    write_atomic(target.with_name(target.name + ".gz"), compressed)
+    brotli_size = None
+    if brotli is not None:
+        br = brotli.compress(body)
+        write_atomic(target.with_name(target.name + ".br"), br)
+        brotli_size = len(br)
+    return len(compressed), brotli_size
+
+
+def remove_page(root, path):
+    """Delete the files written for ``path`` (if any)."""
+    target = file_for_path(root, path)
+    for candidate in (target, target.with_name(target.name + ".gz"), target.with_name(target.name + ".br")):
+        try:
+            candidate.unlink()
+        except FileNotFoundError:
+            pass
+    # Drop the now-empty page directory (e.g. products/<old-slug>/).
+    parent = target.parent
+    if parent != Path(root) and parent.is_dir() and not any(parent.iterdir()):
+        parent.rmdir()
+
+
+def render_page(client, path):
+    """Render ``path`` through the URLconf; return (status, body bytes)."""
+    response = client.get(path, **{STATIC_EXPORT_META: True})
+    body = b"".join(_iter_content(response))
+    if response.status_code == 200 and response.get("Content-Type", "").startswith("text/html"):
+        body = strip_holes(body.decode(response.charset)).encode(response.charset)
+    return response.status_code, body
+
+
+def export_client():
+    host = urlparse(DOMAIN).netloc
+    return Client(HTTP_HOST=host, secure=DOMAIN.startswith("https"))
+
+
+def render_paths(root, paths):
+    """Render and write ``paths`` into ``root``; return a list of PageResult."""
+    client = export_client()
+    results = []
+    for path in paths:
+        started = time.perf_counter()
+        try:
+            status, body = render_page(client, path)
+        except Exception as exc:
+            results.append(PageResult(path, None, time.perf_counter() - started, 0, None, None, repr(exc)))
+            continue
+        elapsed = time.perf_counter() - started
+        if status != 200:
+            results.append(PageResult(path, status, elapsed, len(body), None, None, f"HTTP {status}"))
+            continue
+        gz_size, br_size = write_page(root, path, body)
+        results.append(PageResult(path, status, elapsed, len(body), gz_size, br_size, None))
+    return results
+
+
+def _init_worker():
+    import django
+
+    django.setup()
+
+
+def _render_chunk(root, paths):
+    return render_paths(root, paths)
+
+
+def new_release_dir(output):
+    version = datetime.now().strftime("%Y%m%d%H%M%S%f")
+    release = Path(output) / RELEASES_DIR / version
+    release.mkdir(parents=True)
+    return release
+
+
+def current_release(output):
+    """Return the directory ``current`` points at, or None."""
+    link = Path(output) / CURRENT_LINK
+    return link.resolve() if link.is_symlink() else None
+
+
+def link_assets(release):
+    """Expose STATIC_ROOT and MEDIA_ROOT inside the release tree."""
+    for name, source in (("static", settings.STATIC_ROOT), ("media", settings.MEDIA_ROOT)):
+        if source and os.path.isdir(source) and not (release / name).exists():
+            os.symlink(os.path.abspath(source), release / name)
+
+
+def activate_release(output, release):
+    """Atomically point ``<output>/current`` at ``release``."""
+    link = Path(output) / CURRENT_LINK
+    tmp = Path(output) / f".{CURRENT_LINK}.{os.getpid()}.tmp"
+    if tmp.is_symlink() or tmp.exists():
+        tmp.unlink()
+    os.symlink(os.path.relpath(release, output), tmp)
+    os.replace(tmp, link)
+
+
+def prune_releases(output, keep):
+    """Delete all but the newest ``keep`` releases (never the current one)."""
+    releases = sorted((Path(output) / RELEASES_DIR).iterdir(), reverse=True)
+    current = current_release(output)
+    for release in releases[keep:]:
+        if release.resolve() != current:
+            shutil.rmtree(release, ignore_errors=True)
+
+
+def export_site(output, paths=None, jobs=None, chunk_size=8):
+    """Render ``paths`` (default: every public path) into a new release.
+
+    Returns ``(release_dir, results)``.  The release is *not* activated here –
+    callers decide based on the results.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    paths = list(paths if paths is not None else public_paths())
+    release = new_release_dir(output)
+    jobs = jobs or os.cpu_count() or 1
+
+    if jobs == 1:
+        results = render_paths(release, paths)
+    else:
+        chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+        results = []
+        # Forked workers must open their own database connections.
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker) as pool:
+            for chunk_results in pool.map(_render_chunk, [release] * len(chunks), chunks):
+                results.extend(chunk_results)
+    link_assets(release)
+    return release, results
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Incremental regeneration
+# ─────────────────────────────────────────────────────────────────────
+
+_regen_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="static-regen")
+_regen_lock = threading.Lock()
+
+
+def export_root():
+    """Return the active export root, or None if nothing has been exported yet."""
+    root = getattr(settings, "STATIC_EXPORT_ROOT", None)
+    if root and current_release(root) is not None:
+        return root
+    return None
+
+
+def _product_url(slug):
+    return reverse("product_detail", kwargs={"slug": slug})
+
+
+def _article_url(slug):
+    return reverse("article_detail", kwargs={"slug": slug})
+
+
+def paths_for_product(product, old_slug=None, old_category_id=None, deleted=False, related_rows=True):
+    """Return ``(render, remove)`` path sets for a changed product.
+
+    ``related_rows`` covers the blocks that show the product itself on other
+    pages (related products, promoted products); inline rows such as specs
+    only appear on the product's own page and the catalogue grid.
+    """
+    from .models import Product
+    from .seo import sitemap_paths_for
+
+    render = {reverse("products")} | sitemap_paths_for("products", product.pk)
+    remove = set()
+    if deleted:
+        remove.add(_product_url(product.slug))
+    else:
+        render.add(_product_url(product.slug))
+    if old_slug and old_slug != product.slug:
+        remove.add(_product_url(old_slug))
+
+    if related_rows:
+        category_ids = {product.category_id, old_category_id} - {None}
+        siblings = (
+            Product.objects.filter(category_id__in=category_ids)
+            .exclude(pk=product.pk)
+            .values_list("slug", flat=True)
+        )
+        render.update(_product_url(slug) for slug in siblings)
+        # Stored neighbours come from any category.
+        listing = Product.objects.filter(neighbors__neighbor_id=product.pk).values_list("slug", flat=True)
+        render.update(_product_url(slug) for slug in listing)
+        promoting = product.article_promotions.filter(is_published=True).values_list("slug", flat=True)
+        render.update(_article_url(slug) for slug in promoting)
+    return render - remove, remove
+
+
+def paths_for_neighbors(pks):
+    """Return ``(render, remove)`` for products whose related-product lists changed."""
+    from .models import Product
+
+    slugs = Product.objects.filter(pk__in=list(pks)).values_list("slug", flat=True)
+    return {_product_url(slug) for slug in slugs}, set()
+
+
+def paths_for_category(category):
+    render = {reverse("products")}
+    render.update(_product_url(slug) for slug in category.products.values_list("slug", flat=True))
+    return render, set()
+
+
+def paths_for_article(article, old_slug=None, was_published=False, deleted=False):
+    """Return ``(render, remove)`` path sets for a changed article."""
+    from .models import ProductArticle
+    from .seo import sitemap_paths_for
+
+    render = {reverse("article_list")} | sitemap_paths_for("articles", article.pk)
+    remove = set()
+    if deleted or not article.is_published:
+        remove.add(_article_url(article.slug))
+    else:
+        render.add(_article_url(article.slug))
+    if old_slug and old_slug != article.slug:
+        remove.add(_article_url(old_slug))
+    if article.is_published or was_published:
+        # Every published article shows a "More Articles" block.
+        others = (
+            ProductArticle.objects.filter(is_published=True)
+            .exclude(pk=article.pk)
+            .values_list("slug", flat=True)
+        )
+        render.update(_article_url(slug) for slug in others)
+    return render - remove, remove
+
+
+def regenerate_paths(render, remove=()):
+    """Re-render ``render`` and delete ``remove`` inside the current release."""
+    root = export_root()
+    if root is None:
+        return []
+    release = current_release(root)
+    with _regen_lock:
+        for path in remove:
+            remove_page(release, path)
+        return render_paths(release, sorted(render))
+
+
+def _regenerate_job(render, remove):
+    try:
+        if render is None:
+            render = set(public_paths())
+        return regenerate_paths(render, remove)
+    finally:
+        connections.close_all()
+
+
+def schedule_regeneration(render, remove=()):
+    """Queue a regeneration to run once the current transaction commits.
+
+    ``render=None`` re-renders every public page (used for site-wide data
+    such as the company record shown in the header and footer).
+    """
+    if export_root() is None:
+        return
+    render = None if render is None else set(render)
+    remove = set(remove)
+    if render == set() and not remove:
+        return
+    transaction.on_commit(lambda: _regen_executor.submit(_regenerate_job, render, remove))
@@ -0,0 +1,149 @@
+"""
+Storage metadata cache – TTL'd, bounded LRU of exists/size/mtime lookups.
+
+Templates ask the storage backend whether uploaded files exist on every
+render (see ``storage_extras.file_exists``).  On a remote or network-mounted
+backend that is blocking I/O on the hottest path of the site, so results are
+memoised here per storage path.  Each entry remembers the shared
+generation of its path (see ``app.cache``), so ``invalidate`` in one worker
+drops the entry in all of them on their next lookup.  Lookups run on a small thread pool with a
+deadline; repeated timeouts or errors trip a circuit breaker, after which
+the storage is assumed healthy ("file present") until the cool-down expires
+instead of stalling requests.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from .cache import bump_generation, get_generation
+
+FileMetadata = namedtuple("FileMetadata", "exists size mtime")
+
+# Returned while the breaker is open or a lookup misses its deadline.
+ASSUMED_PRESENT = FileMetadata(exists=True, size=None, mtime=None)
+
+DEFAULTS = {
+    "TTL": 300,               # seconds a cached lookup stays fresh
+    "MAX_ENTRIES": 1024,      # LRU bound
+    "TIMEOUT": 0.25,          # per-lookup deadline in seconds
+    "FAILURE_THRESHOLD": 3,   # consecutive failures that open the breaker
+    "COOLDOWN": 30,           # seconds the breaker stays open
+}
+
+
+class StorageMetadataCache:
+    """Thread-safe metadata cache in front of a Django storage backend."""
+
+    def __init__(self, storage=None, **options):
+        self.storage = storage or default_storage
+        config = {**DEFAULTS, **getattr(settings, "STORAGE_METADATA_CACHE", {}), **options}
+        self.ttl = config["TTL"]
+        self.max_entries = config["MAX_ENTRIES"]
+        self.timeout = config["TIMEOUT"]
+        self.failure_threshold = config["FAILURE_THRESHOLD"]
+        self.cooldown = config["COOLDOWN"]
+
+        self._entries = OrderedDict()  # name -> (expires_at, generation, FileMetadata)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="storage-meta")
+        self._failures = 0
+        self._open_until = 0.0
+
+    # ── public API ────────────────────────────────────────────────────
+    def get(self, name):
+        """Return ``FileMetadata`` for ``name``, hitting storage at most once per TTL."""
+        now = time.monotonic()
+        generation = get_generation(_generation_name(name))
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry[0] > now and entry[1] == generation:
+                self._entries.move_to_end(name)
+                return entry[2]
+            if self._open_until > now:
+                return ASSUMED_PRESENT
+
+        future = self._executor.submit(self._stat, name)
+        try:
+            meta = future.result(timeout=self.timeout)
+        except Exception:
+            self._record_failure()
+            return ASSUMED_PRESENT
+
+        with self._lock:
+            self._failures = 0
+            self._entries[name] = (time.monotonic() + self.ttl, generation, meta)
+            self._entries.move_to_end(name)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return meta
+
+    def exists(self, name):
+        return self.get(name).exists
+
+    def invalidate(self, *names):
+        """Forget ``names`` here and in every other process."""
+        with self._lock:
+            for name in names:
+                self._entries.pop(name, None)
+        for name in names:
+            bump_generation(_generation_name(name))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._failures = 0
+            self._open_until = 0.0
+
+    @property
+    def is_open(self):
+        return self._open_until > time.monotonic()
+
+    # ── internals ─────────────────────────────────────────────────────
+    def _stat(self, name):
+        if not self.storage.exists(name):
+            return FileMetadata(exists=False, size=None, mtime=None)
+        size = mtime = None
+        try:
+            size = self.storage.size(name)
+        except (NotImplementedError, OSError):
+            pass
+        try:
+            mtime = self.storage.get_modified_time(name)
+        except (NotImplementedError, OSError):
+            pass
+        return FileMetadata(exists=True, size=size, mtime=mtime)
+
+    def _record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                self._open_until = time.monotonic() + self.cooldown
+                self._failures = 0
+
+
+def _generation_name(name):
+    # Hashed: storage paths may hold characters some cache backends reject in keys.
+    return "storage:" + hashlib.md5(name.encode()).hexdigest()
+
+
+storage_metadata = StorageMetadataCache()
+
+
+def invalidate_file_fields(instance):
+    """Forget cached metadata for every file referenced by ``instance``."""
+    from django.db.models import FileField
+
+    names = []
+    for field in instance._meta.get_fields():
+        if isinstance(field, FileField):
+            value = getattr(instance, field.attname, None)
+            if value:
+                names.append(value.name if hasattr(value, "name") else str(value))
+    if names:
+        storage_metadata.invalidate(*names)
@@ -0,0 +1,22 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from app.page_cache import FRAGMENTS, HOLE_MARKER, is_shell_render, render_fragment
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, name):
+    """Render a per-visitor fragment, or a placeholder inside a cached page shell.
+
+    Usage: ``{% hole "csrf_token" %}`` / ``{% hole "messages" %}``
+    """
+    if name not in FRAGMENTS:
+        raise template.TemplateSyntaxError(f"Unknown page fragment: {name!r}")
+    request = context.get("request")
+    if request is None:
+        return ""
+    if is_shell_render(request):
+        return mark_safe(HOLE_MARKER.format(name))
+    return render_fragment(name, request)
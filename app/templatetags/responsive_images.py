@@ -0,0 +1,64 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from app.images import FORMATS, MIME_TYPES, image_info
+
+register = template.Library()
+
+
+def _srcset(variants):
+    return ", ".join(f"{v.url} {v.width}w" for v in variants)
+
+
+def _placeholder_style(metadata, style=""):
+    """Dominant colour + blurred preview behind the image until it loads."""
+    if metadata is None or metadata.has_alpha:
+        return style
+    background = f"background:{metadata.dominant_color}"
+    if metadata.placeholder:
+        background += f" url({metadata.placeholder}) center/cover no-repeat"
+    return f"{background};{style}" if style else background
+
+
+@register.simple_tag
+def picture(file, sizes="100vw", alt="", **attrs):
+    """Render ``file`` as a ``<picture>`` with AVIF / WebP / JPEG sources.
+
+    ``sizes`` is the layout width hint passed to the browser; any extra
+    keyword arguments (``class``, ``id``, ``loading`` …) go on the ``<img>``.
+    Intrinsic ``width``/``height`` and the placeholder come from the recorded
+    metadata.  Falls back to a plain ``<img>`` of the original until
+    derivatives exist.
+    """
+    if not file:
+        return ""
+    info = image_info(file.name)
+    metadata = info.metadata
+    attrs.setdefault("decoding", "async")
+    style = attrs.pop("style", "")
+    placeholder_style = _placeholder_style(metadata, style)
+    if placeholder_style != style:
+        attrs["data-placeholder"] = ""  # cleared by script.js once loaded
+    if placeholder_style:
+        attrs["style"] = placeholder_style
+
+    found = info.variants
+    fallback_format = next((f for f in found if f not in FORMATS), None)
+    if fallback_format is None:
+        if metadata is not None:
+            attrs.update(width=metadata.width, height=metadata.height)
+        extra = format_html_join("", ' {}="{}"', sorted(attrs.items()))
+        return format_html('<img src="{}" alt="{}"{}>', file.url, alt, extra)
+
+    fallback = found[fallback_format]
+    largest = fallback[-1]
+    width, height = (metadata.width, metadata.height) if metadata else (largest.width, largest.height)
+    extra = format_html_join("", ' {}="{}"', sorted(attrs.items()))
+    sources = format_html_join(
+        "", '<source type="{}" srcset="{}" sizes="{}">',
+        ((MIME_TYPES[fmt], _srcset(found[fmt]), sizes) for fmt in FORMATS if fmt in found),
+    )
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" alt="{}"{}></picture>',
+        sources, largest.url, _srcset(fallback), sizes, width, height, alt, extra,
+    )
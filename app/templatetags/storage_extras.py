@@ -1,15 +1,16 @@
 from django import template
-from django.core.files.storage import default_storage
+
+from app.storage import storage_metadata
 
 register = template.Library()
 
 
 @register.filter
 def file_exists(name):
-    """Return True if the given storage path exists."""
+    """Return True if the given storage path exists (cached, see app.storage)."""
     try:
         if not name:
             return False
-        return default_storage.exists(name)
+        return storage_metadata.exists(name)
     except Exception:
         return False
@@ -0,0 +1,42 @@
+"""
+Test runner that keeps the suite off the live shared cache.
+
+The default cache is shared with the running server (see ``CACHES`` in
+``devapp.settings``), and the tests ``cache.clear()`` it and bump its
+generation counters.  The runner points it at a temporary file cache for
+the run – exported as ``CACHE_DIR`` so subprocesses started by the tests
+use the same one – and drops ``REDIS_URL`` for the duration.
+"""
+
+import os
+import shutil
+import tempfile
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class IsolatedCacheRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._cache_dir = tempfile.mkdtemp(prefix="test-cache-")
+        self._environ = {name: os.environ.get(name) for name in ("CACHE_DIR", "REDIS_URL")}
+        os.environ["CACHE_DIR"] = self._cache_dir
+        os.environ.pop("REDIS_URL", None)
+        self._cache_override = override_settings(CACHES={
+            "default": {
+                "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                "LOCATION": self._cache_dir,
+            },
+        })
+        self._cache_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._cache_override.disable()
+        for name, value in self._environ.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        shutil.rmtree(self._cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
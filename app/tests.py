@@ -1,3 +1,1424 @@
+from unittest import skipUnless
+
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from .models import CompanyDetails, Product, ProductCategory, ProductSpec
+from .recommend import np
+
+
+class CompanyDetailsCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        CompanyDetails.objects.create(company_name="Vasudev Chemo Pharma")
+
+    def test_public_page_renders_without_company_queries(self):
+        self.client.get("/aboutus/")  # warm the cache
+        with self.assertNumQueries(0):
+            response = self.client.get("/aboutus/")
+        self.assertContains(response, "Vasudev Chemo Pharma")
+
+    def test_save_invalidates_cached_copy(self):
+        self.client.get("/aboutus/")
+        company = CompanyDetails.load()
+        company.company_name = "Renamed Chemicals"
+        company.save()
+        response = self.client.get("/aboutus/")
+        self.assertContains(response, "Renamed Chemicals")
+
+
+class SharedGenerationTests(TestCase):
+    def test_bump_in_another_process_is_seen_here(self):
+        import subprocess
+        import sys
+
+        from django.conf import settings
+
+        from .cache import get_generation
+
+        # The suite has a cache of its own (app.test_runner), shared with the child.
+        location = settings.CACHES["default"]["LOCATION"]
+        self.assertNotEqual(location, str(settings.BASE_DIR / ".cache"))
+        before = get_generation("content")
+        subprocess.run(
+            [sys.executable, str(settings.BASE_DIR / "manage.py"), "shell", "-c",
+             "from app.cache import bump_generation; bump_generation('content')"],
+            check=True, capture_output=True,
+        )
+        self.assertNotEqual(get_generation("content"), before)
+
+    def test_process_private_cache_fails_the_deploy_check(self):
+        from django.test import override_settings
+
+        from .cache import check_shared_cache
+
+        self.assertEqual(check_shared_cache(None), [])
+        private = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+        with override_settings(CACHES=private):
+            self.assertEqual([error.id for error in check_shared_cache(None)], ["app.E001"])
+
+
+class StorageMetadataCacheTests(TestCase):
+    def test_lookups_are_cached_and_invalidated(self):
+        from unittest import mock
+        from .storage import StorageMetadataCache
+
+        storage = mock.Mock()
+        storage.exists.return_value = True
+        storage.size.return_value = 10
+        storage.get_modified_time.return_value = None
+        meta = StorageMetadataCache(storage=storage)
+
+        self.assertTrue(meta.exists("company/logo.png"))
+        self.assertTrue(meta.exists("company/logo.png"))
+        self.assertEqual(storage.exists.call_count, 1)
+
+        meta.invalidate("company/logo.png")
+        storage.exists.return_value = False
+        self.assertFalse(meta.exists("company/logo.png"))
+
+        # Another worker's invalidation reaches this copy through the shared cache.
+        StorageMetadataCache(storage=mock.Mock()).invalidate("company/logo.png")
+        storage.exists.return_value = True
+        self.assertTrue(meta.exists("company/logo.png"))
+        self.assertEqual(storage.exists.call_count, 3)
+
+    def test_slow_storage_trips_breaker_and_assumes_present(self):
+        import time
+        from unittest import mock
+        from .storage import StorageMetadataCache
+
+        storage = mock.Mock()
+        storage.exists.side_effect = lambda name: time.sleep(0.2) or False
+        meta = StorageMetadataCache(storage=storage, TIMEOUT=0.01, FAILURE_THRESHOLD=2)
+
+        self.assertTrue(meta.exists("a.png"))
+        self.assertTrue(meta.exists("b.png"))
+        self.assertTrue(meta.is_open)
+        calls = storage.exists.call_count
+        self.assertTrue(meta.exists("c.png"))
+        self.assertEqual(storage.exists.call_count, calls)
+
+
+class PageCacheTests(TestCase):
+    def setUp(self):
+        from .models import Product, ProductCategory
+
+        cache.clear()
+        CompanyDetails.objects.create()
+        self.category = ProductCategory.objects.create(slug="industrial", label="Industrial")
+        self.product = Product.objects.create(
+            category=self.category, name="MEA Triazine 78", description="H2S scavenger",
+        )
+
+    def test_catalog_pages_are_served_without_queries(self):
+        for url in ("/products/", self.product.get_absolute_url()):
+            first = self.client.get(url)
+            self.assertEqual(first["X-Page-Cache"], "MISS")
+            self.assertIn("Accept-Encoding", first["Vary"])
+            with self.assertNumQueries(0):
+                second = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+            self.assertEqual(second["X-Page-Cache"], "HIT")
+            self.assertEqual(second["Content-Encoding"], "gzip")
+
+    def test_product_save_invalidates_pages(self):
+        self.client.get("/products/")
+        self.product.name = "Vastreat 78"
+        self.product.save()
+        response = self.client.get("/products/")
+        self.assertEqual(response["X-Page-Cache"], "MISS")
+        self.assertContains(response, "Vastreat 78")
+
+    def test_logged_in_visitors_bypass_cache(self):
+        self.client.cookies["sessionid"] = "abc"
+        self.client.get("/products/")
+        response = self.client.get("/products/")
+        self.assertFalse(response.has_header("X-Page-Cache"))
+
+    def test_homepage_shell_is_cached_with_csrf_hole(self):
+        first = self.client.get("/")
+        self.assertEqual(first["X-Page-Cache"], "MISS")
+        self.assertContains(first, 'name="csrfmiddlewaretoken" value="')
+        self.assertNotContains(first, "vcp-hole")
+
+        with self.assertNumQueries(0):
+            second = self.client.get("/")
+        self.assertEqual(second["X-Page-Cache"], "HIT")
+        self.assertContains(second, 'name="csrfmiddlewaretoken" value="')
+        self.assertIn("csrftoken", second.cookies)
+
+    def test_page_fragments_endpoint(self):
+        response = self.client.get("/fragments/")
+        self.assertEqual(response.json()["messages"], [])
+        self.assertTrue(response.json()["csrf_token"])
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        from .models import Product, ProductCategory
+
+        cache.clear()
+        CompanyDetails.objects.create()
+        category = ProductCategory.objects.create(slug="industrial", label="Industrial")
+        self.product = Product.objects.create(category=category, name="PTSA", description="Acid")
+
+    def test_unchanged_product_page_answers_304(self):
+        url = self.product.get_absolute_url()
+        with self.settings(PAGE_CACHE_ENABLED=False):
+            etag = self.client.get(url)["ETag"]
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+
+            self.product.specs.create(label="Purity", value="98%")
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+
+    def test_cached_page_answers_304_without_queries(self):
+        url = self.product.get_absolute_url()
+        etag = self.client.get(url)["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_insights_have_build_time_etag(self):
+        from .insights_data import INSIGHTS
+
+        url = f"/insights/{INSIGHTS[0]['slug']}/"
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        import io
+        import tempfile
+        from django.core.files.base import ContentFile
+        from django.test import override_settings
+        from PIL import Image
+
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=self.media.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        from django.core.files.storage import default_storage
+        buffer = io.BytesIO()
+        Image.new("RGB", (400, 300), "teal").save(buffer, format="PNG")
+        self.name = default_storage.save("products/images/sample.png", ContentFile(buffer.getvalue()))
+
+    def test_build_is_idempotent_and_renders_picture(self):
+        from django.db.models.fields.files import FieldFile
+        from django.template import Context, Template
+        from .images import build_derivatives
+        from .models import ImageDerivative, ProductImage
+
+        [result] = build_derivatives([self.name], jobs=0)
+        self.assertFalse(result.skipped)
+        widths = sorted(set(ImageDerivative.objects.values_list("width", flat=True)))
+        self.assertEqual(widths, [72, 144, 320, 400])
+        self.assertEqual(set(ImageDerivative.objects.values_list("format", flat=True)), {"avif", "webp", "jpeg"})
+
+        [again] = build_derivatives([self.name], jobs=0)
+        self.assertTrue(again.skipped)
+
+        field = FieldFile(None, ProductImage._meta.get_field("image"), self.name)
+        html = Template('{% load responsive_images %}{% picture f sizes="50vw" alt="x" %}').render(Context({"f": field}))
+        self.assertIn('<source type="image/avif"', html)
+        self.assertIn('width="400" height="300"', html)
+
+    def test_metadata_recorded_on_save_and_rendered_without_file_access(self):
+        from unittest import mock
+        from django.template import Context, Template
+        from .models import ImageMetadata, Product, ProductCategory, ProductImage
+
+        category = ProductCategory.objects.create(slug="c", label="C")
+        product = Product.objects.create(slug="p", name="P", category=category)
+        image = ProductImage.objects.create(product=product, image=self.name)
+
+        meta = ImageMetadata.objects.get(source=self.name)
+        self.assertEqual((meta.width, meta.height, meta.has_alpha), (400, 300, False))
+        self.assertEqual(meta.dominant_color, "#008080")
+        self.assertTrue(meta.placeholder.startswith("data:image/webp;base64,"))
+
+        template = Template('{% load responsive_images %}{% picture f alt="x" %}')
+        with mock.patch("django.core.files.storage.FileSystemStorage.open") as opened:
+            html = template.render(Context({"f": image.image}))
+        opened.assert_not_called()
+        self.assertIn('width="400"', html)
+        self.assertIn('height="300"', html)
+        self.assertIn("background:#008080 url(data:image/webp", html)
+
+
+class SiteSearchTests(TestCase):
+    def setUp(self):
+        from . import search
+        cache.clear()
+        search._backend = None
+        self.addCleanup(setattr, search, "_backend", None)
+        self.category = ProductCategory.objects.create(slug="scavengers", label="H₂S Scavengers")
+
+    def create_product(self, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Product.objects.create(category=self.category, **fields)
+
+    def check_backend(self):
+        from .search import site_search
+
+        product = self.create_product(
+            slug="mea-triazine-78", name="MEA Triazine 78", description="Hydrogen sulphide scavenger.",
+            cas_number="4719-04-4",
+        )
+        self.assertEqual(site_search("4719-04-4")[0].title, "MEA Triazine 78")
+        self.assertEqual(site_search("triaz")[0].url, "/products/mea-triazine-78/")
+        self.assertTrue(any(r.kind == "insight" for r in site_search("h2s scavenger")))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.name = "Vastreat 78"
+            product.save()
+        self.assertEqual(site_search("vastreat")[0].title, "Vastreat 78")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.delete()
+        self.assertEqual([r for r in site_search("4719") if r.kind == "product"], [])
+
+    def test_fts5_backend(self):
+        from .search import fts5_table_exists, get_backend
+        if not fts5_table_exists():
+            self.skipTest("SQLite without FTS5")
+        self.assertEqual(get_backend().name, "fts5")
+        self.check_backend()
+
+    def test_memory_backend(self):
+        from django.test import override_settings
+        with override_settings(SEARCH_BACKEND="memory"):
+            self.check_backend()
+
+    def test_memory_backend_updates_do_not_disturb_searches(self):
+        import sys
+        import threading
+
+        from .search import Document, InvertedIndex, _fields, document_id, iter_documents
+
+        index = InvertedIndex()
+        for document in iter_documents():
+            index.add(document)
+        current = [index]
+        stop, errors = threading.Event(), []
+
+        def search():
+            while not stop.is_set():
+                try:
+                    current[0].search("scav")
+                except Exception as exc:  # e.g. "dictionary changed size during iteration"
+                    errors.append(exc)
+                    return
+
+        # Switch threads as often as possible so a read lands mid-update.
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        self.addCleanup(sys.setswitchinterval, interval)
+        reader = threading.Thread(target=search)
+        reader.start()
+        try:
+            for i in range(500):
+                doc_id = document_id("product", 10_000 + i % 7)
+                words = " ".join(f"scav{i}x{j}" for j in range(40))
+                document = Document(doc_id, "product", words, "/", "", _fields(words, [], []))
+                current[0] = current[0].updated([document])
+                if i % 3 == 0:
+                    current[0] = current[0].updated(removed=[doc_id])
+        finally:
+            stop.set()
+            reader.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(index.search("scav1x"), [])  # the original copy is never modified
+
+    def test_memory_backends_apply_logged_changes_without_a_rebuild(self):
+        from unittest import mock
+
+        from django.test import override_settings
+
+        from . import search
+        from .search import MemoryBackend
+
+        settings_override = override_settings(SEARCH_BACKEND="memory")
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.create_product(slug="caustic-soda", name="Caustic Soda Flakes", description="Sodium hydroxide.")
+        other = MemoryBackend()  # another worker's copy
+        self.assertEqual(other.search("caustic")[0].title, "Caustic Soda Flakes")
+
+        with mock.patch.object(search, "iter_documents", wraps=search.iter_documents) as loaded:
+            product = self.create_product(slug="zyntriq-78", name="Zyntriq 78", description="-")
+            with self.captureOnCommitCallbacks(execute=True):
+                Product.objects.get(slug="caustic-soda").delete()
+            self.assertEqual(other.search("zyntriq")[0].url, "/products/zyntriq-78/")
+            self.assertEqual([r for r in other.search("caustic") if r.kind == "product"], [])
+        # Only the two logged documents were read back.
+        loaded.assert_called_once()
+        self.assertEqual(len(loaded.call_args.args[0]), 2)
+        self.assertIn(search.document_id("product", product.pk), loaded.call_args.args[0])
+
+    def test_search_page(self):
+        self.create_product(slug="caustic-soda", name="Caustic Soda Flakes", description="Sodium hydroxide.")
+        response = self.client.get("/search/", {"q": "caustic"})
+        self.assertContains(response, "Caustic Soda Flakes")
+        self.assertContains(response, "Product</p>")
+
+    def test_catalogue_search_box_searches_past_the_loaded_page(self):
+        response = self.client.get("/products/")
+        self.assertContains(response, '<form class="filter-controls" action="/search/" method="get" role="search">')
+        self.assertContains(response, 'name="q"')
+        self.assertContains(response, 'data-autocomplete="/autocomplete/"')
+
+
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = ProductCategory.objects.create(slug="scavengers", label="Scavengers")
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(
+                category=category, slug="mea-triazine-78", name="MEA Triazine 78",
+                description="-", cas_number="4719-04-4", sku="VCP-078", brand_name="Vastreat 78",
+            )
+            Product.objects.create(category=category, slug="triazine-base", name="Triazine Base", description="-")
+
+    def test_prefixes_of_codes_and_word_starts(self):
+        from .autocomplete import suggest
+
+        self.assertEqual([s.name for s in suggest("4719-0")], ["MEA Triazine 78"])
+        self.assertEqual([s.name for s in suggest("vcp07")], ["MEA Triazine 78"])
+        self.assertEqual([s.name for s in suggest("vastr")], ["MEA Triazine 78"])
+        # Leading-word matches rank above inner-word matches.
+        self.assertEqual([s.name for s in suggest("triaz")], ["Triazine Base", "MEA Triazine 78"])
+
+    def test_endpoint_answers_from_memory_and_follows_saves(self):
+        self.client.get("/autocomplete/", {"q": "tri"})
+        with self.assertNumQueries(0):
+            response = self.client.get("/autocomplete/", {"q": "triazine b"})
+        self.assertEqual([r["url"] for r in response.json()["results"]], ["/products/triazine-base/"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.filter(slug="triazine-base").get().delete()
+        response = self.client.get("/autocomplete/", {"q": "triazine b"})
+        self.assertEqual(response.json()["results"], [])
+
+
+class FuzzyMatchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = ProductCategory.objects.create(slug="acids", label="Acids")
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(
+                category=category, slug="ptsa", name="p-Toluenesulfonic acid", description="-",
+                common_names="PTSA\nTosylic acid", molecular_formula="C7H8O3S",
+            )
+            Product.objects.create(category=category, slug="sulfamic-acid", name="Sulfamic Acid", description="-")
+
+    def test_misspelt_names_rank_the_closest_product_first(self):
+        from .fuzzy import fuzzy_products
+
+        self.assertEqual([m.name for m in fuzzy_products("toluenesulphonic")], ["p-Toluenesulfonic acid"])
+        self.assertEqual(fuzzy_products("tosilic acid")[0].url, "/products/ptsa/")
+        self.assertEqual(fuzzy_products("zzzz"), [])
+
+    def test_public_search_and_admin_changelist_use_it(self):
+        from django.contrib.auth import get_user_model
+
+        response = self.client.get("/search/", {"q": "sulphamic"})
+        self.assertContains(response, 'href="/products/sulfamic-acid/"')
+
+        admin = get_user_model().objects.create_superuser("admin", "admin@example.com", "pw")
+        self.client.force_login(admin)
+        response = self.client.get("/admin/app/product/", {"q": "toluenesulphonic"})
+        self.assertContains(response, "p-Toluenesulfonic acid")
+        self.assertNotContains(response, "Sulfamic Acid")
+
+
+class ChemistryIndexTests(TestCase):
+    def test_formula_parsing_and_cas_check_digits(self):
+        from .chemistry import FormulaError, formula_weight, hill_formula, is_valid_cas, parse_formula
+
+        self.assertEqual(parse_formula("CuSO4·5H2O"), {"Cu": 1, "S": 1, "O": 9, "H": 10})
+        self.assertEqual(hill_formula(parse_formula("Ca(OH)2")), "CaH2O2")
+        self.assertEqual(hill_formula(parse_formula("C₇H₈O₃S")), "C7H8O3S")
+        self.assertAlmostEqual(formula_weight(parse_formula("C7H8O3S")), 172.2, places=1)
+        with self.assertRaises(FormulaError):
+            parse_formula("Aqueous solution")
+        self.assertTrue(is_valid_cas("7732-18-5"))
+        self.assertTrue(is_valid_cas("104-15-4"))
+        self.assertFalse(is_valid_cas("104-15-5"))
+
+    def test_saves_are_indexed_for_element_and_weight_queries(self):
+        from .chemistry import containing
+        from .models import ProductChemistry
+
+        category = ProductCategory.objects.create(slug="acids", label="Acids")
+        ptsa = Product.objects.create(
+            category=category, slug="ptsa", name="PTSA", description="-",
+            molecular_formula="C7H8O3S", molecular_weight="172.20 g/mol", cas_number="104-15-4",
+        )
+        Product.objects.create(
+            category=category, slug="salt", name="Salt", description="-",
+            molecular_formula="NaCl", molecular_weight="60 g/mol", cas_number="7647-14-6",
+        )
+        products = Product.objects.all()
+        self.assertEqual(list(containing(products, "S", "O")), [ptsa])
+        self.assertEqual(list(products.filter(chemistry__molecular_weight__range=(100, 200))), [ptsa])
+        self.assertEqual(
+            dict(products.values_list("slug", "chemistry__weight_matches")), {"ptsa": True, "salt": False},
+        )
+
+        ptsa.molecular_formula = "C7H7NaO3S"
+        ptsa.save()
+        self.assertEqual(list(containing(products, "S", "Na")), [ptsa])
+
+        # A bad check digit is recorded, not rejected: legacy rows stay editable.
+        ptsa.cas_number = "104-15-5"
+        ptsa.full_clean()
+        ptsa.save()
+        self.assertIs(ProductChemistry.objects.get(pk=ptsa.pk).cas_valid, False)
+
+    def test_admin_warns_about_an_invalid_cas_number_but_saves(self):
+        from django.contrib import admin
+        from django.contrib.messages import get_messages
+        from django.contrib.messages.storage.fallback import FallbackStorage
+        from django.test import RequestFactory
+
+        category = ProductCategory.objects.create(slug="acids", label="Acids")
+        product = Product(category=category, slug="ptsa", name="PTSA", description="-", cas_number="104-15-5")
+        request = RequestFactory().post("/admin/app/product/add/")
+        request.session = {}
+        request._messages = FallbackStorage(request)
+        admin.site._registry[Product].save_model(request, product, None, change=False)
+        self.assertTrue(Product.objects.filter(slug="ptsa").exists())
+        self.assertIn("not a valid CAS number", " ".join(str(m) for m in get_messages(request)))
+
+
+# (property, text as typed by editors, (value, minimum, maximum, unit)) in SI.
+PROPERTY_CORPUS = (
+    ("flash_point", "> 60 °C (closed cup)", (333.15, 333.15, None, "K")),
+    ("flash_point", "140 °F", (333.15, 333.15, 333.15, "K")),
+    ("flash_point", "93.3 °C (200 °F)", (366.45, 366.45, 366.45, "K")),
+    ("flash_point", "< 23 deg C", (296.15, None, 296.15, "K")),
+    ("flash_point", "Not applicable", None),
+    ("flash_point", "Non-flammable", None),
+    ("melting_point", "-10 to -5 °C", (265.65, 263.15, 268.15, "K")),
+    ("melting_point", "120-125°C", (395.65, 393.15, 398.15, "K")),
+    ("melting_point", "approx. 80 °C", (353.15, 353.15, 353.15, "K")),
+    ("boiling_point", "Decomposes above 200 °C", (473.15, 473.15, None, "K")),
+    ("boiling_point", "290 °C min", (563.15, 563.15, None, "K")),
+    ("boiling_point", "373 K", (373.0, 373.0, 373.0, "K")),
+    ("density", "1.12 g/cm³ at 20 °C", (1120.0, 1120.0, 1120.0, "kg/m³")),
+    ("density", "1,05 g/ml", (1050.0, 1050.0, 1050.0, "kg/m³")),
+    ("density", "1120 kg/m3", (1120.0, 1120.0, 1120.0, "kg/m³")),
+    ("density", "Specific gravity: 1.32 (water = 1)", (1320.0, 1320.0, 1320.0, "kg/m³")),
+    ("density", "8.9 lb/gal", (1066.45, 1066.45, 1066.45, "kg/m³")),
+    ("viscosity", "25 cP at 25°C", (0.025, 0.025, 0.025, "Pa·s")),
+    ("viscosity", "5 mPa·s", (0.005, 0.005, 0.005, "Pa·s")),
+    ("viscosity", "12 cSt", (1.2e-05, 1.2e-05, 1.2e-05, "m²/s")),
+    ("vapor_pressure", "≈ 2 mmHg @ 25°C", (266.644, 266.644, 266.644, "Pa")),
+    ("vapor_pressure", "< 0.1 hPa at 20 °C", (10.0, None, 10.0, "Pa")),
+    ("vapor_pressure", "1.2 x 10-3 kPa", (1.2, 1.2, 1.2, "Pa")),
+    ("vapor_pressure", "2.3E-05 mm Hg", (0.00306641, 0.00306641, 0.00306641, "Pa")),
+    ("vapor_pressure", "1.5 MPa", (1.5e6, 1.5e6, 1.5e6, "Pa")),
+    ("ph_value", "10.5 – 11.5 (1% aq.)", (11.0, 10.5, 11.5, "")),
+    ("ph_value", "7", (7.0, 7.0, 7.0, "")),
+    ("ph_value", "N/A", None),
+)
+
+
+class PhysicalPropertyTests(TestCase):
+    def test_regression_corpus(self):
+        from .properties import parse_property
+
+        for name, text, expected in PROPERTY_CORPUS:
+            with self.subTest(name=name, text=text):
+                parsed = parse_property(name, text)
+                if expected is None:
+                    self.assertIsNone(parsed)
+                else:
+                    self.assertEqual(parsed[:4], expected)
+
+    def test_confidence_reflects_assumptions(self):
+        from .properties import parse_property
+
+        self.assertEqual(parse_property("density", "1.12 g/cm3").confidence, 1.0)
+        self.assertLess(parse_property("density", "1.12").confidence, 1.0)
+        self.assertLess(parse_property("density", "SG 1.12").confidence, 1.0)
+        self.assertLess(parse_property("melting_point", "approx. 80 °C").confidence, 1.0)
+
+    def test_saved_products_filter_and_sort_on_indexed_values(self):
+        from .properties import order_by_property, property_filter
+
+        category = ProductCategory.objects.create(slug="solvents", label="Solvents")
+        glycol = Product.objects.create(
+            category=category, slug="glycol", name="Glycol", description="-",
+            flash_point="111 °C", density="1.11 g/cm3",
+        )
+        Product.objects.create(
+            category=category, slug="ethanol", name="Ethanol", description="-",
+            flash_point="13 °C", density="0.789 g/cm3",
+        )
+        products = Product.objects.all()
+        self.assertEqual(list(property_filter(products, "flash_point", at_least=60)), [glycol])
+        self.assertEqual(list(property_filter(products, "flash_point", at_least=140, unit="°F")), [glycol])
+        self.assertEqual(
+            [p.slug for p in order_by_property(products, "density", descending=True)], ["glycol", "ethanol"],
+        )
+
+        glycol.flash_point = "Not applicable"
+        glycol.save()
+        self.assertFalse(property_filter(products, "flash_point", at_least=60).exists())
+
+
+class GHSCodeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = ProductCategory.objects.create(slug="caustics", label="Caustics")
+        self.product = Product.objects.create(
+            category=category, slug="caustic-soda", name="Caustic Soda", description="-",
+            hazard_statements="H290: May be corrosive to metals\nH314 – Causes severe skin burns and eye damage",
+            precautionary_statements="P280: Wear protective gloves\nP301 + P330 + P331: IF SWALLOWED: rinse mouth\nKeep locked up",
+            hazard_pictograms="GHS5, Exclamation mark, Skull",
+        )
+        Product.objects.create(category=category, slug="water", name="Water", description="-")
+
+    def test_codes_are_classified(self):
+        from .ghs import classify, parse_pictograms
+
+        self.assertEqual(classify("H314"), ("Health", "Skin corrosion/irritation"))
+        self.assertEqual(classify("H226"), ("Physical", "Flammable liquids"))
+        self.assertEqual(classify("P301+P330+P331"), ("Response", ""))
+        self.assertEqual(parse_pictograms("GHS5, Exclamation mark, Skull"), ["GHS05", "GHS07"])
+
+    def test_catalogue_filters_by_hazard_class_and_pictogram_with_a_join(self):
+        products = Product.objects.all()
+        self.assertEqual(list(products.filter(hazard_codes__hazard_class="Skin corrosion/irritation")), [self.product])
+        self.assertEqual(list(products.filter(pictograms__code="GHS05")), [self.product])
+        self.assertEqual(
+            list(self.product.hazard_codes.filter(group="Response").values_list("code", flat=True)),
+            ["P301+P330+P331"],
+        )
+
+        self.product.hazard_statements = "H290: May be corrosive to metals"
+        self.product.save()
+        self.assertFalse(products.filter(hazard_codes__hazard_class="Skin corrosion/irritation").exists())
+
+    def test_prefetched_lists_need_no_queries(self):
+        from .ghs import prefetch_safety
+
+        product = prefetch_safety(Product.objects.filter(pk=self.product.pk)).get()
+        with self.assertNumQueries(0):
+            self.assertEqual(product.hazard_statements_list[1], "H314 – Causes severe skin burns and eye damage")
+            self.assertEqual(product.precautionary_statements_list[-1], "Keep locked up")
+            self.assertEqual(product.hazard_pictograms_list, ["GHS5", "Exclamation mark", "Skull"])
+
+        response = self.client.get("/products/caustic-soda/")
+        self.assertContains(response, '<span class="p-code">Keep locked up</span>', html=True)
+
+    def test_pictograms_are_shown_as_typed(self):
+        from .ghs import prefetch_safety
+
+        self.product.hazard_pictograms = "GHS5, Corrosive, ghs05"
+        self.product.save()
+        product = prefetch_safety(Product.objects.filter(pk=self.product.pk)).get()
+        self.assertEqual(product.hazard_pictograms_list, ["GHS5", "Corrosive", "ghs05"])
+        self.assertEqual(list(Product.objects.filter(pictograms__code="GHS05")), [self.product])
+
+    def test_long_statements_are_kept_whole(self):
+        from .models import ProductHazardStatement
+
+        line = "P301 + P310: " + "IF SWALLOWED: Immediately call a POISON CENTER or doctor. " * 12
+        self.product.precautionary_statements = line
+        self.product.save()
+        self.assertEqual(
+            ProductHazardStatement.objects.get(product=self.product, kind="P").text, line.strip(),
+        )
+
+    def test_a_failing_side_table_write_is_not_taken_for_a_slug_collision(self):
+        from unittest import mock
+
+        from django.db import IntegrityError
+
+        with mock.patch("app.ghs.sync_product", side_effect=IntegrityError("side table")):
+            with self.assertRaises(IntegrityError):
+                self.product.save()
+        self.assertEqual(Product.objects.get(pk=self.product.pk).slug, "caustic-soda")
+
+    def test_migration_backfills_products_saved_before_the_code_tables(self):
+        from importlib import import_module
+
+        from django.apps import apps
+
+        from .models import ProductHazardStatement
+
+        # bulk_create bypasses save(), like rows written before 0016.
+        legacy, = Product.objects.bulk_create([Product(
+            category=self.product.category, slug="oleum", name="Oleum", description="-",
+            hazard_statements="H314: Causes severe skin burns and eye damage\nH335",
+            hazard_pictograms="GHS05, Exclamation mark",
+        )])
+        self.assertFalse(ProductHazardStatement.objects.filter(product=legacy).exists())
+
+        import_module("app.migrations.0022_pictogram_labels").backfill_pictograms(apps, None)
+
+        self.assertEqual(
+            list(legacy.hazard_statement_rows.values_list("code__code", flat=True)), ["H314", "H335"],
+        )
+        self.assertEqual(sorted(legacy.pictograms.values_list("code", flat=True)), ["GHS05", "GHS07"])
+        self.assertEqual(self.product.hazard_statement_rows.count(), 5)
+
+
+class FacetTests(TestCase):
+    def setUp(self):
+        from .models import ProductSpec
+
+        cache.clear()
+        acids = ProductCategory.objects.create(slug="acids", label="Acids", order=1)
+        bases = ProductCategory.objects.create(slug="bases", label="Bases", order=2)
+        rows = (
+            ("sulfamic", acids, True, False, "Danger", True, "Powder"),
+            ("citric", acids, False, True, "", False, "Powder"),
+            ("caustic", bases, True, True, "Danger", True, "Flakes"),
+            ("lime", bases, True, False, "Warning", None, "Powder"),
+        )
+        for slug, category, technical, pharma, signal, dangerous, form in rows:
+            product = Product.objects.create(
+                category=category, slug=slug, name=slug.title(), description="-",
+                is_technical_grade=technical, is_pharma_grade=pharma,
+                signal_word=signal, dangerous_goods=dangerous,
+            )
+            ProductSpec.objects.create(product=product, label="Form", value=form)
+
+    def counts(self, **params):
+        from django.http import QueryDict
+
+        from .facets import facet_counts, selection_from
+
+        query = QueryDict(mutable=True)
+        for key, values in params.items():
+            query.setlist(key, values)
+        result = facet_counts(selection_from(query))
+        return result.total, {
+            facet.name: {value.value: value.count for value in values} for facet, values in result.facets
+        }
+
+    def test_counts_are_disjunctive_within_a_facet(self):
+        total, counts = self.counts(category=["acids"], grade=["technical"])
+        self.assertEqual(total, 1)
+        # Other categories keep counting under the rest of the selection …
+        self.assertEqual(counts["category"], {"acids": 1, "bases": 2})
+        # … and the grade counts are for acids only.
+        self.assertEqual(counts["grade"], {"technical": 1, "industrial": 0, "analytical": 0, "pharma": 1})
+        self.assertEqual(counts["dangerous_goods"], {"yes": 1, "no": 0})
+        # Only spec values shared by two or more products become facet values.
+        self.assertEqual(counts["spec:Form"], {"Form:Powder": 1})
+
+        total, counts = self.counts(spec=["Form:Powder"], signal_word=["danger", "warning"])
+        self.assertEqual(total, 2)
+        self.assertEqual(counts["category"], {"acids": 1, "bases": 1})
+
+    def test_bitset_index_matches_sql(self):
+        from django.http import QueryDict
+
+        from . import ghs
+        from .facet_index import get_index
+        from .facets import _compute, get_facets, selection_from
+
+        Product.objects.filter(slug="caustic").update(hazard_statements="H314: Causes severe skin burns")
+        ghs.sync_product(Product.objects.get(slug="caustic"))
+        cache.clear()
+        facets = get_facets()
+        get_index(facets)
+        for params in ({}, {"category": ["bases"]}, {"grade": ["technical", "pharma"], "spec": ["Form:Powder"]},
+                       {"hazard": ["H314"]}, {"dangerous_goods": ["no"], "signal_word": ["warning"]}):
+            query = QueryDict(mutable=True)
+            for key, values in params.items():
+                query.setlist(key, values)
+            selection = selection_from(query, facets)
+            with self.assertNumQueries(0):
+                counts = get_index(facets).counts(facets, selection)
+            self.assertEqual(counts, _compute(facets, selection), params)
+
+    def test_index_is_patched_on_change(self):
+        from .facet_index import get_index
+        from .facets import get_facets
+
+        facets = get_facets()
+        before = get_index(facets)
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.filter(slug="citric").get().delete()
+            lime = Product.objects.get(slug="lime")
+            lime.category = ProductCategory.objects.get(slug="acids")
+            lime.save()
+        self.assertEqual(self.counts()[1]["category"], {"acids": 2, "bases": 1})
+        after = get_index(get_facets())
+        self.assertIsNot(after, before)
+        self.assertEqual(after.slots[lime.pk], before.slots[lime.pk])
+        self.assertEqual(len(after), 3)
+
+    def test_html_and_json(self):
+        response = self.client.get("/products/", {"category": "bases", "grade": "pharma"})
+        self.assertContains(response, "View Details", count=1)
+        self.assertContains(response, "1 product match")
+
+        data = self.client.get("/products/facets/", {"category": "bases"}).json()
+        self.assertEqual(data["total"], 2)
+        self.assertEqual(data["selection"], {"category": ["bases"]})
+        grade = next(f for f in data["facets"] if f["name"] == "grade")
+        self.assertEqual({v["value"]: v["count"] for v in grade["values"]}["technical"], 2)
+
+    def test_the_facets_address_is_never_a_product_slug(self):
+        from django.core.exceptions import ValidationError
+
+        category = ProductCategory.objects.get(slug="acids")
+        named = Product.objects.create(category=category, name="Facets", description="-")
+        typed = Product(category=category, slug="facets", name="Facet Reagent", description="-")
+        with self.assertRaises(ValidationError):
+            typed.full_clean()
+        typed.save()
+        self.assertEqual((named.slug, typed.slug), ("facets-1", "facets-2"))
+        self.assertEqual(self.client.get("/products/facets-1/").status_code, 200)
+
+
+class ProductPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = ProductCategory.objects.create(slug="acids", label="Acids")
+        # Equal (order, name) pairs check the primary-key tie-breaker.
+        for i in range(7):
+            Product.objects.create(
+                category=category, slug=f"acid-{i}", name=f"Acid {i // 2}", description="-", order=i % 3,
+            )
+
+    def test_keyset_pages_cover_the_grid_once(self):
+        from .pagination import product_page
+
+        expected = list(Product.objects.order_by("order", "name", "pk"))
+        seen, cursor = [], None
+        while True:
+            page = product_page(Product.objects.all(), cursor, size=3)
+            seen.extend(page.items)
+            if page.next_cursor is None:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, expected)
+        # A malformed cursor starts from the top instead of failing.
+        self.assertEqual(product_page(Product.objects.all(), "%%%", size=3).items, expected[:3])
+
+    def test_fragment_endpoint_continues_the_grid(self):
+        from .pagination import PAGE_SIZE
+
+        category = ProductCategory.objects.get(slug="acids")
+        for i in range(PAGE_SIZE):
+            Product.objects.create(category=category, slug=f"base-{i}", name=f"Base {i}", description="-", order=5)
+
+        response = self.client.get("/products/", {"category": "acids"})
+        self.assertContains(response, "View Details", count=PAGE_SIZE)
+        next_query = response.context["next_query"]
+        self.assertIn("category=acids", next_query)
+
+        response = self.client.get(f"/products/cards/?{next_query}")
+        self.assertContains(response, 'class="product-card"', count=7)
+        self.assertNotIn("X-Next-Page", response)
+
+    def test_the_cards_address_is_never_a_product_slug(self):
+        product = Product.objects.create(category=ProductCategory.objects.get(), name="Cards", description="-")
+        self.assertEqual(product.slug, "cards-1")
+        self.assertEqual(self.client.get("/products/cards-1/").status_code, 200)
+
+
+class CatalogAPITests(TestCase):
+    def setUp(self):
+        from .models import ProductDocument, ProductSpec
+
+        cache.clear()
+        category = ProductCategory.objects.create(slug="acids", label="Acids")
+        for i in range(5):
+            product = Product.objects.create(
+                category=category, slug=f"acid-{i}", name=f"Acid {i}", description="-", cas_number="",
+            )
+            ProductSpec.objects.create(product=product, label="Form", value="Powder")
+            ProductSpec.objects.create(product=product, label="Purity", value=f"9{i}%")
+            ProductDocument.objects.create(product=product, title="TDS", doc_type="TDS", file=f"products/documents/{i}.pdf")
+
+    def get_json(self, path, **params):
+        import json
+
+        response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200, response)
+        return response, json.loads(b"".join(response.streaming_content) if response.streaming else response.content)
+
+    def test_sparse_fields_and_keyset_pages(self):
+        seen, path, params = [], "/api/v1/products/", {"fields": "slug,specs,documents", "limit": 2}
+        with self.assertNumQueries(3):
+            response, data = self.get_json(path, **params)
+        while True:
+            seen.extend(row["slug"] for row in data["data"])
+            if not data["next"]:
+                break
+            response, data = self.get_json(data["next"])
+        self.assertEqual(seen, [f"acid-{i}" for i in range(5)])
+        self.assertEqual(set(data["data"][0]), {"slug", "specs", "documents"})
+        self.assertEqual(data["data"][0]["specs"][1], {"label": "Purity", "value": "94%"})
+        self.assertTrue(data["data"][0]["documents"][0]["file"].endswith("4.pdf"))
+
+        response = self.client.get(path, {"fields": "slug,password"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_strong_etag_revalidates_without_queries(self):
+        response, data = self.get_json("/api/v1/products/acid-1/", fields="name,category")
+        self.assertEqual(data, {"data": {"name": "Acid 1", "category": "acids"}})
+        etag = response["ETag"]
+        self.assertFalse(etag.startswith("W/"))
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/v1/products/acid-1/", {"fields": "name,category"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.get(slug="acid-1").save()
+        response = self.client.get("/api/v1/products/acid-1/", {"fields": "name,category"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        _, data = self.get_json("/api/v1/categories/", fields="slug,label")
+        self.assertEqual(data, {"data": [{"slug": "acids", "label": "Acids"}], "next": None})
+
+
+class ProductSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = ProductCategory.objects.create(slug="acids", label="Acids")
+        self.product = Product.objects.create(
+            category=category, slug="ptsa", name='PTSA "70%" </script>', description="Tosic acid & water",
+            cas_number="6192-52-5", molecular_formula="C7H8O3S", pack_sizes="25 kg bag\n\n50 kg drum",
+            hazard_statements="H314: Causes severe skin burns and eye damage", is_pharma_grade=True,
+        )
+
+    def test_snapshot_is_built_once_per_version(self):
+        import json
+
+        from .models import ProductSpec
+        from .snapshots import get_snapshot
+
+        snapshot = get_snapshot(self.product)
+        self.assertEqual(snapshot.pack_sizes, ["25 kg bag", "50 kg drum"])
+        self.assertEqual(snapshot.available_grades, ["Pharma"])
+        self.assertTrue(snapshot.has_safety_info)
+        self.assertFalse(snapshot.has_specs)
+        self.assertNotIn("</script>", snapshot.product_json_ld)
+        data = json.loads(snapshot.product_json_ld)
+        self.assertEqual(data["name"], 'PTSA "70%" </script>')
+        self.assertEqual([p["name"] for p in data["additionalProperty"]], ["CAS Number", "Molecular Formula"])
+        self.assertEqual(snapshot.faq_json_ld, "")
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_snapshot(self.product), snapshot)
+
+        ProductSpec.objects.create(product=self.product, label="Purity", value="99%")
+        product = Product.objects.get(pk=self.product.pk)
+        self.assertEqual(get_snapshot(product).specs, [("Purity", "99%")])
+
+    def test_detail_page_renders_from_the_snapshot(self):
+        response = self.client.get("/products/ptsa/")
+        self.assertContains(response, '<span class="tag-item">50 kg drum</span>', html=True)
+        self.assertContains(response, '"name": "PTSA \\"70%\\" \\u003C/script\\u003E"')
+        self.assertContains(response, '<span class="h-code">H314: Causes severe skin burns and eye damage</span>', html=True)
+
+
+class PrimaryImageTests(TestCase):
+    def setUp(self):
+        from .models import ProductImage
+
+        cache.clear()
+        category = ProductCategory.objects.create(slug="acids", label="Acids")
+        self.products = []
+        for i in range(4):
+            product = Product.objects.create(category=category, slug=f"acid-{i}", name=f"Acid {i}", description="-")
+            self.products.append(product)
+            # acid-0 has no images; the others three each, the primary last.
+            for order in range(3 if i else 0):
+                ProductImage.objects.create(
+                    product=product, image=f"products/images/{i}-{order}.jpg", order=order,
+                    is_primary=(order == 2 and i != 3),
+                )
+
+    def image_queries(self, queries):
+        return [q for q in queries if 'FROM "app_productimage"' in q["sql"]]
+
+    def test_prefetch_picks_primary_then_first_in_one_query(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from .images import with_primary_image
+
+        with CaptureQueriesContext(connection) as queries:
+            products = list(with_primary_image(Product.objects.order_by("pk")))
+            names = [p.primary_image.image.name if p.primary_image else None for p in products]
+        self.assertEqual(names, [None, "products/images/1-2.jpg", "products/images/2-2.jpg", "products/images/3-0.jpg"])
+        self.assertEqual(len(self.image_queries(queries)), 1)
+
+    def test_pages_render_images_with_one_query(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/products/acid-1/")
+        self.assertContains(response, 'id="mainImg"')
+        self.assertContains(response, "1-2.jpg")
+        # Gallery, main image and related cards: one prefetch for the page's
+        # product and one loading the catalogue snapshot's primary images.
+        self.assertEqual(len(self.image_queries(queries)), 2)
+
+        # The grid is then served from the already-loaded snapshot.
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/products/")
+        self.assertContains(response, 'class="product-photo"', count=3)
+        self.assertEqual(len(self.image_queries(queries)), 0)
+
+
+class CatalogSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = ProductCategory.objects.create(slug="acids", label="Acids")
+        for i in range(5):
+            product = Product.objects.create(
+                category=self.category, slug=f"acid-{i}", name=f"Acid {i}", description="-", order=i % 2,
+            )
+            ProductSpec.objects.create(product=product, label="Purity", value=f"9{i}%")
+
+    def test_grid_pages_render_without_queries_once_warm(self):
+        from .catalog import get_catalog
+
+        catalog = get_catalog()
+        self.assertEqual([p.slug for p in catalog.products], ["acid-0", "acid-2", "acid-4", "acid-1", "acid-3"])
+        self.client.get("/products/cards/?category=acids")  # creates the company record
+        self.client.get("/products/cards/?category=acids")  # reloads everything it invalidated
+        with self.assertNumQueries(0):
+            response = self.client.get("/products/cards/?category=acids")
+        self.assertContains(response, 'href="/products/acid-3/"')
+        self.assertContains(response, "93%")
+
+        first = catalog.page(size=2)
+        second = catalog.page(first.next_cursor, size=2)
+        self.assertEqual([p.slug for p in first.items + second.items], ["acid-0", "acid-2", "acid-4", "acid-1"])
+        self.assertEqual([p.slug for p in catalog.related(catalog.products[0].pk, self.category.pk)],
+                         ["acid-2", "acid-4", "acid-1"])
+
+    def test_grid_and_promoted_lists_cost_no_query_per_product(self):
+        from .models import ProductArticle
+
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        def grid_queries():
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get("/products/")
+            return len(queries)
+
+        grid_queries()  # creates the company record
+        before = grid_queries()
+        for i in range(5, 8):
+            Product.objects.create(category=self.category, slug=f"acid-{i}", name=f"Acid {i}", description="-")
+        self.assertEqual(grid_queries(), before)
+
+        article = ProductArticle.objects.create(title="Acids", slug="acids", content="-", is_published=True)
+        article.promoted_products.set(Product.objects.all())
+        response = self.client.get("/articles/acids/")
+        self.assertContains(response, 'href="/products/acid-2/"')
+
+    def test_snapshot_reads_only_the_card_columns(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from .catalog import Catalog
+
+        Product.objects.filter(slug="acid-1").update(full_description="x" * 5000, seo_rich_text="y" * 5000)
+        with CaptureQueriesContext(connection) as queries:
+            catalog = Catalog.build()
+        self.assertEqual(len(catalog), 5)
+        sql = " ".join(query["sql"] for query in queries)
+        self.assertIn('"app_product"."description"', sql)
+        self.assertNotIn("full_description", sql)
+        self.assertNotIn("seo_rich_text", sql)
+
+    def test_snapshot_is_kept_across_edits_to_columns_it_does_not_copy(self):
+        from .catalog import get_catalog
+        from .page_cache import invalidate_pages
+
+        old = get_catalog()
+        product = Product.objects.get(slug="acid-1")
+        product.seo_rich_text = "Keyword-rich copy."
+        product.hazard_statements = "H314: Causes severe skin burns and eye damage"
+        product.save()
+        invalidate_pages()  # e.g. after ``build_images``
+        with self.assertNumQueries(0):
+            self.assertIs(get_catalog(), old)
+
+        product.name = "Acid One"
+        product.save()
+        self.assertEqual(get_catalog().by_pk[product.pk].name, "Acid One")
+
+        from .models import ProductArticle
+
+        snapshot = get_catalog()
+        article = ProductArticle.objects.create(title="Acids", slug="acids", content="-", is_published=True)
+        self.assertIs(get_catalog(), snapshot)
+        article.promoted_products.add(product)
+        self.assertEqual([p.slug for p in get_catalog().promoted(article.pk)], ["acid-1"])
+
+    def test_snapshot_is_replaced_after_a_content_change(self):
+        from .catalog import get_catalog
+
+        old = get_catalog()
+        self.assertIs(get_catalog(), old)
+        Product.objects.filter(slug="acid-4").delete()
+        Product.objects.create(category=self.category, slug="acid-9", name="Acid 9", description="-")
+        new = get_catalog()
+        self.assertIsNot(new, old)
+        self.assertIn("acid-4", [p.slug for p in old.products])
+        self.assertEqual(sorted(p.slug for p in new.products), ["acid-0", "acid-1", "acid-2", "acid-3", "acid-9"])
+
+
+class RecommendationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        acids = ProductCategory.objects.create(slug="acids", label="Acids")
+        solvents = ProductCategory.objects.create(slug="solvents", label="Solvents")
+        rows = [
+            ("sulphuric", acids, "Battery electrolyte acid for lead-acid batteries.", "Battery manufacturing"),
+            ("battery-acid", solvents, "Diluted electrolyte for lead-acid batteries.", "Battery manufacturing"),
+            ("citric", acids, "Food acidulant and chelating agent.", "Food and beverage"),
+            ("acetone", solvents, "Fast-evaporating solvent for coatings.", "Paints and coatings"),
+            ("xylene", solvents, "Aromatic solvent for coatings and inks.", "Paints and coatings"),
+        ]
+        self.products = {}
+        for slug, category, description, usage in rows:
+            self.products[slug] = Product.objects.create(
+                category=category, slug=slug, name=slug.title(), description=description, industry_usage=usage,
+            )
+
+    def test_detail_page_shows_stored_neighbours_then_siblings(self):
+        from .models import ProductNeighbor
+
+        p = self.products
+        ProductNeighbor.objects.create(product=p["sulphuric"], neighbor=p["battery-acid"], rank=0, score=0.9)
+        response = self.client.get("/products/sulphuric/")
+        related = response.context["related_products"]
+        # The stored neighbour first, topped up from the category.
+        self.assertEqual([r.slug for r in related], ["battery-acid", "citric"])
+
+    @skipUnless(np, "NumPy is not installed")
+    def test_neighbours_are_ranked_by_content_and_refreshed(self):
+        from datetime import timedelta
+        from unittest import mock
+
+        from . import recommend
+        from .models import ProductNeighbor
+
+        def neighbours(slug):
+            rows = ProductNeighbor.objects.filter(product__slug=slug).select_related("neighbor")
+            return [row.neighbor.slug for row in rows]
+
+        list(recommend.rebuild_all())
+        # Shared text outweighs a shared category.
+        self.assertEqual(neighbours("sulphuric")[0], "battery-acid")
+        self.assertEqual(neighbours("acetone")[0], "xylene")
+        scores = list(ProductNeighbor.objects.filter(product__slug="acetone").values_list("score", flat=True))
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+        citric = self.products["citric"]
+        citric.description = "Fast-evaporating solvent for coatings and inks."
+        citric.industry_usage = "Paints and coatings"
+        citric.save()
+        vocabulary = recommend.fitted().vocabulary
+        # (No overlap: every fixture was saved moments before the model was fitted.)
+        with mock.patch.object(recommend, "_documents", wraps=recommend._documents) as documents, \
+                mock.patch.object(recommend, "CHANGE_OVERLAP", timedelta(0)):
+            updated = recommend.refresh(changed=[citric.pk])
+        # Only the edited product is re-read, and weighed against the stored vocabulary.
+        documents.assert_called_once_with([citric.pk])
+        self.assertEqual(recommend.fitted().vocabulary, vocabulary)
+        self.assertIn(neighbours("citric")[0], ("acetone", "xylene"))
+        self.assertIn("citric", neighbours("xylene"))  # rewritten although xylene was not edited
+        self.assertLessEqual({citric.pk, self.products["xylene"].pk}, updated)
+        # Patched lists hold what a full recomputation with the same model would find.
+        vectors = recommend.fitted().vectors
+        for pk in updated:
+            full = recommend.nearest(vectors, [list(vectors.pks).index(pk)])[pk]
+            self.assertEqual(
+                set(ProductNeighbor.objects.filter(product_id=pk).values_list("neighbor_id", flat=True)),
+                {neighbor_pk for neighbor_pk, _ in full},
+            )
+
+        xylene_pk = self.products["xylene"].pk
+        with self.captureOnCommitCallbacks():  # the refresh is run by hand below
+            self.products["xylene"].delete()
+        recommend.refresh(stale=[self.products["acetone"].pk, citric.pk])
+        self.assertEqual(neighbours("acetone")[0], "citric")
+        self.assertNotIn(xylene_pk, recommend.fitted().vectors.pks)
+
+    @skipUnless(np, "NumPy is not installed")
+    def test_refresh_patches_the_stored_vectors_row_for_row(self):
+        from . import recommend
+
+        list(recommend.rebuild_all())
+        bases = ProductCategory.objects.create(slug="bases", label="Bases")
+        with self.captureOnCommitCallbacks():  # the refresh is run by hand below
+            lye = Product.objects.create(
+                category=bases, slug="lye", name="Lye", description="Electrolyte for alkaline batteries.",
+                is_pharma_grade=True,
+            )
+            self.products["acetone"].description = "Solvent for paints."
+            self.products["acetone"].save()
+            self.products["citric"].delete()
+        recommend.refresh(changed=[lye.pk, self.products["acetone"].pk])
+
+        model = recommend.fitted()
+        expected = recommend._weigh(recommend._documents(), model.vocabulary, model.idf, model.category_ids)
+        for patched, weighed in zip(model.vectors, expected):
+            for a, b in (zip(patched, weighed) if isinstance(patched, tuple) else [(patched, weighed)]):
+                self.assertTrue(np.array_equal(a, b))
+
+    @skipUnless(np, "NumPy is not installed")
+    def test_sparse_scores_are_cosine_similarities(self):
+        from unittest import mock
+
+        from . import recommend
+
+        vectors = recommend.vectorize()
+        scores = recommend.similarities(vectors, range(len(vectors.pks)))
+        with mock.patch.object(recommend, "MAX_MATCHES", 1):  # one row at a time
+            self.assertTrue(np.array_equal(recommend.similarities(vectors, range(len(vectors.pks))), scores))
+        self.assertTrue(np.isneginf(np.diag(scores)).all())
+        np.fill_diagonal(scores, 1)
+        self.assertTrue(np.allclose(scores, scores.T, atol=1e-6))
+        self.assertTrue(((scores >= -1e-6) & (scores <= 1 + 1e-6)).all())
+        pairs = recommend.pair_similarities(vectors, [0, 1, 2, 3], [1, 4, 0, 3])
+        self.assertTrue(np.allclose(pairs[:3], scores[[0, 1, 2], [1, 4, 0]], atol=1e-6))
+        self.assertAlmostEqual(pairs[3], 1, places=5)
+
+    @skipUnless(np, "NumPy is not installed")
+    def test_saves_are_coalesced_into_one_refresh(self):
+        from unittest import mock
+
+        from . import recommend
+        from .models import ProductSpec
+
+        citric = self.products["citric"]
+        pending = {"changed": set(), "stale": set()}
+        with mock.patch.object(recommend, "_pending", pending), \
+                mock.patch.object(recommend._refresh_executor, "submit") as submit:
+            with self.captureOnCommitCallbacks(execute=True):
+                citric.description = "Chelating agent for cleaners."
+                citric.save()
+                for label in ("Purity", "Form", "Grade"):
+                    ProductSpec.objects.create(product=citric, label=label, value="-")
+            with self.captureOnCommitCallbacks(execute=True):
+                self.products["acetone"].save()  # queued behind the same job
+        submit.assert_called_once_with(recommend._refresh_job)
+
+        with mock.patch.object(recommend, "_pending", pending), mock.patch.object(recommend, "REFRESH_DELAY", 0), \
+                mock.patch.object(recommend, "refresh", return_value=set()) as refresh:
+            recommend._refresh_job()
+            recommend._refresh_job()  # nothing left for a second job
+        refresh.assert_called_once_with({citric.pk, self.products["acetone"].pk}, set())
+
+    @skipUnless(np, "NumPy is not installed")
+    def test_changed_neighbour_lists_are_re_exported(self):
+        from unittest import mock
+
+        from . import recommend, static_export
+        from .models import ProductNeighbor
+
+        list(recommend.rebuild_all())
+        # battery-acid (a solvent) lists sulphuric (an acid) first.
+        self.assertEqual(
+            ProductNeighbor.objects.filter(product=self.products["battery-acid"]).first().neighbor,
+            self.products["sulphuric"],
+        )
+        render, _ = static_export.paths_for_product(self.products["sulphuric"])
+        self.assertIn("/products/battery-acid/", render)
+
+        citric = self.products["citric"]
+        citric.description = "Fast-evaporating solvent for coatings and inks."
+        citric.industry_usage = "Paints and coatings"
+        citric.save()
+        with mock.patch.object(static_export, "schedule_regeneration") as schedule:
+            recommend.invalidate_recommendations(recommend.refresh(changed=[citric.pk]))
+        render, remove = schedule.call_args.args
+        self.assertLessEqual({"/products/citric/", "/products/xylene/"}, render)
+        self.assertEqual(remove, set())
+
+
+class StaticExportTests(TestCase):
+    def setUp(self):
+        import shutil
+        import tempfile
+
+        cache.clear()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, True)
+        category = ProductCategory.objects.create(slug="acids", label="Acids")
+        Product.objects.create(category=category, slug="citric", name="Citric Acid", description="Food grade.")
+
+    def export(self, keep=3):
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        call_command("export_static", output=self.root, jobs=1, keep=keep, stdout=StringIO())
+
+    def test_export_writes_a_release_and_swaps_current(self):
+        import gzip
+        from pathlib import Path
+
+        from .static_export import current_release
+
+        self.export()
+        first = current_release(self.root)
+        self.assertEqual(first.parent, Path(self.root).resolve() / "releases")
+        page = first / "products" / "citric" / "index.html"
+        self.assertIn(b"Citric Acid", page.read_bytes())
+        self.assertEqual(gzip.decompress((first / "products" / "citric" / "index.html.gz").read_bytes()),
+                         page.read_bytes())
+        self.assertTrue((first / "sitemap.xml").is_file())
+        self.assertTrue((first / "robots.txt").is_file())
+
+        Product.objects.filter(slug="citric").update(name="Citric Acid Anhydrous")
+        self.export(keep=1)
+        second = current_release(self.root)
+        self.assertNotEqual(second, first)
+        self.assertTrue((Path(self.root) / "current").is_symlink())
+        self.assertIn(b"Citric Acid Anhydrous", (second / "products" / "citric" / "index.html").read_bytes())
+        # --keep=1 prunes the old release; the active one is never removed.
+        self.assertEqual(list((Path(self.root) / "releases").iterdir()), [second])
+
+
+class StaticRegenerationTests(TestCase):
+    def setUp(self):
+        import shutil
+        import tempfile
+        from io import StringIO
+        from unittest import mock
+
+        from django.core.management import call_command
+        from django.test import override_settings
+
+        from . import static_export
+        from .static_export import current_release
+
+        cache.clear()
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, True)
+        settings_override = override_settings(STATIC_EXPORT_ROOT=root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # Run the queued regeneration inline instead of on the worker thread.
+        inline = mock.patch.object(static_export._regen_executor, "submit", lambda func, *args: func(*args))
+        inline.start()
+        self.addCleanup(inline.stop)
+
+        category = ProductCategory.objects.create(slug="acids", label="Acids")
+        self.citric = Product.objects.create(category=category, slug="citric", name="Citric Acid", description="-")
+        self.oxalic = Product.objects.create(category=category, slug="oxalic", name="Oxalic Acid", description="-")
+        call_command("export_static", output=root, jobs=1, stdout=StringIO())
+        self.release = current_release(root)
+
+    def page(self, path):
+        from .static_export import file_for_path
+
+        return file_for_path(self.release, path)
+
+    def test_slug_rename_writes_the_new_path_and_removes_the_old(self):
+        self.assertTrue(self.page("/products/citric/").is_file())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.citric.slug = "citric-anhydrous"
+            self.citric.name = "Citric Acid Anhydrous"
+            self.citric.save()
+        self.assertFalse(self.page("/products/citric/").exists())
+        self.assertFalse(self.page("/products/citric/").parent.exists())
+        self.assertIn(b"Citric Acid Anhydrous", self.page("/products/citric-anhydrous/").read_bytes())
+        # Pages listing the product are re-rendered with the new link.
+        self.assertIn(b"/products/citric-anhydrous/", self.page("/products/").read_bytes())
+        self.assertIn(b"/products/citric-anhydrous/", self.page("/products/oxalic/").read_bytes())
+
+    def test_primary_image_change_rerenders_the_related_cards_of_siblings(self):
+        from .models import ProductImage
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductImage.objects.create(
+                product=self.citric, image="products/images/citric.jpg", alt_text="Citric crystals", is_primary=True,
+            )
+        self.assertIn(b"Citric crystals", self.page("/products/citric/").read_bytes())
+        self.assertIn(b"Citric crystals", self.page("/products/oxalic/").read_bytes())
+
+    def test_deletion_removes_the_page_and_its_links(self):
+        self.assertIn(b"/products/oxalic/", self.page("/products/citric/").read_bytes())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.oxalic.delete()
+        self.assertFalse(self.page("/products/oxalic/").exists())
+        self.assertFalse(self.page("/products/oxalic/").with_name("index.html.gz").exists())
+        self.assertNotIn(b"/products/oxalic/", self.page("/products/").read_bytes())
+        self.assertNotIn(b"/products/oxalic/", self.page("/products/citric/").read_bytes())
+
+
+class SitemapTests(TestCase):
+    def setUp(self):
+        from datetime import datetime, timezone as dt_timezone
+        from unittest import mock
+
+        from . import seo
+
+        cache.clear()
+        shards = mock.patch.object(seo, "SITEMAP_PAGE_SIZE", 2)
+        shards.start()
+        self.addCleanup(shards.stop)
+        category = ProductCategory.objects.create(slug="acids", label="Acids")
+        for pk in (1, 2, 3, 5):
+            Product.objects.create(pk=pk, category=category, slug=f"acid-{pk}", name=f"Acid {pk}", description="-")
+        Product.objects.filter(pk=5).update(updated_at=datetime(2024, 3, 5, tzinfo=dt_timezone.utc))
+
+    def body(self, path, **headers):
+        response = self.client.get(path, **headers)
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content) if response.streaming else response.content
+
+    def test_products_are_sharded_by_pk_range(self):
+        self.assertIn(b"/products/acid-1/", self.body("/sitemap-products-1.xml"))
+        self.assertIn(b"/products/acid-2/", self.body("/sitemap-products-1.xml"))
+        self.assertEqual(self.body("/sitemap-products-2.xml").count(b"<url>"), 1)
+        # pks 5 and (missing) 6 share the third shard.
+        self.assertIn(b"/products/acid-5/", self.body("/sitemap-products-3.xml"))
+        self.assertEqual(self.client.get("/sitemap-products-4.xml").status_code, 404)
+
+    def test_index_lists_shards_with_their_lastmod(self):
+        index = self.body("/sitemap.xml").decode()
+        self.assertEqual(index.count("sitemap-products-"), 3)
+        self.assertIn(
+            "<loc>https://vasudevchemopharma.com/sitemap-products-3.xml</loc>\n    <lastmod>2024-03-05</lastmod>",
+            index,
+        )
+
+    def test_cached_gzip_body_and_invalidation(self):
+        import gzip
+
+        from .cache import get_generation
+        from .seo import invalidate_shard
+
+        first = self.body("/sitemap-products-2.xml")
+        with self.assertNumQueries(0):
+            response = self.client.get("/sitemap-products-2.xml", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.content), first)
+
+        index = get_generation("sitemap:index")
+        invalidate_shard("products", 3)
+        self.assertNotEqual(get_generation("sitemap:index"), index)
+        self.assertTrue(self.client.get("/sitemap-products-2.xml").streaming)  # rebuilt, not cached
+        # A save bumps the shard holding the row and the index.
+        self.body("/sitemap.xml")
+        Product.objects.get(pk=5).save()
+        self.assertNotIn(b"2024-03-05", self.body("/sitemap.xml"))
@@ -16,7 +16,7 @@ Including another URLconf
 """
 from django.urls import path, re_path
 from django.views.generic.base import RedirectView
-from . import views
+from . import api, views
 
 urlpatterns = [
     # ── Legacy / dead-URL redirects (302) ─────────────────────────────
@@ -28,10 +28,20 @@ urlpatterns = [
     path('aboutus/', views.about, name='aboutus'),
     path('ourservices/', views.ourservices, name='ourservices'),
     path('products/', views.products, name='products'),
+    path('products/facets/', views.product_facets, name='product_facets'),
+    path('products/cards/', views.product_cards, name='product_cards'),
     path('articles/', views.article_list, name='article_list'),
     path('insights/', views.insights_list, name='insights_list'),
     path('articles/<slug:slug>/', views.article_detail, name='article_detail'),
     path('products/<slug:slug>/', views.product_detail, name='product_detail'),
     path('insights/<slug:slug>/', views.insight_detail, name='insight_detail'),
+    path('search/', views.search, name='search'),
+    path('autocomplete/', views.autocomplete, name='autocomplete'),
+    path('fragments/', views.page_fragments, name='page_fragments'),
+
+    # ── JSON catalogue API (see app.api) ──────────────────────────────
+    path('api/v1/categories/', api.category_list, name='api_category_list'),
+    path('api/v1/products/', api.product_list, name='api_product_list'),
+    path('api/v1/products/<slug:slug>/', api.product_detail, name='api_product_detail'),
 ]
 
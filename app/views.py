@@ -1,52 +1,127 @@
 from django.shortcuts import render, get_object_or_404
-from django.http import Http404
+from django.contrib.messages import get_messages
+from django.http import Http404, JsonResponse
+from django.middleware.csrf import get_token
+from django.views.decorators.cache import never_cache
 from .insights_data import INSIGHTS, INSIGHTS_BY_SLUG
-from .models import Product, ProductCategory, ProductArticle, CompanyDetails
-
+from .autocomplete import suggest
+from .cache import get_company_details
+from .catalog import get_catalog
+from .facet_index import get_index
+from .facets import facet_counts, facet_counts_json, get_facets, selection_from
+from .fuzzy import fuzzy_products
+from .conditional import (
+    article_validators, conditional_page, insight_validators,
+    insights_list_validators, product_validators,
+)
+from .models import Product, ProductArticle
+from .page_cache import cache_public_page
+from .recommend import recommended_products
+from .search import site_search
+from .snapshots import get_snapshot
+
+@cache_public_page
 def index(request):
     return render(request, 'index.html')
 
+@cache_public_page
 def about(request):
     return render(request, 'aboutus.html')
 
+@cache_public_page
 def ourservices(request):
     return render(request, 'ourservices.html')
 
+def _product_grid_page(request, facets, selection):
+    """The page of the filtered product grid after ``?after=`` and the next page's query string.
+
+    Served from the in-process catalogue (see app.catalog) with the facet
+    selection tested against the bitset index: no queries once both are warm.
+    """
+    matches = None
+    if selection:
+        index = get_index(facets)
+        matches = index.membership(index.match(facets, selection))
+    page = get_catalog().page(request.GET.get('after'), matches=matches)
+    next_query = None
+    if page.next_cursor:
+        query = request.GET.copy()
+        query['after'] = page.next_cursor
+        next_query = query.urlencode()
+    return page.items, next_query
+
+
+@cache_public_page
 def products(request):
-    all_categories = ProductCategory.objects.all()
+    """Product list narrowed server-side by the facets in the query string (see app.facets).
+
+    Only the first page of cards is rendered; ``product_cards`` serves the
+    rest for the "Load more" button.
+    """
+    categories = get_catalog().categories
+    facets = get_facets()
+    selection = selection_from(request.GET, facets)
+    items, next_query = _product_grid_page(request, facets, selection)
     context = {
-        'products': Product.objects.select_related('category').prefetch_related('specs').all(),
-        'categories': all_categories,
-        'category_overview': all_categories.filter(show_in_overview=True),
+        'products': items,
+        'next_query': next_query,
+        'facet_counts': facet_counts(selection, facets),
+        'selection': selection,
+        'categories': categories,
+        'category_overview': [category for category in categories if category.show_in_overview],
     }
     return render(request, 'products.html', context)
 
 
+def product_cards(request):
+    """The next block of product cards as an HTML fragment (filled in by script.js).
+
+    The query string of the page after it, if any, is in ``X-Next-Page``.
+    """
+    facets = get_facets()
+    items, next_query = _product_grid_page(request, facets, selection_from(request.GET, facets))
+    response = render(request, 'product_cards.html', {'products': items})
+    if next_query:
+        response['X-Next-Page'] = next_query
+    return response
+
+
+@cache_public_page
+def product_facets(request):
+    """Facet counts for the selection in the query string, as JSON."""
+    facets = get_facets()
+    selection = selection_from(request.GET, facets)
+    data = facet_counts_json(facet_counts(selection, facets))
+    data['selection'] = {name: sorted(values) for name, values in selection.items()}
+    return JsonResponse(data)
+
+
+@cache_public_page
+@conditional_page(product_validators)
 def product_detail(request, slug):
     try:
         product = (
             Product.objects
             .select_related('category')
-            .prefetch_related('specs', 'images', 'documents', 'faqs', 'pricing_tiers')
+            .prefetch_related('images', 'documents', 'faqs', 'pricing_tiers')
             .get(slug=slug)
         )
     except Product.DoesNotExist:
         raise Http404("Product not found")
 
-    related_products = (
-        Product.objects
-        .filter(category=product.category)
-        .exclude(pk=product.pk)
-        .select_related('category')[:3]
-    )
+    related_products = recommended_products(product, get_catalog())
 
     context = {
         'product': product,
+        # Flags, parsed lists, specs and JSON-LD, built once per product version.
+        'snapshot': get_snapshot(product),
         'related_products': related_products,
     }
     return render(request, 'product_detail.html', context)
 
 
+@cache_public_page
+@conditional_page(insight_validators)
 def insight_detail(request, slug):
     article = INSIGHTS_BY_SLUG.get(slug)
     if article is None:
@@ -54,16 +129,21 @@ def insight_detail(request, slug):
     return render(request, 'insight_detail.html', {'article': article})
 
 
+@cache_public_page
 def article_list(request):
     articles = ProductArticle.objects.filter(is_published=True)
     return render(request, 'articles.html', {'articles': articles})
 
 
+@cache_public_page
+@conditional_page(insights_list_validators)
 def insights_list(request):
     insights = sorted(INSIGHTS, key=lambda item: item.get('number', 0))
     return render(request, 'insights.html', {'insights': insights})
 
 
+@cache_public_page
+@conditional_page(article_validators)
 def article_detail(request, slug):
     article = get_object_or_404(ProductArticle, slug=slug, is_published=True)
     related_articles = (
@@ -71,12 +151,52 @@ def article_detail(request, slug):
         .filter(is_published=True)
         .exclude(pk=article.pk)[:3]
     )
-    promoted_products = article.promoted_products.select_related('category').all()[:8]
-    company = CompanyDetails.load()
+    promoted_products = get_catalog().promoted(article.pk)
+    company = get_company_details()
     context = {
         'article': article,
         'related_articles': related_articles,
         'promoted_products': promoted_products,
         'company': company,
     }
-    return render(request, 'article_detail.html', context)
\ No newline at end of file
+    return render(request, 'article_detail.html', context)
+
+
+@never_cache
+def page_fragments(request):
+    """Per-visitor fragments punched out of cached pages (filled by script.js)."""
+    return JsonResponse({
+        'csrf_token': get_token(request),
+        'messages': [
+            {'level': message.level_tag, 'message': str(message)}
+            for message in get_messages(request)
+        ],
+    })
+
+
+def search(request):
+    """Full-text search across products, articles and insights (see app.search)."""
+    query = request.GET.get('q', '').strip()
+    results = site_search(query, limit=30) if query else []
+    # Few exact hits usually means a misspelt chemical name.
+    similar = []
+    if query and len(results) < 5:
+        found = {result.url for result in results}
+        similar = [match for match in fuzzy_products(query, limit=6) if match.url not in found]
+    context = {
+        'query': query,
+        'results': results,
+        'similar': similar,
+    }
+    return render(request, 'search.html', context)
+
+
+def autocomplete(request):
+    """Typeahead suggestions as JSON, served from memory (see app.autocomplete)."""
+    query = request.GET.get('q', '')
+    response = JsonResponse({
+        'query': query,
+        'results': [suggestion._asdict() for suggestion in suggest(query)],
+    })
+    response['Cache-Control'] = 'public, max-age=60'
+    return response
@@ -80,6 +80,11 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'devapp.wsgi.application'
 
+# Anonymous full-page cache for the public catalogue views (app.page_cache).
+# Cached pages are invalidated whenever catalogue content is saved.
+PAGE_CACHE_ENABLED = True
+PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+
 
 import os
 import dj_database_url
@@ -93,6 +98,30 @@ DATABASES = {
     )
 }
 
+# Cache shared by every gunicorn worker and management command: the
+# generation counters in app.cache (and so every page, index and snapshot
+# keyed on them) only reach other processes through it.  Set REDIS_URL
+# (needs the `redis` package) when processes run on more than one host;
+# CACHE_DIR moves the file cache.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_DIR', os.path.join(BASE_DIR, '.cache')),
+            'OPTIONS': {'MAX_ENTRIES': 20000},
+        },
+    }
+
+# The tests run against a private temporary cache, never the one above.
+TEST_RUNNER = 'app.test_runner.IsolatedCacheRunner'
+
 STATIC_URL = '/static/'
 
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'staticfiles')]
@@ -102,6 +131,9 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Target of `manage.py export_static` (releases/<version>/ + a `current` symlink).
+STATIC_EXPORT_ROOT = os.path.join(BASE_DIR, 'site')
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
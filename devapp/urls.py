@@ -18,11 +18,12 @@ from django.contrib import admin
 from django.urls import path,include
 from django.conf import settings
 from django.conf.urls.static import static
-from app.seo import robots_txt, sitemap_xml
+from app.seo import robots_txt, sitemap_shard, sitemap_xml
 
 urlpatterns = [
     path('robots.txt', robots_txt, name='robots_txt'),
     path('sitemap.xml', sitemap_xml, name='sitemap_xml'),
+    path('sitemap-<slug:section>-<int:page>.xml', sitemap_shard, name='sitemap_shard'),
     path('admin/', admin.site.urls),
     path('', include('app.urls')),  # Include app URLs
 ]
@@ -15,3 +15,9 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'devapp.settings')
 
 
 application = get_wsgi_application()
+
+# Load the in-process catalogue now: under ``gunicorn --preload`` this runs
+# once in the master and every forked worker shares it copy-on-write.
+from app.catalog import preload  # noqa: E402
+
+preload()